@@ -0,0 +1,226 @@
+"""Process-wide cache of parsed curriculum JSON files.
+
+Each content file is parsed once and shared by every request. A file is
+re-parsed only when its mtime or size changes on disk. Returned data is
+shared between requests and must be treated as read-only: callers that
+need to annotate lessons should copy the parts they change.
+"""
+
+import os
+import json
+import threading
+from flask import current_app
+
+SUBJECTS = ['math', 'science', 'ela', 'social_studies']
+
+_lock = threading.Lock()
+_cache = {}  # filepath -> (mtime_ns, size, data)
+_stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+
+_index_lock = threading.Lock()
+_index = None  # {'lessons': {id: (subject, grade, unit_pos, lesson_pos)}, 'units': {id: (subject, grade, unit_pos)}}
+
+_lesson_counts = {}  # filepath -> (data, total lessons); data identifies the parse it was counted from
+
+
+def grade_file_name(grade):
+    """Return the file stem for a grade ('k' for kindergarten)."""
+    grade_str = str(grade).strip().lower()
+    if grade_str in ('0', 'k'):
+        return 'k'
+    return grade_str
+
+
+def curriculum_path(subject, grade, content_dir=None):
+    """Return the path of a subject/grade curriculum file."""
+    if content_dir is None:
+        content_dir = current_app.config['CONTENT_DIR']
+    return os.path.join(content_dir, subject, f'{grade_file_name(grade)}.json')
+
+
+def load_json(filepath):
+    """Return the parsed contents of a JSON file, or None if missing or invalid."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        with _lock:
+            _cache.pop(filepath, None)
+        return None
+
+    with _lock:
+        entry = _cache.get(filepath)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            _stats['hits'] += 1
+            return entry[2]
+
+        try:
+            with open(filepath, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            _cache.pop(filepath, None)
+            return None
+
+        if entry:
+            _stats['reloads'] += 1
+        else:
+            _stats['misses'] += 1
+        _cache[filepath] = (st.st_mtime_ns, st.st_size, data)
+        return data
+
+
+def load_curriculum(subject, grade, content_dir=None):
+    """Return the parsed curriculum for a subject and grade (read-only)."""
+    return load_json(curriculum_path(subject, grade, content_dir))
+
+
+def lesson_count(subject, grade, content_dir=None):
+    """Return the number of lessons in a subject/grade file (0 if missing).
+
+    Counts are precomputed by build_index and recounted only when the
+    underlying file has been re-parsed.
+    """
+    filepath = curriculum_path(subject, grade, content_dir)
+    data = load_json(filepath)
+    if not data:
+        return 0
+    entry = _lesson_counts.get(filepath)
+    if entry and entry[0] is data:
+        return entry[1]
+    total = sum(len(unit.get('lessons', [])) for unit in data.get('units', []))
+    _lesson_counts[filepath] = (data, total)
+    return total
+
+
+def build_index(content_dir=None):
+    """Index every lesson and unit ID across all content files.
+
+    Locations are stored as positions into the cached curriculum data so a
+    lookup is a dict hit plus two list indexes.
+    """
+    global _index
+    if content_dir is None:
+        content_dir = current_app.config['CONTENT_DIR']
+    lessons = {}
+    units = {}
+
+    for subject in SUBJECTS:
+        subject_dir = os.path.join(content_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+        for filename in sorted(os.listdir(subject_dir)):
+            if not filename.endswith('.json'):
+                continue
+            grade_str = filename[:-len('.json')]
+            if grade_str == 'k':
+                grade = 0
+            elif grade_str.isdigit():
+                grade = int(grade_str)
+            else:
+                continue
+            filepath = os.path.join(subject_dir, filename)
+            data = load_json(filepath)
+            if not data:
+                continue
+            total = 0
+            for unit_pos, unit in enumerate(data.get('units', [])):
+                total += len(unit.get('lessons', []))
+                if unit.get('id'):
+                    units[unit['id']] = (subject, grade, unit_pos)
+                for lesson_pos, lesson in enumerate(unit.get('lessons', [])):
+                    if lesson.get('id'):
+                        lessons[lesson['id']] = (subject, grade, unit_pos, lesson_pos)
+            _lesson_counts[filepath] = (data, total)
+
+    with _index_lock:
+        _index = {'lessons': lessons, 'units': units}
+    return _index
+
+
+def _get_index():
+    return _index if _index is not None else build_index()
+
+
+def _resolve(kind, item_id):
+    """Return (subject, grade, unit, lesson) for an indexed ID, or None if stale."""
+    loc = _get_index()[kind].get(item_id)
+    if not loc:
+        return None
+    subject, grade, unit_pos = loc[:3]
+    data = load_curriculum(subject, grade)
+    try:
+        unit = data['units'][unit_pos]
+        if kind == 'units':
+            if unit['id'] == item_id:
+                return subject, grade, unit, None
+        else:
+            lesson = unit['lessons'][loc[3]]
+            if lesson['id'] == item_id:
+                return subject, grade, unit, lesson
+    except (TypeError, KeyError, IndexError):
+        pass
+    return None
+
+
+def _scan(subject, grade, kind, item_id):
+    """Linear search of one file, for IDs added since the index was built."""
+    data = load_curriculum(subject, grade)
+    if not data:
+        return None
+    for unit in data.get('units', []):
+        if kind == 'units':
+            if unit.get('id') == item_id:
+                return subject, grade, unit, None
+            continue
+        for lesson in unit.get('lessons', []):
+            if lesson.get('id') == item_id:
+                return subject, grade, unit, lesson
+    return None
+
+
+def _find(kind, item_id, subject=None, grade=None):
+    found = _resolve(kind, item_id)
+    if found is None and _index is not None and item_id in _index[kind]:
+        # A file changed under us and positions moved; rebuild once
+        build_index()
+        found = _resolve(kind, item_id)
+    if found is None and subject and grade is not None:
+        found = _scan(subject, grade, kind, item_id)
+    return found
+
+
+def find_lesson(lesson_id, subject=None, grade=None):
+    """Look up a lesson by ID.
+
+    Returns (subject, grade, unit, lesson) or None. subject and grade are
+    optional hints, only used for lessons missing from the index.
+    """
+    return _find('lessons', lesson_id, subject, grade)
+
+
+def find_unit(unit_id, subject=None, grade=None):
+    """Look up a unit by ID. Returns (subject, grade, unit) or None."""
+    found = _find('units', unit_id, subject, grade)
+    return found[:3] if found else None
+
+
+def cache_stats():
+    """Return hit/miss/reload counters for the curriculum cache."""
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_cache)
+    index = _index
+    stats['indexed_lessons'] = len(index['lessons']) if index else 0
+    stats['indexed_units'] = len(index['units']) if index else 0
+    return stats
+
+
+def clear_cache():
+    """Drop all cached files, the ID index and reset counters."""
+    global _index
+    with _index_lock:
+        _index = None
+    _lesson_counts.clear()
+    with _lock:
+        _cache.clear()
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,135 @@
+"""SQLite connection manager - WAL journaling with pooled connections.
+
+Connections are opened once with the setup PRAGMAs applied and then
+reused: request handlers borrow one from the pool for the life of the
+request, and long-lived background threads keep one per thread.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,
+    'mmap_size': 64 * 1024 * 1024,
+    'cache_size': -16000,  # negative = KiB, so ~16 MB
+    'temp_store': 'MEMORY',
+}
+
+# Environment overrides, e.g. LEARNQUEST_DB_MMAP_SIZE=0 to disable mmap I/O
+PRAGMA_ENV = {
+    'journal_mode': 'LEARNQUEST_DB_JOURNAL_MODE',
+    'synchronous': 'LEARNQUEST_DB_SYNCHRONOUS',
+    'busy_timeout': 'LEARNQUEST_DB_BUSY_TIMEOUT',
+    'mmap_size': 'LEARNQUEST_DB_MMAP_SIZE',
+    'cache_size': 'LEARNQUEST_DB_CACHE_SIZE',
+    'temp_store': 'LEARNQUEST_DB_TEMP_STORE',
+}
+
+
+def pragmas_from_env():
+    """Return DEFAULT_PRAGMAS with any LEARNQUEST_DB_* overrides applied."""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for name, env_var in PRAGMA_ENV.items():
+        value = os.environ.get(env_var)
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+class ConnectionManager:
+    """Pool of configured SQLite connections for one database file."""
+
+    def __init__(self, db_path, pragmas=None, pool_size=8):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'reused': 0, 'closed': 0}
+
+    def connect(self):
+        """Open a new configured connection (not pooled)."""
+        busy_ms = int(self.pragmas.get('busy_timeout', 5000))
+        conn = sqlite3.connect(self.db_path, timeout=busy_ms / 1000.0,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        with self._lock:
+            self._stats['opened'] += 1
+        return conn
+
+    def acquire(self):
+        """Borrow a connection from the pool, opening one if none are idle."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+        with self._lock:
+            self._stats['reused'] += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close(conn)
+            return
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(conn)
+        else:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager around acquire/release."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def thread_connection(self):
+        """Return a connection owned by the calling thread for its lifetime.
+
+        For background workers that run outside a request context.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+        return conn
+
+    def close_all(self):
+        """Close every idle pooled connection."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['idle'] = self._idle.qsize()
+        stats['pool_size'] = self.pool_size
+        stats['journal_mode'] = self.pragmas.get('journal_mode')
+        return stats
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._stats['closed'] += 1
@@ -0,0 +1,183 @@
+"""Coalescing of identical in-flight LLM requests (single-flight).
+
+The response cache is only written once a generation finishes, so a class
+asking for the same hint at the same moment would otherwise start one
+generation per student. SingleFlight runs one call per key and hands its
+result to everyone who asked while it was running. StreamHub does the same
+for streamed replies: one producer publishes tokens into a Broadcast and
+each request replays it from the start, so late joiners still get the
+whole reply.
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run fn once per key for all concurrent callers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'leaders': 0, 'shared': 0}
+
+    def do(self, key, fn):
+        """Return (result, leader). Followers block until the leader's call returns.
+
+        An exception from fn is raised in the leader and in every follower.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['leaders'] += 1
+            else:
+                call.waiters += 1
+                self._stats['shared'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+class Broadcast:
+    """Tokens of one streamed generation, readable by any number of subscribers."""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.failed = False  # finished with an error/busy message, don't cache
+        self.abandoned = False  # every subscriber left; the producer should stop
+        self.subscribers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, token):
+        with self._cond:
+            self.tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, failed=False):
+        with self._cond:
+            self.done = True
+            self.failed = failed
+            self._cond.notify_all()
+
+    def text(self):
+        with self._cond:
+            return ''.join(self.tokens)
+
+    def read(self, start, timeout):
+        """Return (tokens from index start, done), waiting up to timeout for news."""
+        with self._cond:
+            if len(self.tokens) <= start and not self.done:
+                self._cond.wait(timeout)
+            return self.tokens[start:], self.done
+
+
+class Subscription:
+    """One request's view of a Broadcast."""
+
+    def __init__(self, hub, key, broadcast, leader):
+        self._hub = hub
+        self._key = key
+        self.broadcast = broadcast
+        self.leader = leader
+        self._closed = False
+
+    def tokens(self, poll_seconds):
+        """Yield tokens as they arrive, or None every poll_seconds while idle."""
+        pos = 0
+        while True:
+            new, done = self.broadcast.read(pos, poll_seconds)
+            if new:
+                pos += len(new)
+                for token in new:
+                    yield token
+            elif not done:
+                yield None
+            if done and pos >= len(self.broadcast.tokens):
+                return
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._hub._unsubscribe(self._key, self.broadcast)
+
+
+class StreamHub:
+    """Shares one streamed generation per key between concurrent requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {'leaders': 0, 'shared': 0, 'abandoned': 0}
+
+    def subscribe(self, key, start):
+        """Join the broadcast for key, calling start(broadcast) if there is none yet.
+
+        start runs outside the hub's lock and must return quickly (e.g. spawn
+        the producer thread). The producer calls finished(key, broadcast)
+        when it is done.
+        """
+        with self._lock:
+            broadcast = self._flights.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._flights[key] = Broadcast()
+                self._stats['leaders'] += 1
+            else:
+                self._stats['shared'] += 1
+            broadcast.subscribers += 1
+        if leader:
+            start(broadcast)
+        return Subscription(self, key, broadcast, leader)
+
+    def finished(self, key, broadcast):
+        """Stop routing new subscribers to this broadcast."""
+        with self._lock:
+            if self._flights.get(key) is broadcast:
+                del self._flights[key]
+
+    def _unsubscribe(self, key, broadcast):
+        with self._lock:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Nobody is listening: tell the producer to stop and let the
+                # next request for this key start afresh
+                broadcast.abandoned = True
+                self._stats['abandoned'] += 1
+                if self._flights.get(key) is broadcast:
+                    del self._flights[key]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        return stats
@@ -0,0 +1,279 @@
+"""Item analysis for unit quizzes, aggregated from quiz_answers.
+
+quiz_item_stats keeps running sums per (quiz_id, question_index) -
+attempts, correct answers and the submissions' scores - from which each
+refresh derives:
+
+- p_value: share of attempts answered correctly (low = hard).
+- discrimination: point-biserial correlation between getting the item
+  right and the score on the whole quiz (the item included). Near zero
+  or negative means strong students miss it as often as weak ones - a
+  confusing or mis-keyed question.
+
+Each item also records its question shape (the question text with its
+numbers replaced, see question_keys.question_shape), which is what
+practice problems from the same unit are matched on.
+
+Wrong answers are counted per item in quiz_item_wrong_answers. Refreshes
+are incremental: only quiz_answers rows past the watermark in
+item_stats_state are folded in, so the cost depends on new submissions,
+not on the table size. maybe_refresh starts one in a background thread
+at most every REFRESH_SECONDS, so requests never wait for it; deleting
+quiz data calls invalidate(), which makes the next refresh rebuild from
+scratch.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from flask import current_app
+from api import curriculum_store
+from api.question_keys import question_shape
+
+REFRESH_SECONDS = float(os.environ.get('LEARNQUEST_ITEM_STATS_REFRESH_SECONDS', 300))
+MIN_ATTEMPTS = 5  # below this an item's statistics are too noisy to act on
+COMMON_WRONG = 3
+
+logger = logging.getLogger(__name__)
+
+_refresh_lock = threading.Lock()  # held by the background refresh thread
+_last_refresh = 0.0
+_generation = 0  # bumped by invalidate(); a refresh that straddles one doesn't count
+
+
+def refresh(db):
+    """Fold new quiz_answers rows into the aggregates. Returns rows processed.
+
+    Runs in its own transaction on db, which must not have one open.
+    """
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        low = db.execute('SELECT last_answer_id FROM item_stats_state WHERE id = 1').fetchone()[0]
+        high = db.execute('SELECT COALESCE(MAX(id), 0) FROM quiz_answers').fetchone()[0]
+        if high <= low:
+            _fill_question_keys(db)
+            db.execute('UPDATE item_stats_state SET refreshed_at = CURRENT_TIMESTAMP WHERE id = 1')
+            db.commit()
+            return 0
+
+        added = db.execute(
+            'SELECT COUNT(*) FROM quiz_answers WHERE id > ? AND id <= ?', (low, high)
+        ).fetchone()[0]
+        db.execute(
+            '''INSERT INTO quiz_item_stats
+                   (quiz_id, question_index, attempts, correct, score_sum, score_sq_sum, correct_score_sum)
+               SELECT a.quiz_id, a.question_index, COUNT(*), SUM(a.correct),
+                      SUM(r.score), SUM(r.score * r.score), SUM(a.correct * r.score)
+               FROM quiz_answers a JOIN quiz_results r ON r.id = a.result_id
+               WHERE a.id > ? AND a.id <= ?
+               GROUP BY a.quiz_id, a.question_index
+               ON CONFLICT(quiz_id, question_index) DO UPDATE SET
+                   attempts = attempts + excluded.attempts,
+                   correct = correct + excluded.correct,
+                   score_sum = score_sum + excluded.score_sum,
+                   score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                   correct_score_sum = correct_score_sum + excluded.correct_score_sum''',
+            (low, high)
+        )
+        db.execute(
+            '''INSERT INTO quiz_item_wrong_answers (quiz_id, question_index, answer, count)
+               SELECT quiz_id, question_index, lower(trim(answer)), COUNT(*)
+               FROM quiz_answers
+               WHERE id > ? AND id <= ? AND correct = 0 AND answer IS NOT NULL AND trim(answer) != ''
+               GROUP BY quiz_id, question_index, lower(trim(answer))
+               ON CONFLICT(quiz_id, question_index, answer) DO UPDATE SET
+                   count = count + excluded.count''',
+            (low, high)
+        )
+        _derive(db)
+        _fill_question_keys(db)
+        db.execute(
+            'UPDATE item_stats_state SET last_answer_id = ?, refreshed_at = CURRENT_TIMESTAMP WHERE id = 1',
+            (high,)
+        )
+        db.commit()
+        return added
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _derive(db):
+    """Recompute p_value and discrimination from the running sums."""
+    updates = []
+    for row in db.execute(
+        'SELECT quiz_id, question_index, attempts, correct, score_sum, score_sq_sum, '
+        'correct_score_sum FROM quiz_item_stats'
+    ):
+        n, c = row['attempts'], row['correct']
+        p_value = c / n if n else None
+        # Point-biserial r; the item is 0/1 so sum(c^2) == sum(c)
+        spread = (n * c - c * c) * (n * row['score_sq_sum'] - row['score_sum'] ** 2)
+        discrimination = None
+        if spread > 0:
+            discrimination = (n * row['correct_score_sum'] - c * row['score_sum']) / math.sqrt(spread)
+            discrimination = round(discrimination, 4)
+        updates.append((p_value, discrimination, row['quiz_id'], row['question_index']))
+    db.executemany(
+        'UPDATE quiz_item_stats SET p_value = ?, discrimination = ? WHERE quiz_id = ? AND question_index = ?',
+        updates
+    )
+
+
+def _fill_question_keys(db):
+    """Record the question shape of new items (for matching practice problems)."""
+    missing = db.execute(
+        'SELECT quiz_id, question_index FROM quiz_item_stats WHERE question_key IS NULL'
+    ).fetchall()
+    updates = []
+    for row in missing:
+        question = _question(row['quiz_id'], row['question_index'])
+        key = question_shape(question.get('question', '')) if question else ''
+        updates.append((key, row['quiz_id'], row['question_index']))
+    db.executemany(
+        'UPDATE quiz_item_stats SET question_key = ? WHERE quiz_id = ? AND question_index = ?',
+        updates
+    )
+
+
+def _question(quiz_id, question_index):
+    found = curriculum_store.find_unit(quiz_id)
+    if not found:
+        return None
+    questions = (found[2].get('unit_quiz') or {}).get('questions', [])
+    return questions[question_index] if 0 <= question_index < len(questions) else None
+
+
+def maybe_refresh(db_manager, force=False):
+    """Start a background refresh if the aggregates are older than REFRESH_SECONDS (or force).
+
+    Never blocks the caller: a rebuild after invalidate() can take a few
+    seconds on a large quiz_answers table, and request handlers call
+    this. Returns True while a refresh is running.
+    """
+    if not force and time.monotonic() - _last_refresh < REFRESH_SECONDS:
+        return refreshing()
+    if not _refresh_lock.acquire(blocking=False):
+        return True  # already refreshing
+    try:
+        # The thread needs the app for curriculum lookups (question text)
+        threading.Thread(target=_refresh_in_background,
+                         args=(current_app._get_current_object(), db_manager),
+                         name='item-analysis', daemon=True).start()
+    except Exception:
+        _refresh_lock.release()
+        raise
+    return True
+
+
+def _refresh_in_background(app, db_manager):
+    global _last_refresh
+    generation = _generation
+    try:
+        with app.app_context(), db_manager.connection() as db:
+            refresh(db)
+        # If invalidate() ran meanwhile the aggregates were just wiped;
+        # leave _last_refresh alone so the next call rebuilds them
+        if generation == _generation:
+            _last_refresh = time.monotonic()
+    except Exception:
+        logger.exception('Item analysis refresh failed')
+    finally:
+        _refresh_lock.release()
+
+
+def refreshing():
+    """True while a background refresh is running."""
+    return _refresh_lock.locked()
+
+
+def invalidate(db):
+    """Drop the aggregates so the next refresh rebuilds them (runs in db's transaction)."""
+    global _last_refresh, _generation
+    db.execute('DELETE FROM quiz_item_stats')
+    db.execute('DELETE FROM quiz_item_wrong_answers')
+    db.execute('UPDATE item_stats_state SET last_answer_id = 0 WHERE id = 1')
+    _generation += 1
+    _last_refresh = 0.0
+
+
+def item_report(db, quiz_id=None, min_attempts=MIN_ATTEMPTS, order='hardest', limit=50):
+    """Per-question statistics, hardest (or least discriminating) first."""
+    order_by = {
+        'hardest': 'p_value ASC, attempts DESC',
+        'easiest': 'p_value DESC, attempts DESC',
+        'discrimination': 'discrimination IS NULL, discrimination ASC, attempts DESC',
+    }.get(order, 'p_value ASC, attempts DESC')
+    where = 'attempts >= ?'
+    params = [min_attempts]
+    if quiz_id:
+        where += ' AND quiz_id = ?'
+        params.append(quiz_id)
+    rows = db.execute(
+        f'''SELECT quiz_id, question_index, attempts, correct, p_value, discrimination
+            FROM quiz_item_stats WHERE {where} ORDER BY {order_by} LIMIT ?''',
+        params + [limit]
+    ).fetchall()
+
+    wrong = {}
+    quiz_ids = sorted({r['quiz_id'] for r in rows})
+    if quiz_ids:
+        marks = ','.join('?' * len(quiz_ids))
+        for w in db.execute(
+            f'''SELECT quiz_id, question_index, answer, count FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY quiz_id, question_index ORDER BY count DESC, answer
+                    ) AS rank
+                    FROM quiz_item_wrong_answers WHERE quiz_id IN ({marks})
+                ) WHERE rank <= ?''',
+            quiz_ids + [COMMON_WRONG]
+        ):
+            wrong.setdefault((w['quiz_id'], w['question_index']), []).append((w['answer'], w['count']))
+
+    items = []
+    for r in rows:
+        question = _question(r['quiz_id'], r['question_index']) or {}
+        options = question.get('options') if question.get('type') == 'multiple_choice' else None
+        common = []
+        for answer, count in wrong.get((r['quiz_id'], r['question_index']), []):
+            entry = {'answer': answer, 'count': count}
+            if options and answer.isdigit() and int(answer) < len(options):
+                entry['option'] = options[int(answer)]
+            common.append(entry)
+        items.append({
+            'quiz_id': r['quiz_id'],
+            'question_index': r['question_index'],
+            'question': question.get('question'),
+            'type': question.get('type'),
+            'attempts': r['attempts'],
+            'correct': r['correct'],
+            'p_value': round(r['p_value'], 4) if r['p_value'] is not None else None,
+            'discrimination': r['discrimination'],
+            'common_wrong_answers': common,
+        })
+    return items
+
+
+def stats_by_question(db, questions, min_attempts=MIN_ATTEMPTS):
+    """Statistics for questions shaped like a unit's quiz items.
+
+    questions is an iterable of (unit_id, question text). Returns
+    {(unit_id, question_shape): (p_value, discrimination)} for shapes with
+    enough attempts in that unit's quiz, pooling items of the same shape.
+    """
+    keys = sorted({(unit_id, question_shape(q)) for unit_id, q in questions if unit_id and q})
+    found = {}
+    for start in range(0, len(keys), 250):
+        chunk = keys[start:start + 250]
+        marks = ','.join('(?, ?)' for _ in chunk)
+        for row in db.execute(
+            f'''SELECT quiz_id, question_key, SUM(correct) * 1.0 / SUM(attempts) AS p_value,
+                       MIN(discrimination) AS discrimination
+                FROM quiz_item_stats WHERE (quiz_id, question_key) IN (VALUES {marks})
+                GROUP BY quiz_id, question_key HAVING SUM(attempts) >= ?''',
+            [v for key in chunk for v in key] + [min_attempts]
+        ):
+            found[(row['quiz_id'], row['question_key'])] = (row['p_value'], row['discrimination'])
+    return found
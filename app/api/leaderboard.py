@@ -0,0 +1,185 @@
+"""Materialized leaderboards maintained incrementally as XP is awarded.
+
+All students are held in memory, ranked in sorted lists keyed by
+(-xp, id) for all-time XP and (-weekly_xp, id) for the current week.
+award_xp updates the user's row in the database and, once the caller
+has committed, apply_award moves that one entry in the ranked lists, so
+polls never have to re-sort the users table. Per-grade boards are filtered views over the same ranking.
+
+Each change bumps a version number that feeds the ETag, so clients
+polling an unchanged board get a 304. The structure is per process;
+anything that changes students outside award_xp (registration, edits,
+deletes, streak updates) calls invalidate() to force a reload.
+"""
+
+import os
+import bisect
+import datetime
+import threading
+from collections import namedtuple
+
+BOARD_SIZE = 50
+
+XpAward = namedtuple('XpAward', 'user_id amount xp level week role')
+
+_lock = threading.Lock()
+_state = None  # loaded lazily, see _load
+_enabled = None  # cached leaderboard_enabled setting
+_version = 0
+# Distinguishes ETags from different processes and restarts
+_generation = os.urandom(4).hex()
+
+
+def week_start(day=None):
+    """Return the ISO date of the Monday starting the week containing day."""
+    day = day or datetime.date.today()
+    return (day - datetime.timedelta(days=day.weekday())).isoformat()
+
+
+def _load(db):
+    students = {}
+    for row in db.execute(
+        'SELECT id, name, grade, xp, level, streak_days FROM users WHERE role = ?',
+        ('student',)
+    ):
+        students[row['id']] = dict(row)
+
+    week = week_start()
+    weekly = {}
+    for row in db.execute('SELECT user_id, xp FROM weekly_xp WHERE week_start = ?', (week,)):
+        if row['user_id'] in students:
+            weekly[row['user_id']] = row['xp']
+
+    return {
+        'students': students,
+        'weekly': weekly,
+        'week_start': week,
+        'ranked': sorted((-s['xp'], uid) for uid, s in students.items()),
+        'ranked_weekly': sorted((-xp, uid) for uid, xp in weekly.items()),
+    }
+
+
+def _ensure_loaded(db):
+    global _state, _version
+    if _state is None or _state['week_start'] != week_start():
+        _state = _load(db)
+        _version += 1
+    return _state
+
+
+def _move(ranked, uid, old_xp, new_xp):
+    if old_xp is not None:
+        i = bisect.bisect_left(ranked, (-old_xp, uid))
+        if i < len(ranked) and ranked[i] == (-old_xp, uid):
+            del ranked[i]
+    bisect.insort(ranked, (-new_xp, uid))
+
+
+def award_xp(db, user_id, amount):
+    """Add XP to a user and update their level, inside the caller's transaction.
+
+    Returns an XpAward to pass to apply_award() once the caller has
+    committed (None if the user doesn't exist), so the boards never show
+    XP from a transaction that is later rolled back.
+    """
+    from api.routes_lessons import calculate_level
+
+    db.execute('UPDATE users SET xp = xp + ? WHERE id = ?', (amount, user_id))
+    user = db.execute('SELECT xp, role FROM users WHERE id = ?', (user_id,)).fetchone()
+    if not user:
+        return None
+    level = calculate_level(user['xp'])
+    db.execute('UPDATE users SET level = ? WHERE id = ?', (level, user_id))
+
+    week = week_start()
+    db.execute(
+        '''INSERT INTO weekly_xp (user_id, week_start, xp) VALUES (?, ?, ?)
+           ON CONFLICT(user_id, week_start) DO UPDATE SET xp = xp + excluded.xp''',
+        (user_id, week, amount)
+    )
+    return XpAward(user_id, amount, user['xp'], level, week, user['role'])
+
+
+def apply_award(award):
+    """Move a committed award's user on the in-memory boards (award may be None)."""
+    global _version
+    if award is None:
+        return
+    with _lock:
+        if _state is None or _state['week_start'] != award.week:
+            return
+        student = _state['students'].get(award.user_id)
+        if student is None:
+            if award.role == 'student':
+                _invalidate_locked()
+            return
+        # Concurrent awards can be applied out of commit order; XP only grows
+        if award.xp > student['xp']:
+            _move(_state['ranked'], award.user_id, student['xp'], award.xp)
+            student['xp'] = award.xp
+            student['level'] = award.level
+        old_weekly = _state['weekly'].get(award.user_id)
+        new_weekly = (old_weekly or 0) + award.amount
+        _move(_state['ranked_weekly'], award.user_id, old_weekly, new_weekly)
+        _state['weekly'][award.user_id] = new_weekly
+        _version += 1
+
+
+def _invalidate_locked():
+    global _state, _version
+    _state = None
+    _version += 1
+
+
+def invalidate():
+    """Drop the materialized boards; they reload on the next read."""
+    with _lock:
+        _invalidate_locked()
+
+
+def settings_changed():
+    """Forget the cached leaderboard_enabled setting after settings are saved."""
+    global _enabled, _version
+    with _lock:
+        _enabled = None
+        _version += 1
+
+
+def is_enabled(db):
+    """Return whether the leaderboard is enabled, reading the setting once."""
+    global _enabled
+    with _lock:
+        if _enabled is None:
+            row = db.execute("SELECT value FROM settings WHERE key = 'leaderboard_enabled'").fetchone()
+            _enabled = not row or row['value'] == 'true'
+        return _enabled
+
+
+def _etag(scope, grade):
+    return f'lb-{_generation}-{_version}-{scope}-{grade if grade is not None else "all"}'
+
+
+def get_board(db, scope='all', grade=None, limit=BOARD_SIZE):
+    """Return (rows, etag) for the all-time or weekly board, optionally per grade."""
+    with _lock:
+        state = _ensure_loaded(db)
+        ranked = state['ranked_weekly'] if scope == 'weekly' else state['ranked']
+        students = state['students']
+        rows = []
+        for _, uid in ranked:
+            student = students[uid]
+            if grade is not None and student['grade'] != grade:
+                continue
+            row = {
+                'id': uid,
+                'name': student['name'],
+                'xp': student['xp'],
+                'level': student['level'],
+                'streak_days': student['streak_days'],
+            }
+            if scope == 'weekly':
+                row['weekly_xp'] = state['weekly'][uid]
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows, _etag(scope, grade)
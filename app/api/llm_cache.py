@@ -0,0 +1,255 @@
+"""Two-tier cache for LLM responses: in-memory LRU over the llm_cache table.
+
+Lookups are answered from a bounded in-process LRU when possible and fall
+back to SQLite, promoting what they find. The table is bounded too:
+entries older than the TTL are dropped, and when the stored bytes exceed
+the budget the least recently used rows are evicted down to 90% of it
+(freed pages are reused by SQLite, so the file stops growing).
+
+Hit counts and last-access times are kept per row. Memory hits are
+counted in process and written back in batches with the next cache
+write, or at most every HIT_FLUSH_SECONDS, so a hit never costs a commit.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+MEMORY_MAX_ITEMS = int(os.environ.get('LEARNQUEST_LLM_CACHE_MEMORY_ITEMS', 512))
+MEMORY_MAX_BYTES = int(os.environ.get('LEARNQUEST_LLM_CACHE_MEMORY_MB', 8)) * 1024 * 1024
+TTL_SECONDS = float(os.environ.get('LEARNQUEST_LLM_CACHE_TTL_DAYS', 30)) * 86400
+MAX_BYTES = int(os.environ.get('LEARNQUEST_LLM_CACHE_MAX_MB', 64)) * 1024 * 1024
+HIT_FLUSH_SECONDS = 30
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _entry_size(key, response):
+    return len(key) + len(response.encode('utf-8'))
+
+
+class ResponseCache:
+    """Bounded LRU in memory, TTL + size-bounded table on disk."""
+
+    def __init__(self, memory_items=MEMORY_MAX_ITEMS, memory_bytes=MEMORY_MAX_BYTES,
+                 ttl_seconds=TTL_SECONDS, max_bytes=MAX_BYTES):
+        self.memory_items = memory_items
+        self.memory_bytes = memory_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (response, stored_at, size)
+        self._memory_used = 0
+        self._pending_hits = {}  # key -> (count, last_access) not yet written back
+        self._last_flush = time.time()
+        self._last_purge = 0.0
+        self._stored_bytes = None  # persistent tier size, loaded lazily
+        self._stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'memory_evictions': 0,
+            'expired': 0,
+            'size_evictions': 0,
+        }
+
+    # -- memory tier ---------------------------------------------------------
+
+    def _remember_locked(self, key, response, stored_at):
+        size = _entry_size(key, response)
+        if size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old[2]
+        self._memory[key] = (response, stored_at, size)
+        self._memory_used += size
+        while self._memory and (len(self._memory) > self.memory_items
+                                or self._memory_used > self.memory_bytes):
+            _, (_, _, evicted) = self._memory.popitem(last=False)
+            self._memory_used -= evicted
+            self._stats['memory_evictions'] += 1
+
+    def _forget_locked(self, key):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_used -= old[2]
+
+    def _count_hit_locked(self, key, now):
+        count, _ = self._pending_hits.get(key, (0, now))
+        self._pending_hits[key] = (count + 1, now)
+
+    # -- public API ----------------------------------------------------------
+
+    def get(self, db, key):
+        """Return the cached response for key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    self._count_hit_locked(key, now)
+                    flush = now - self._last_flush >= HIT_FLUSH_SECONDS
+                    response = entry[0]
+                else:
+                    self._forget_locked(key)
+                    entry = None
+        if entry is not None:
+            if flush:
+                self.flush_hits(db)
+            return response
+
+        row = db.execute(
+            "SELECT response, CAST(strftime('%s', created_at) AS INTEGER) AS stored_at "
+            'FROM llm_cache WHERE cache_key = ?',
+            (key,)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            stored_at = row['stored_at'] or now
+            if now - stored_at >= self.ttl_seconds:
+                self._stats['misses'] += 1
+                self._stats['expired'] += 1
+                expired = True
+            else:
+                expired = False
+                self._stats['db_hits'] += 1
+                self._count_hit_locked(key, now)
+                self._remember_locked(key, row['response'], stored_at)
+        if expired:
+            self._delete(db, key)
+            return None
+        return row['response']
+
+    def put(self, db, key, response):
+        """Store a response in both tiers, then enforce the TTL and size budget."""
+        now = time.time()
+        size = _entry_size(key, response)
+        old = db.execute('SELECT size_bytes FROM llm_cache WHERE cache_key = ?', (key,)).fetchone()
+        db.execute(
+            '''INSERT INTO llm_cache (cache_key, response, size_bytes, hits, last_accessed)
+               VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP)
+               ON CONFLICT(cache_key) DO UPDATE SET
+                   response = excluded.response,
+                   size_bytes = excluded.size_bytes,
+                   created_at = CURRENT_TIMESTAMP,
+                   last_accessed = CURRENT_TIMESTAMP''',
+            (key, response, size)
+        )
+        with self._lock:
+            self._remember_locked(key, response, now)
+            self._stats['writes'] += 1
+            if self._stored_bytes is not None:
+                self._stored_bytes += size - (old['size_bytes'] if old else 0)
+        self._flush_hits(db)
+        db.commit()
+        self._enforce_limits(db, now)
+
+    def flush_hits(self, db):
+        """Write buffered hit counts and access times back to the table."""
+        self._flush_hits(db)
+        db.commit()
+
+    def clear(self, db=None):
+        """Empty the memory tier, and the table too when db is given."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            self._pending_hits.clear()
+            self._stored_bytes = None
+        if db is not None:
+            db.execute('DELETE FROM llm_cache')
+            db.commit()
+
+    def stats(self, db=None):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_used
+            stats['memory_max_entries'] = self.memory_items
+            stats['memory_max_bytes'] = self.memory_bytes
+            stats['pending_hits'] = sum(count for count, _ in self._pending_hits.values())
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 3) if lookups else 0.0
+        stats['ttl_days'] = round(self.ttl_seconds / 86400, 2)
+        stats['max_bytes'] = self.max_bytes
+        if db is not None:
+            row = db.execute(
+                'SELECT COUNT(*) AS n, COALESCE(SUM(size_bytes), 0) AS bytes, '
+                'COALESCE(SUM(hits), 0) AS hits FROM llm_cache'
+            ).fetchone()
+            stats['db_entries'] = row['n']
+            stats['db_bytes'] = row['bytes']
+            stats['db_total_hits'] = row['hits']
+        return stats
+
+    # -- persistence helpers -------------------------------------------------
+
+    def _flush_hits(self, db):
+        with self._lock:
+            pending = self._pending_hits
+            self._pending_hits = {}
+            self._last_flush = time.time()
+        if not pending:
+            return
+        db.executemany(
+            "UPDATE llm_cache SET hits = hits + ?, last_accessed = datetime(?, 'unixepoch') "
+            'WHERE cache_key = ?',
+            [(count, int(last), key) for key, (count, last) in pending.items()]
+        )
+
+    def _delete(self, db, key):
+        db.execute('DELETE FROM llm_cache WHERE cache_key = ?', (key,))
+        db.commit()
+        with self._lock:
+            self._stored_bytes = None
+
+    def _enforce_limits(self, db, now):
+        with self._lock:
+            purge = now - self._last_purge >= PURGE_INTERVAL_SECONDS
+            if purge:
+                self._last_purge = now
+            stored = self._stored_bytes
+        if purge:
+            cur = db.execute(
+                "DELETE FROM llm_cache WHERE created_at < datetime(?, 'unixepoch')",
+                (int(now - self.ttl_seconds),)
+            )
+            db.commit()
+            with self._lock:
+                self._stats['expired'] += cur.rowcount
+                stored = None
+        if stored is None:
+            stored = db.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache').fetchone()[0]
+        if stored > self.max_bytes:
+            # Keep the most recently used rows that fit in 90% of the budget
+            cur = db.execute(
+                '''DELETE FROM llm_cache WHERE id IN (
+                       SELECT id FROM (
+                           SELECT id, SUM(size_bytes) OVER (
+                               ORDER BY last_accessed DESC, id DESC
+                           ) AS running
+                           FROM llm_cache
+                       ) WHERE running > ?
+                   )''',
+                (int(self.max_bytes * 0.9),)
+            )
+            db.commit()
+            with self._lock:
+                self._stats['size_evictions'] += cur.rowcount
+            stored = db.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache').fetchone()[0]
+        with self._lock:
+            self._stored_bytes = stored
+
+
+_cache = ResponseCache()
+
+
+def get_cache():
+    """Return the process-wide ResponseCache."""
+    return _cache
@@ -0,0 +1,117 @@
+"""Prompt assembly with a token budget.
+
+Every LLM call builds its message list through build_messages, which
+keeps the prompt inside CONTEXT_TOKENS (minus the reply's max_tokens):
+each message is clipped to MESSAGE_TOKENS, the newest turns are kept
+whole for as long as they fit, and older turns that don't fit are folded
+into a one-line summary of what the student asked earlier. Prompt size,
+and so the model's prefill time, stays bounded however long the
+conversation or the pasted text.
+
+Token counts are estimated (about four characters per token for the
+English text we send); no tokenizer is loaded.
+"""
+
+import os
+import threading
+
+CONTEXT_TOKENS = int(os.environ.get('LEARNQUEST_LLM_CONTEXT_TOKENS', 2048))
+MESSAGE_TOKENS = int(os.environ.get('LEARNQUEST_LLM_MESSAGE_TOKENS', 400))
+SUMMARY_TOKENS = 120
+SUMMARY_ITEM_CHARS = 80
+CHARS_PER_TOKEN = 4
+_CLIP_MARKER = ' [...] '
+
+_lock = threading.Lock()
+_stats = {'builds': 0, 'clipped': 0, 'summarized': 0}
+
+
+def estimate_tokens(text):
+    """Rough token count for text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def clip_text(text, max_tokens):
+    """Shorten text to about max_tokens, keeping its start and end."""
+    text = text or ''
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    keep = max(limit - len(_CLIP_MARKER), 2)
+    head = keep * 2 // 3
+    return text[:head].rstrip() + _CLIP_MARKER + text[len(text) - (keep - head):].lstrip()
+
+
+def _summarize(turns):
+    """One line recalling the student's earlier questions, within SUMMARY_TOKENS."""
+    asked = []
+    used = 0
+    for role, content in reversed(turns):
+        if role != 'user':
+            continue
+        item = ' '.join(content.split())
+        if len(item) > SUMMARY_ITEM_CHARS:
+            item = item[:SUMMARY_ITEM_CHARS].rstrip() + '...'
+        cost = estimate_tokens(item) + 1
+        if used + cost > SUMMARY_TOKENS:
+            break
+        asked.append(f'"{item}"')
+        used += cost
+    if not asked:
+        return ''
+    return 'Earlier in this conversation the student asked: ' + '; '.join(reversed(asked)) + '.'
+
+
+def build_messages(system, turns, max_tokens=500, context_tokens=None):
+    """Return an Ollama message list for system + turns that fits the context window.
+
+    turns is a list of (role, content), oldest first; the last one is the
+    turn being answered and is always kept. max_tokens is the reply
+    budget reserved out of the window.
+    """
+    budget = (context_tokens or CONTEXT_TOKENS) - max_tokens - estimate_tokens(system)
+    clipped = []
+    for role, content in turns:
+        text = clip_text(content, MESSAGE_TOKENS)
+        clipped.append((role, text))
+
+    kept = []
+    used = 0
+    for role, text in reversed(clipped):
+        cost = estimate_tokens(text) + 4  # role and framing overhead
+        if kept and used + cost > budget:
+            break
+        if not kept and cost > budget:
+            # Even the newest turn alone is too long: clip it to what's left
+            text = clip_text(text, max(budget - 4, 16))
+            cost = estimate_tokens(text) + 4
+        kept.append((role, text))
+        used += cost
+    kept.reverse()
+    dropped = clipped[:len(clipped) - len(kept)]
+
+    summarized = False
+    if dropped:
+        summary = _summarize(dropped)
+        if summary and used + estimate_tokens(summary) <= budget:
+            system = f'{system}\n\n{summary}'
+            summarized = True
+    # A kept window shouldn't open with a dangling assistant reply
+    while len(kept) > 1 and kept[0][0] == 'assistant':
+        kept.pop(0)
+
+    with _lock:
+        _stats['builds'] += 1
+        _stats['clipped'] += sum(1 for (_, a), (_, b) in zip(turns, clipped) if a != b)
+        _stats['summarized'] += summarized
+    messages = [{'role': 'system', 'content': system}]
+    messages.extend({'role': role, 'content': text} for role, text in kept)
+    return messages
+
+
+def context_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['context_tokens'] = CONTEXT_TOKENS
+    stats['message_tokens'] = MESSAGE_TOKENS
+    return stats
@@ -0,0 +1,251 @@
+"""Fair-share scheduler for generation slots on the local model.
+
+Requests wait in one of two priority classes: interactive (tutor chat,
+hints) ahead of batch (AI Studio generation). Within a class each user
+has their own FIFO and users are served round-robin, so one teacher
+queuing ten lessons, or one student hammering the hint button, only
+ever holds one place in the rotation.
+
+Batch work may use at most BATCH_SLOTS of the slots, leaving at least one
+for interactive requests when there is more than one slot. To keep batch
+jobs from starving under sustained interactive load, a batch waiter that
+has been queued longer than AGING_SECONDS is served as if interactive.
+
+Waiters can be cancelled at any point (e.g. the client disconnected);
+a cancelled waiter leaves the queue, or hands its slot straight back if
+it had just been granted one.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+# Seconds a batch request may wait before it competes as interactive
+AGING_SECONDS = float(os.environ.get('LEARNQUEST_LLM_AGING_SECONDS', 30))
+# How often a blocking acquire re-checks its cancellation callback
+CANCEL_POLL_SECONDS = 0.25
+
+
+class OllamaBusy(Exception):
+    """Raised when no generation slot frees up within the queue timeout."""
+
+
+class RequestCancelled(Exception):
+    """Raised when a waiting request is cancelled before it gets a slot."""
+
+
+class Waiter:
+    """A request's place in the queue; becomes a held slot once granted."""
+
+    def __init__(self, scheduler, priority, user):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.user = user
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+        self.released = False
+        self.cancelled = False
+        self._event = threading.Event()
+        self._callbacks = []
+
+    @property
+    def granted(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block until a slot is granted; returns False on timeout."""
+        return self._event.wait(timeout)
+
+    def on_grant(self, callback):
+        """Call callback() once the slot is granted (immediately if it already is).
+
+        The callback may run on whichever thread frees the slot, under the
+        scheduler's lock, so it must be quick and non-blocking - e.g.
+        loop.call_soon_threadsafe for an asyncio waiter.
+        """
+        self.scheduler.on_grant(self, callback)
+
+    def cancel(self):
+        """Leave the queue, or give the slot back if already granted."""
+        self.scheduler.cancel(self)
+
+    def release(self):
+        """Give back a granted slot. Safe to call more than once."""
+        self.scheduler.release(self)
+
+
+class FairScheduler:
+    """Priority classes with per-user round-robin over a fixed number of slots."""
+
+    def __init__(self, slots, batch_slots=None, aging_seconds=AGING_SECONDS):
+        self.slots = slots
+        if batch_slots is None:
+            batch_slots = max(1, slots - 1)
+        self.batch_slots = max(1, min(batch_slots, slots))
+        self.aging_seconds = aging_seconds
+        self._lock = threading.Lock()
+        # priority -> OrderedDict(user -> deque of waiters); order is the rotation
+        self._queues = {INTERACTIVE: OrderedDict(), BATCH: OrderedDict()}
+        self._running = {INTERACTIVE: 0, BATCH: 0}
+        self._stats = {
+            p: {'submitted': 0, 'granted': 0, 'cancelled': 0, 'timeouts': 0,
+                'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'aged': 0}
+            for p in PRIORITY_NAMES
+        }
+        self._max_queued = 0
+
+    # -- queue ---------------------------------------------------------------
+
+    def submit(self, priority, user):
+        """Queue a request and return its Waiter (it may be granted at once)."""
+        if priority not in self._queues:
+            priority = BATCH
+        waiter = Waiter(self, priority, user)
+        with self._lock:
+            self._queues[priority].setdefault(user, deque()).append(waiter)
+            self._stats[priority]['submitted'] += 1
+            self._max_queued = max(self._max_queued, self._queued_locked())
+            self._dispatch_locked()
+        return waiter
+
+    def acquire(self, priority, user, timeout, is_cancelled=None):
+        """Queue a request and block until it holds a slot.
+
+        Raises OllamaBusy after timeout seconds, or RequestCancelled if
+        is_cancelled() turns true while waiting.
+        """
+        waiter = self.submit(priority, user)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if self._give_up(waiter, 'timeouts'):
+                    raise OllamaBusy(f'No generation slot free after {timeout:.0f}s')
+                return waiter
+            poll = min(remaining, CANCEL_POLL_SECONDS) if is_cancelled else remaining
+            if waiter.wait(poll):
+                return waiter
+            if is_cancelled and is_cancelled():
+                if self._give_up(waiter, 'cancelled'):
+                    raise RequestCancelled('Client went away while queued')
+                return waiter
+
+    def timed_out(self, waiter):
+        """Record that a caller polling a Waiter gave up on it."""
+        return self._give_up(waiter, 'timeouts')
+
+    def on_grant(self, waiter, callback):
+        with self._lock:
+            if not waiter.granted:
+                waiter._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self, waiter):
+        if not self._give_up(waiter, 'cancelled'):
+            self.release(waiter)
+
+    def release(self, waiter):
+        with self._lock:
+            if waiter.released or not waiter.granted:
+                return
+            waiter.released = True
+            self._running[waiter.priority] -= 1
+            self._dispatch_locked()
+
+    def _give_up(self, waiter, reason):
+        """Remove a still-queued waiter. Returns False if it was already granted."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            if not waiter.cancelled:
+                waiter.cancelled = True
+                users = self._queues[waiter.priority]
+                line = users.get(waiter.user)
+                if line is not None:
+                    try:
+                        line.remove(waiter)
+                    except ValueError:
+                        pass
+                    if not line:
+                        del users[waiter.user]
+                self._stats[waiter.priority][reason] += 1
+            return True
+
+    # -- dispatch ------------------------------------------------------------
+
+    def _queued_locked(self):
+        return sum(len(line) for users in self._queues.values() for line in users.values())
+
+    def _pop_next_locked(self, priority):
+        users = self._queues[priority]
+        user, line = next(iter(users.items()))
+        waiter = line.popleft()
+        # Move this user to the back of the rotation, or drop them if done
+        del users[user]
+        if line:
+            users[user] = line
+        return waiter
+
+    def _oldest_batch_aged_locked(self, now):
+        users = self._queues[BATCH]
+        if not users:
+            return False
+        oldest = min(line[0].enqueued_at for line in users.values())
+        return now - oldest >= self.aging_seconds
+
+    def _dispatch_locked(self):
+        now = time.monotonic()
+        while sum(self._running.values()) < self.slots:
+            batch_ok = self._queues[BATCH] and self._running[BATCH] < self.batch_slots
+            if batch_ok and self._oldest_batch_aged_locked(now):
+                priority = BATCH
+                self._stats[BATCH]['aged'] += 1
+            elif self._queues[INTERACTIVE]:
+                priority = INTERACTIVE
+            elif batch_ok:
+                priority = BATCH
+            else:
+                return
+            waiter = self._pop_next_locked(priority)
+            waiter.granted_at = now
+            waited = now - waiter.enqueued_at
+            stats = self._stats[priority]
+            stats['granted'] += 1
+            stats['total_wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+            self._running[priority] += 1
+            waiter._event.set()
+            for callback in waiter._callbacks:
+                callback()
+            waiter._callbacks = []
+
+    # -- stats ---------------------------------------------------------------
+
+    def stats(self):
+        with self._lock:
+            out = {
+                'slots': self.slots,
+                'batch_slots': self.batch_slots,
+                'queued': self._queued_locked(),
+                'max_queued': self._max_queued,
+                'running': sum(self._running.values()),
+                'waiting_users': len(set(
+                    user for users in self._queues.values() for user in users
+                )),
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                stats = dict(self._stats[priority])
+                granted = stats['granted']
+                stats['avg_wait_seconds'] = round(stats['total_wait_seconds'] / granted, 3) if granted else 0.0
+                stats['total_wait_seconds'] = round(stats['total_wait_seconds'], 3)
+                stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 3)
+                stats['queued'] = sum(len(line) for line in self._queues[priority].values())
+                stats['running'] = self._running[priority]
+                out[name] = stats
+        return out
@@ -3,8 +3,24 @@
 import os
 import re
 import json
+import select
+import time
+import socket
 import hashlib
-from flask import current_app
+import threading
+from flask import current_app, request, session, has_request_context
+from api.ollama_client import get_client, OllamaBusy, RequestCancelled
+from api.llm_scheduler import INTERACTIVE, BATCH, CANCEL_POLL_SECONDS  # noqa: F401
+from api.inflight import SingleFlight, StreamHub
+from api.llm_cache import get_cache
+from api.prompt_templates import get_store, PromptError  # noqa: F401
+
+BUSY_MESSAGE = "Lots of students are asking questions right now. Please try again in a minute!"
+ERROR_MESSAGE = "I'm having trouble thinking right now. Try again in a moment!"
+
+# Identical concurrent requests share one generation (see inflight.py)
+_calls = SingleFlight()
+_streams = StreamHub()
 
 
 def get_model():
@@ -16,44 +32,93 @@ def get_model():
 
 
 def load_prompt(prompt_file, **kwargs):
-    """Load a system prompt template and fill in variables."""
-    prompts_dir = current_app.config['PROMPTS_DIR']
-    filepath = os.path.join(prompts_dir, prompt_file)
-    if not os.path.exists(filepath):
-        return "You are a friendly and helpful tutor for K-12 students."
-    with open(filepath, 'r') as f:
-        template = f.read()
-    for key, value in kwargs.items():
-        template = template.replace('{' + key + '}', str(value))
-    return template
-
-
-def call_ollama(messages, model=None, temperature=0.7, max_tokens=500, stream=False):
-    if model is None:
-        model = get_model()
-    """Call Ollama API for chat completion."""
-    import requests
+    """Render a system prompt template (compiled and memoized, see prompt_templates.py).
+
+    Raises PromptError if the template uses a variable not in kwargs.
+    """
+    return get_store(current_app.config['PROMPTS_DIR']).render(prompt_file, kwargs)
+
+
+def compile_prompts():
+    """Compile and check every prompt template (call at startup)."""
+    return get_store(current_app.config['PROMPTS_DIR']).compile_all()
+
+
+def prompt_stats():
+    return get_store(current_app.config['PROMPTS_DIR']).stats()
+
+
+def request_user_key():
+    """Identify the caller for fair queuing: the logged-in user, else the client IP."""
+    if not has_request_context():
+        return 'system'
+    if 'user_id' in session:
+        return f"user:{session['user_id']}"
+    return f'ip:{request.remote_addr}'
+
+
+def client_disconnected():
+    """Best-effort check whether the HTTP client has hung up on this request.
+
+    Peeks at the request socket (exposed by the werkzeug server): a
+    readable socket with nothing to read means the peer closed it.
+    Servers that don't expose the socket are treated as connected.
+    """
+    if not has_request_context():
+        return False
+    sock = request.environ.get('werkzeug.socket')
+    if sock is None:
+        return False
     try:
-        resp = requests.post(
-            'http://localhost:11434/api/chat',
-            json={
-                'model': model,
-                'messages': messages,
-                'stream': stream,
-                'options': {
-                    'temperature': temperature,
-                    'num_predict': max_tokens,
-                }
-            },
-            stream=stream,
-            timeout=120
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+def _chat_payload(messages, model, temperature, max_tokens, stream):
+    return {
+        'model': model or get_model(),
+        'messages': messages,
+        'stream': stream,
+        'options': {
+            'temperature': temperature,
+            'num_predict': max_tokens,
+        }
+    }
+
+
+def call_ollama(messages, model=None, temperature=0.7, max_tokens=500, stream=False,
+                priority=INTERACTIVE, slot=None):
+    """Call Ollama API for chat completion.
+
+    Goes through the shared pooled client, so the call may wait for a
+    free generation slot first. priority is INTERACTIVE (chat, hints) or
+    BATCH (bulk generation); waiting is fair per user and is abandoned if
+    the client disconnects.
+    """
+    try:
+        result = get_client().chat(
+            _chat_payload(messages, model, temperature, max_tokens, stream),
+            stream=stream, priority=priority, user=request_user_key(),
+            is_cancelled=client_disconnected, slot=slot
         )
         if stream:
-            return resp
-        data = resp.json()
-        return data.get('message', {}).get('content', '')
+            return result
+        return result.get('message', {}).get('content', '')
+    except OllamaBusy:
+        return BUSY_MESSAGE
+    except RequestCancelled:
+        return ''
     except Exception as e:
-        return f"I'm having trouble thinking right now. Try again in a moment! (Error: {str(e)[:100]})"
+        return f"{ERROR_MESSAGE} (Error: {str(e)[:100]})"
+
+
+def is_error_response(text):
+    """True if text is one of call_ollama's fallback messages (never cache these)."""
+    return not text or text == BUSY_MESSAGE or text.startswith(ERROR_MESSAGE)
 
 
 def call_ollama_streaming(messages, model=None, temperature=0.7, max_tokens=500):
@@ -64,6 +129,134 @@ def call_ollama_streaming(messages, model=None, temperature=0.7, max_tokens=500)
                        max_tokens=max_tokens, stream=True)
 
 
+def call_ollama_shared(key, messages, on_complete=None, **kwargs):
+    """call_ollama, but concurrent calls with the same key share one generation.
+
+    key should be the cache key the caller stores the result under;
+    on_complete(text) runs once, in the generating request, after a
+    successful reply and before later callers stop joining - the place to
+    write the cache. If the generating request was cancelled before it got
+    a slot, waiting callers run it again themselves.
+    """
+    def generate():
+        text = call_ollama(messages, **kwargs)
+        if on_complete and not is_error_response(text):
+            on_complete(text)
+        return text
+
+    while True:
+        result, leader = _calls.do(key, generate)
+        if leader or result:
+            return result
+
+
+def stream_ollama_shared(key, messages, model=None, temperature=0.7, max_tokens=500,
+                         on_complete=None):
+    """Start or join the streamed generation for key; returns a Subscription.
+
+    The first request for a key starts a producer thread that waits for an
+    INTERACTIVE slot and publishes Ollama's tokens; identical requests that
+    arrive meanwhile replay the same tokens instead of generating again.
+    on_complete(text) runs in the producer after a successful reply, before
+    new requests stop joining, so it is the place to write the cache. The
+    producer gives up its slot as soon as every subscriber has closed.
+    """
+    options = {
+        'model': model or get_model(),
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+    }
+    user = request_user_key()
+
+    def start(broadcast):
+        threading.Thread(
+            target=_pump_stream,
+            args=(broadcast, key, messages, options, user, on_complete),
+            daemon=True
+        ).start()
+
+    return _streams.subscribe(key, start)
+
+
+def relay_ollama_stream(key, messages, model=None, temperature=0.7, max_tokens=500,
+                        on_complete=None, on_reply=None):
+    """Hand this request's connection to the event-loop relay (see stream_relay.py).
+
+    Returns False if the server can't detach the connection, in which case
+    the caller should stream with stream_ollama_shared instead. Otherwise
+    the view's own response is discarded and the relay writes the SSE
+    reply, sharing the generation with identical concurrent requests.
+    on_complete(text) runs once per successful generation, on_reply(text)
+    once this client has the whole of a successful reply; both run outside
+    the request.
+    """
+    from api.stream_relay import get_relay, DETACH_KEY
+
+    detach = request.environ.get(DETACH_KEY)
+    if detach is None:
+        return False
+    payload = _chat_payload(messages, model, temperature, max_tokens, True)
+    user = request_user_key()
+    relay = get_relay()
+    detach(lambda sock: relay.stream(sock, key, payload, user, on_complete, on_reply))
+    return True
+
+
+def _pump_stream(broadcast, key, messages, options, user, on_complete):
+    client = get_client()
+    slot = client.scheduler.submit(INTERACTIVE, user)
+    failed = True
+    try:
+        deadline = time.monotonic() + client.queue_timeout
+        while not slot.wait(CANCEL_POLL_SECONDS):
+            if broadcast.abandoned:
+                break
+            if time.monotonic() >= deadline and client.scheduler.timed_out(slot):
+                broadcast.publish(BUSY_MESSAGE)
+                return
+        if broadcast.abandoned:
+            return
+
+        resp = call_ollama(messages, stream=True, slot=slot, **options)
+        if not hasattr(resp, 'iter_lines'):
+            broadcast.publish(resp)
+            return
+        try:
+            for line in resp.iter_lines():
+                if broadcast.abandoned:
+                    return
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                token = data.get('message', {}).get('content', '')
+                if token:
+                    broadcast.publish(token)
+                if data.get('done'):
+                    failed = False
+                    break
+        finally:
+            resp.close()
+        if on_complete and not failed:
+            try:
+                on_complete(broadcast.text())
+            except Exception:
+                pass
+    except Exception as e:
+        broadcast.publish(f"{ERROR_MESSAGE} (Error: {str(e)[:100]})")
+    finally:
+        slot.cancel()
+        _streams.finished(key, broadcast)
+        broadcast.finish(failed)
+
+
+def inflight_stats():
+    """Coalescing counters for /api/teacher/stats."""
+    return {'calls': _calls.stats(), 'streams': _streams.stats()}
+
+
 def parse_json_response(text):
     """Robustly extract JSON from LLM output (handles markdown code blocks, etc.)."""
     if not text:
@@ -92,22 +285,17 @@ def parse_json_response(text):
 
 
 def get_cached_response(db, cache_key):
-    """Check for cached LLM response."""
+    """Check for cached LLM response (memory first, then the llm_cache table)."""
     try:
-        row = db.execute('SELECT response FROM llm_cache WHERE cache_key = ?', (cache_key,)).fetchone()
-        return row['response'] if row else None
+        return get_cache().get(db, cache_key)
     except Exception:
         return None
 
 
 def cache_response(db, cache_key, response):
-    """Cache an LLM response."""
+    """Cache an LLM response in both tiers."""
     try:
-        db.execute(
-            'INSERT OR REPLACE INTO llm_cache (cache_key, response) VALUES (?, ?)',
-            (cache_key, response)
-        )
-        db.commit()
+        get_cache().put(db, cache_key, response)
     except Exception:
         pass
 
@@ -0,0 +1,146 @@
+"""Versioned schema migrations tracked with PRAGMA user_version.
+
+schema.sql creates the base tables (idempotently). Anything added after
+that - indexes, new columns, new tables - goes here as a numbered
+migration so existing databases pick it up on the next start. Each
+migration runs in its own transaction together with the user_version
+bump, so a failure leaves the database at the previous version.
+"""
+
+import sqlite3
+
+# (version, description, statements)
+MIGRATIONS = [
+    (1, 'Secondary indexes for hot queries', [
+        # Quizzes passed: WHERE user_id = ? AND score >= 70
+        'CREATE INDEX IF NOT EXISTS idx_quiz_results_user_score ON quiz_results(user_id, score)',
+        # Teacher report: recent quizzes per student
+        'CREATE INDEX IF NOT EXISTS idx_quiz_results_user_completed ON quiz_results(user_id, completed_at)',
+        # Progress: WHERE user_id = ? AND completed = 1 [AND subject = ?], AVG(score)
+        'CREATE INDEX IF NOT EXISTS idx_lesson_progress_user_completed '
+        'ON lesson_progress(user_id, completed, subject, score)',
+        # Tutor history: WHERE user_id = ? AND session_id = ? ORDER BY created_at
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_user_session '
+        'ON chat_history(user_id, session_id, created_at)',
+        # Flashcards: WHERE user_id = ? AND subject = ? [AND grade = ?]
+        'CREATE INDEX IF NOT EXISTS idx_flashcards_user_subject ON flashcards(user_id, subject, grade)',
+        # Notes: WHERE user_id = ? [AND lesson_id = ?] ORDER BY updated_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_notes_user_updated ON notes(user_id, updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_notes_user_lesson ON notes(user_id, lesson_id)',
+        # Leaderboard: WHERE role = ? ORDER BY xp DESC
+        'CREATE INDEX IF NOT EXISTS idx_users_role_xp ON users(role, xp DESC)',
+    ]),
+    (2, 'Weekly XP totals for the weekly leaderboard', [
+        '''CREATE TABLE IF NOT EXISTS weekly_xp (
+            user_id INTEGER REFERENCES users(id),
+            week_start DATE NOT NULL,
+            xp INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, week_start)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_weekly_xp_week ON weekly_xp(week_start, xp DESC)',
+    ]),
+    (3, 'LLM cache accounting for TTL/LRU eviction', [
+        'ALTER TABLE llm_cache ADD COLUMN hits INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE llm_cache ADD COLUMN last_accessed DATETIME',
+        'ALTER TABLE llm_cache ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0',
+        'UPDATE llm_cache SET last_accessed = created_at, '
+        "size_bytes = length(cache_key) + length(CAST(response AS BLOB))",
+        'CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache(last_accessed)',
+        'CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)',
+    ]),
+    (4, 'Per-question quiz results from server-side grading', [
+        '''CREATE TABLE IF NOT EXISTS quiz_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            result_id INTEGER NOT NULL REFERENCES quiz_results(id) ON DELETE CASCADE,
+            user_id INTEGER REFERENCES users(id),
+            quiz_id TEXT NOT NULL,
+            question_index INTEGER NOT NULL,
+            question_type TEXT,
+            answer TEXT,
+            correct INTEGER NOT NULL,
+            completed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )''',
+        # Item analysis: WHERE quiz_id = ? GROUP BY question_index
+        'CREATE INDEX IF NOT EXISTS idx_quiz_answers_quiz_question '
+        'ON quiz_answers(quiz_id, question_index, correct)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_answers_user ON quiz_answers(user_id, quiz_id)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_answers_result ON quiz_answers(result_id)',
+        # Backfill from the client-graded answers_json of earlier submissions
+        '''INSERT INTO quiz_answers
+               (result_id, user_id, quiz_id, question_index, answer, correct, completed_at)
+           SELECT qr.id, qr.user_id, qr.quiz_id,
+                  json_extract(a.value, '$.questionIdx'),
+                  CAST(json_extract(a.value, '$.answer') AS TEXT),
+                  COALESCE(json_extract(a.value, '$.correct'), 0) != 0,
+                  qr.completed_at
+           FROM quiz_results qr, json_each(qr.answers_json) a
+           WHERE json_valid(qr.answers_json) AND json_type(qr.answers_json) = 'array'
+             AND json_extract(a.value, '$.questionIdx') IS NOT NULL''',
+    ]),
+    (5, 'Item analysis aggregates over quiz_answers', [
+        # Running sums per question; p_value and discrimination are derived
+        '''CREATE TABLE IF NOT EXISTS quiz_item_stats (
+            quiz_id TEXT NOT NULL,
+            question_index INTEGER NOT NULL,
+            question_key TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_sq_sum REAL NOT NULL DEFAULT 0,
+            correct_score_sum REAL NOT NULL DEFAULT 0,
+            p_value REAL,
+            discrimination REAL,
+            PRIMARY KEY (quiz_id, question_index)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_item_stats_p_value ON quiz_item_stats(p_value)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_item_stats_key ON quiz_item_stats(question_key)',
+        '''CREATE TABLE IF NOT EXISTS quiz_item_wrong_answers (
+            quiz_id TEXT NOT NULL,
+            question_index INTEGER NOT NULL,
+            answer TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (quiz_id, question_index, answer)
+        )''',
+        # Highest quiz_answers.id folded into the aggregates
+        '''CREATE TABLE IF NOT EXISTS item_stats_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_answer_id INTEGER NOT NULL DEFAULT 0,
+            refreshed_at DATETIME
+        )''',
+        'INSERT OR IGNORE INTO item_stats_state (id, last_answer_id) VALUES (1, 0)',
+    ]),
+    (6, 'Key item statistics by unit and question shape', [
+        # question_key now holds question_shape(); the next refresh refills it
+        'UPDATE quiz_item_stats SET question_key = NULL',
+        'DROP INDEX IF EXISTS idx_quiz_item_stats_key',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_item_stats_key ON quiz_item_stats(quiz_id, question_key)',
+    ]),
+]
+
+
+def schema_version(db):
+    """Return the migration version recorded in the database."""
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(db):
+    """Apply all migrations newer than the database's user_version.
+
+    Returns the list of versions applied.
+    """
+    applied = []
+    current = schema_version(db)
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            db.execute('BEGIN')
+            for sql in statements:
+                db.execute(sql)
+            db.execute(f'PRAGMA user_version = {int(version)}')
+            db.commit()
+        except sqlite3.Error as e:
+            db.rollback()
+            raise RuntimeError(f'Migration {version} ({description}) failed: {e}') from e
+        applied.append(version)
+    return applied
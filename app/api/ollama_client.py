@@ -0,0 +1,151 @@
+"""Shared, pooled HTTP client for the local Ollama server.
+
+One requests.Session keeps connections to Ollama alive between calls, and
+a FairScheduler (see llm_scheduler.py) hands out a fixed number of
+generation slots. Callers beyond the cap wait in line (up to a queue
+timeout) instead of all hitting the model together, so a class-wide burst
+degrades into orderly, per-user fair queuing with hints and chat ahead of
+bulk generation.
+"""
+
+import os
+import threading
+
+from api.llm_scheduler import FairScheduler, OllamaBusy, RequestCancelled, INTERACTIVE  # noqa: F401
+
+OLLAMA_URL = os.environ.get('LEARNQUEST_OLLAMA_URL', 'http://localhost:11434')
+# Generations allowed to run at once; a small local model rarely benefits from more
+MAX_CONCURRENT = int(os.environ.get('LEARNQUEST_LLM_CONCURRENCY', 2))
+# Slots batch generation may occupy; defaults to all but one
+BATCH_SLOTS = int(os.environ.get('LEARNQUEST_LLM_BATCH_SLOTS', 0)) or None
+# Longest a request waits for a free generation slot before giving up
+QUEUE_TIMEOUT = float(os.environ.get('LEARNQUEST_LLM_QUEUE_TIMEOUT', 90))
+CONNECT_TIMEOUT = 3.05
+# Max seconds between bytes from Ollama (applies per chunk when streaming)
+READ_TIMEOUT = float(os.environ.get('LEARNQUEST_LLM_READ_TIMEOUT', 120))
+
+
+class StreamingResponse:
+    """Wraps a streaming requests.Response and frees its slot when done.
+
+    The slot is released when iteration finishes, when the consumer stops
+    early (generator closed) or when close() is called, whichever is first.
+    """
+
+    def __init__(self, resp, release):
+        self._resp = resp
+        self._release = release
+        self._released = False
+        self.status_code = resp.status_code
+
+    def iter_lines(self, *args, **kwargs):
+        try:
+            for line in self._resp.iter_lines(*args, **kwargs):
+                yield line
+        finally:
+            self.close()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            try:
+                self._resp.close()
+            finally:
+                self._release()
+
+    def __del__(self):
+        self.close()
+
+
+class OllamaClient:
+    """Connection-pooled Ollama client with a cap on in-flight generations."""
+
+    def __init__(self, base_url=OLLAMA_URL, max_concurrent=MAX_CONCURRENT,
+                 queue_timeout=QUEUE_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.scheduler = FairScheduler(max_concurrent, batch_slots=BATCH_SLOTS)
+        self._lock = threading.Lock()
+        self._session = None
+        self._stats = {
+            'requests': 0,
+            'in_flight': 0,
+            'errors': 0,
+        }
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=self.max_concurrent + 2,
+                                  max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def _release(self, slot):
+        with self._lock:
+            self._stats['in_flight'] -= 1
+        slot.release()
+
+    def chat(self, payload, stream=False, priority=INTERACTIVE, user=None,
+             is_cancelled=None, slot=None):
+        """POST /api/chat once a slot is free.
+
+        Waits in the scheduler under (priority, user) unless the caller
+        passes a slot it already holds. Returns the decoded JSON body, or
+        a StreamingResponse when stream is true (the slot is held until
+        the stream is consumed or closed). Raises OllamaBusy or
+        RequestCancelled if no slot was obtained.
+        """
+        if slot is None:
+            slot = self.scheduler.acquire(priority, user, self.queue_timeout, is_cancelled)
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['in_flight'] += 1
+        try:
+            resp = self.session.post(
+                f'{self.base_url}/api/chat',
+                json=payload,
+                stream=stream,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+            )
+        except Exception:
+            with self._lock:
+                self._stats['errors'] += 1
+            self._release(slot)
+            raise
+
+        if stream:
+            return StreamingResponse(resp, lambda: self._release(slot))
+        try:
+            return resp.json()
+        finally:
+            resp.close()
+            self._release(slot)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_concurrent'] = self.max_concurrent
+        stats['scheduler'] = self.scheduler.stats()
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide OllamaClient."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient()
+    return _client
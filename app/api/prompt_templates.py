@@ -0,0 +1,155 @@
+"""Compiled prompt templates for load_prompt.
+
+Each file in prompts/ is read once and split into literal text and
+{variable} slots, so rendering is a single join instead of a str.replace
+per variable. Only {identifier} placeholders are slots; the JSON braces
+in the generator prompts are left alone. A file is re-read when its
+mtime changes, checked at most every CHECK_SECONDS.
+
+Rendered prompts are memoized per (file, variables) - the tutor prompts
+repeat for every student in a class - in a bounded LRU that is dropped
+for a file whenever it is recompiled.
+
+Placeholders are checked when a template is compiled: one outside
+VARIABLES (the names load_prompt callers pass) raises PromptError, and
+compile_all() runs that check for every file at startup, so a typo like
+{grdae} stops the server instead of reaching the model as literal text.
+Rendering without a variable the template needs raises too.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_PROMPT = "You are a friendly and helpful tutor for K-12 students."
+CHECK_SECONDS = 2.0
+RENDER_CACHE_SIZE = 512
+
+# Every variable some load_prompt caller supplies
+VARIABLES = frozenset({'grade', 'subject', 'topic', 'lesson_title', 'count'})
+
+_PLACEHOLDER = re.compile(r'\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+
+class PromptError(ValueError):
+    """A template uses an unknown variable, or was rendered without one it needs."""
+
+
+class PromptTemplate:
+    """A template split into literal parts and variable names."""
+
+    def __init__(self, name, text, mtime=None):
+        self.name = name
+        self.mtime = mtime
+        pieces = _PLACEHOLDER.split(text)
+        # Even indexes are literal text, odd indexes are variable names
+        self.literals = pieces[0::2]
+        self.slots = pieces[1::2]
+        self.variables = frozenset(self.slots)
+        unknown = self.variables - VARIABLES
+        if unknown:
+            raise PromptError(f"{name} uses unknown variable(s) {', '.join(sorted(unknown))}")
+
+    def check(self, values):
+        """Raise PromptError unless values has every variable the template uses."""
+        missing = self.variables.difference(values)
+        if missing:
+            raise PromptError(f"{self.name} needs {', '.join(sorted(missing))}")
+
+    def render(self, values):
+        self.check(values)
+        out = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            out.append(str(values[slot]))
+            out.append(literal)
+        return ''.join(out)
+
+
+class PromptStore:
+    """Compiled templates for one prompts directory, plus rendered prompts."""
+
+    def __init__(self, prompts_dir):
+        self.prompts_dir = prompts_dir
+        self._lock = threading.Lock()
+        self._templates = {}  # name -> (PromptTemplate or None, checked_at)
+        self._rendered = OrderedDict()  # (name, variables) -> text
+        self._stats = {'compiles': 0, 'render_hits': 0, 'renders': 0}
+
+    def template(self, name):
+        """Return the compiled template for name, or None if the file is missing."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._templates.get(name)
+        if entry is not None and now - entry[1] < CHECK_SECONDS:
+            return entry[0]
+
+        path = os.path.join(self.prompts_dir, name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        current = entry[0] if entry else None
+        if current is None or current.mtime != mtime:
+            current = None
+            if mtime is not None:
+                with open(path, 'r') as f:
+                    current = PromptTemplate(name, f.read(), mtime)
+            with self._lock:
+                self._stats['compiles'] += 1
+                for key in [k for k in self._rendered if k[0] == name]:
+                    del self._rendered[key]
+        with self._lock:
+            self._templates[name] = (current, now)
+        return current
+
+    def render(self, name, values):
+        template = self.template(name)
+        if template is None:
+            return DEFAULT_PROMPT
+        template.check(values)
+        key = (name, tuple(sorted((k, str(values[k])) for k in template.variables)))
+        with self._lock:
+            text = self._rendered.get(key)
+            if text is not None:
+                self._rendered.move_to_end(key)
+                self._stats['render_hits'] += 1
+                return text
+        text = template.render(values)
+        with self._lock:
+            self._stats['renders'] += 1
+            self._rendered[key] = text
+            if len(self._rendered) > RENDER_CACHE_SIZE:
+                self._rendered.popitem(last=False)
+        return text
+
+    def compile_all(self):
+        """Compile every .txt template; returns {name: sorted variable names}."""
+        found = {}
+        for name in sorted(os.listdir(self.prompts_dir)):
+            if name.endswith('.txt'):
+                template = self.template(name)
+                if template is not None:
+                    found[name] = sorted(template.variables)
+        return found
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['templates'] = sum(1 for t, _ in self._templates.values() if t is not None)
+            stats['rendered_cached'] = len(self._rendered)
+        return stats
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(prompts_dir):
+    """Return the PromptStore for a prompts directory."""
+    with _stores_lock:
+        store = _stores.get(prompts_dir)
+        if store is None:
+            store = _stores[prompts_dir] = PromptStore(prompts_dir)
+        return store
@@ -0,0 +1,79 @@
+"""Normalized cache keys for tutor chat and hint requests.
+
+Students type the same question many ways - "What is 3/4 + 1/8?",
+"what is 3/4+1/8", "WHAT IS 1/8 + 3/4" - and an exact-text key gives each
+spelling its own LLM call. normalize_question folds case, whitespace,
+sentence punctuation and the spelling of any arithmetic in the text (via
+math_engine.canonical) so they all share one cache entry.
+"""
+
+import re
+import unicodedata
+
+from api.llm_utils import make_cache_key
+from math_engine.canonical import canonical_expression, OPERATORS
+
+# A number, variable or coefficient-variable ("2x"), with signs/brackets around it
+_OPERAND = r'[-(]*(?:\d[\d,.]*[a-z]?|(?<![a-z])[a-z])(?![a-z])[)]*'
+# Runs of operands joined by operators, e.g. "3/4 + 1/8", "2x + 3 = 7"; or a lone number
+_MATH_SPAN = re.compile(
+    _OPERAND + r'(?:(?:\s*(?:[-+*/%=]|\*\*)\s*|(?=\())' + _OPERAND + r')+|\d[\d,]*\.?\d*|\.\d+'
+)
+# "4 x 5" written with a letter x for times
+_TIMES_X = re.compile(r'(?<=[\d)])\s+x\s+(?=[\d(])')
+_APOSTROPHE = re.compile(r"['\u2019`]")
+# Sentence punctuation; never a '.' before a digit (".25" is not "25"), nor a thousands ','
+_PUNCTUATION = re.compile(r'[?!;:"]|[.,](?!\d)|(?<!\d),')
+_WHITESPACE = re.compile(r'\s+')
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _canonical_math(match):
+    span = match.group(0)
+    sides = span.split('=')
+    canonical = [canonical_expression(side) for side in sides]
+    if any(c is None for c in canonical):
+        return re.sub(r'\s+', '', span)
+    return '='.join(canonical)
+
+
+def normalize_question(text):
+    """Fold a free-text question to a canonical form for cache keys."""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text)).lower().translate(OPERATORS)
+    text = _APOSTROPHE.sub('', text)
+    text = _TIMES_X.sub(' * ', text)
+    text = _MATH_SPAN.sub(_canonical_math, text)
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def question_shape(text):
+    """normalize_question with every number replaced by '#'.
+
+    Questions that differ only in their numbers - "7 x 6 = ___" in a unit
+    quiz and "4 x 3 = ___" in one of its lessons - share a shape.
+    """
+    return _NUMBER.sub('#', normalize_question(text))
+
+
+def hint_cache_key(problem, subject, grade):
+    """Cache key for /api/tutor/hint."""
+    return make_cache_key('hint', normalize_question(problem), subject, str(grade))
+
+
+def chat_cache_key(messages):
+    """Cache key for a tutor chat turn.
+
+    Uses the system prompt (subject, grade, lesson) plus the last three
+    turns, with the student's turns normalized. Assistant turns are model
+    output and are keyed verbatim.
+    """
+    system = messages[0]['content'] if messages and messages[0]['role'] == 'system' else ''
+    turns = [m for m in messages if m['role'] != 'system'][-3:]
+    return make_cache_key(
+        'chat', system,
+        [[m['role'], normalize_question(m['content']) if m['role'] == 'user' else m['content']]
+         for m in turns]
+    )
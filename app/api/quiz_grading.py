@@ -0,0 +1,97 @@
+"""Server-side quiz grading.
+
+The browser shows instant feedback per question, but the recorded score
+comes from grade_quiz: each submitted answer is checked against the unit
+quiz from the curriculum - math answers with the compiled answer
+validator, everything else by exact (case- and whitespace-insensitive)
+matching - and questions left unanswered count as wrong.
+"""
+
+import json
+from math_engine.answer_validator import compile_answer
+
+
+def _fold(text):
+    return ' '.join(str(text).lower().split())
+
+
+def _option_index(answer):
+    """answer as a whole-number index, else None (so True and 1.5 are not 1)."""
+    if isinstance(answer, bool):
+        return None
+    if isinstance(answer, float):
+        return int(answer) if answer.is_integer() else None
+    try:
+        return int(answer)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_question(question, answer, subject):
+    """Return True if answer is correct for question."""
+    if answer is None:
+        return False
+    qtype = question.get('type')
+
+    if qtype == 'multiple_choice':
+        options = question.get('options') or []
+        index = _option_index(answer)
+        if index is None or not 0 <= index < len(options):
+            return False
+        if subject == 'math' and question.get('answer') not in (None, ''):
+            return compile_answer(question['answer']).check(options[index])
+        return index == question.get('correct')
+
+    if qtype == 'true_false':
+        return str(answer).strip().lower() == str(question.get('answer')).strip().lower()
+
+    if qtype == 'matching':
+        pairs = question.get('pairs') or []
+        if not isinstance(answer, list) or len(answer) != len(pairs):
+            return False
+        return all(_option_index(choice) == i for i, choice in enumerate(answer))
+
+    # fill_in, word_problem and anything free-text
+    expected = question.get('answer')
+    if expected is None or str(answer).strip() == '':
+        return False
+    if subject == 'math':
+        return compile_answer(expected).check(answer)
+    return _fold(answer) == _fold(expected)
+
+
+def grade_quiz(questions, answers, subject):
+    """Grade submitted answers against a quiz's questions.
+
+    answers is the client's list of {questionIdx, answer}; the last answer
+    for a question wins and extra or out-of-range entries are ignored.
+    Returns (results, correct_count), with one result per question:
+    {question_index, question_type, answer (text or None), correct}.
+    """
+    given = {}
+    for entry in answers or []:
+        if not isinstance(entry, dict):
+            continue
+        index = _option_index(entry.get('questionIdx'))
+        if index is not None and 0 <= index < len(questions):
+            given[index] = entry.get('answer')
+
+    results = []
+    correct_count = 0
+    for index, question in enumerate(questions):
+        answer = given.get(index)
+        correct = grade_question(question, answer, subject)
+        correct_count += correct
+        if answer is None:
+            stored = None
+        elif isinstance(answer, (list, dict)):
+            stored = json.dumps(answer)
+        else:
+            stored = str(answer)
+        results.append({
+            'question_index': index,
+            'question_type': question.get('type'),
+            'answer': stored,
+            'correct': correct,
+        })
+    return results, correct_count
@@ -1,6 +1,7 @@
 """Authentication routes - login, register, session management."""
 
 from flask import Blueprint, request, jsonify, session, current_app
+from api import leaderboard
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -46,6 +47,8 @@ def login():
         (today, streak, user['id'])
     )
     db.commit()
+    if streak != user['streak_days']:
+        leaderboard.invalidate()
 
     session['user_id'] = user['id']
 
@@ -92,6 +95,7 @@ def register():
         (name, pin, 'student', grade)
     )
     db.commit()
+    leaderboard.invalidate()
 
     return jsonify({'message': 'Student created successfully'})
 
@@ -1,14 +1,20 @@
 """AI Studio content generation routes with programmatic fallback."""
 
-import os
 import json
 import random
 from flask import Blueprint, request, jsonify, session, current_app
-from api.llm_utils import load_prompt, call_ollama, parse_json_response, \
-    get_cached_response, cache_response, make_cache_key
+from api import curriculum_store, item_analysis
+from api.question_keys import question_shape
+from api.llm_utils import load_prompt, call_ollama_shared, parse_json_response, \
+    get_cached_response, cache_response, make_cache_key, is_error_response, BATCH
+from api.llm_context import build_messages, clip_text
+from math_engine.expression import ExpressionError, evaluate_expression
 
 generate_bp = Blueprint('generate', __name__)
 
+# Topics are free text; keep them to a short phrase in prompts and cache keys
+TOPIC_TOKENS = 30
+
 
 def get_db():
     return current_app.get_db()
@@ -92,17 +98,8 @@ def get_topics():
 # ---------------------------------------------------------------------------
 
 def _load_curriculum(subject, grade):
-    """Load curriculum JSON for a subject/grade."""
-    content_dir = current_app.config['CONTENT_DIR']
-    grade_str = 'k' if grade == 0 else str(grade)
-    filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-    if not os.path.exists(filepath):
-        return None
-    try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return None
+    """Load curriculum JSON for a subject/grade (shared, read-only)."""
+    return curriculum_store.load_curriculum(subject, grade)
 
 
 def _find_matching_lessons(data, topic):
@@ -138,7 +135,7 @@ def _fallback_lesson(subject, grade, topic):
         'examples': content.get('examples', []),
         'key_vocabulary': content.get('key_vocabulary', []),
         'real_world': content.get('real_world', ''),
-        'practice_problems': lesson.get('practice_problems', [])[:5]
+        'practice_problems': [dict(p) for p in lesson.get('practice_problems', [])[:5]]
     }
 
 
@@ -207,14 +204,24 @@ def _fallback_flashcards(subject, grade, topic, count):
     return unique[:count]
 
 
-def _fallback_quiz(subject, grade, topic, count):
-    """Generate quiz questions from curriculum practice problems."""
+def _fallback_quiz(subject, grade, topic, count, db=None):
+    """Generate quiz questions from curriculum practice problems.
+
+    With db, practice problems shaped like unit-quiz items that item
+    analysis shows to work well (moderate difficulty, positive
+    discrimination) are picked first, and ones shaped like poor items
+    (near-universal or negative discrimination) last.
+    """
     data = _load_curriculum(subject, grade)
     lessons = _find_matching_lessons(data, topic)
+    unit_of = {lesson.get('id'): unit.get('id')
+               for unit in (data or {}).get('units', []) for lesson in unit.get('lessons', [])}
     questions = []
+    units = []
 
     for lesson in lessons:
         for prob in lesson.get('practice_problems', []):
+            units.append(unit_of.get(lesson.get('id')))
             q = {
                 'type': prob.get('type', 'fill_in'),
                 'question': prob.get('question', ''),
@@ -227,8 +234,25 @@ def _fallback_quiz(subject, grade, topic, count):
                 q['answer'] = str(prob.get('answer', ''))
             questions.append(q)
 
-    random.shuffle(questions)
-    return questions[:count]
+    pairs = list(zip(units, questions))
+    random.shuffle(pairs)
+    if db is not None and len(pairs) > count:
+        stats = item_analysis.stats_by_question(db, [(u, q['question']) for u, q in pairs])
+        if stats:
+            pairs.sort(key=lambda p: _item_rank(stats.get((p[0], question_shape(p[1]['question'])))))
+    return [q for _, q in pairs[:count]]
+
+
+def _item_rank(stat):
+    """Sort key for _fallback_quiz: 0 = good item, 1 = no data yet, 2 = poor item."""
+    if stat is None:
+        return 1
+    p_value, discrimination = stat
+    if (discrimination is not None and discrimination < 0) or not 0.1 <= p_value <= 0.95:
+        return 2
+    if discrimination is not None and discrimination >= 0.2:
+        return 0
+    return 1
 
 
 def _fallback_practice(subject, grade, topic, count):
@@ -256,7 +280,7 @@ def _fallback_practice(subject, grade, topic, count):
 
 def _is_ollama_error(response):
     """Check if the Ollama response is an error message."""
-    if not response:
+    if is_error_response(response):
         return True
     return 'trouble thinking' in response.lower() or 'error:' in response.lower()
 
@@ -275,7 +299,7 @@ def generate_lesson():
     data = request.get_json()
     subject = data.get('subject', 'math')
     grade = data.get('grade', 3)
-    topic = data.get('topic', '')
+    topic = clip_text(data.get('topic', ''), TOPIC_TOKENS)
 
     if not topic:
         return jsonify({'error': 'Topic is required'}), 400
@@ -290,12 +314,11 @@ def generate_lesson():
 
     # Try LLM first
     system = load_prompt('content_generator.txt', subject=subject, grade=grade, topic=topic)
-    messages = [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': f'Create a detailed lesson about "{topic}" for grade {grade} {subject}. Return valid JSON with keys: title, explanation, examples (array of {{problem, answer, explanation}}), key_vocabulary (array of strings), real_world (string), practice_problems (array of {{type, question, answer, options (if multiple_choice), correct (index if mc), hint}}).'}
-    ]
+    messages = build_messages(system, [
+        ('user', f'Create a detailed lesson about "{topic}" for grade {grade} {subject}. Return valid JSON with keys: title, explanation, examples (array of {{problem, answer, explanation}}), key_vocabulary (array of strings), real_world (string), practice_problems (array of {{type, question, answer, options (if multiple_choice), correct (index if mc), hint}}).')
+    ], max_tokens=1500)
 
-    response = call_ollama(messages, max_tokens=1500, temperature=0.7)
+    response = call_ollama_shared(ck, messages, max_tokens=1500, temperature=0.7, priority=BATCH)
     parsed = parse_json_response(response)
 
     if not parsed or _is_ollama_error(response):
@@ -326,7 +349,7 @@ def generate_quiz():
     data = request.get_json()
     subject = data.get('subject', 'math')
     grade = data.get('grade', 3)
-    topic = data.get('topic', '')
+    topic = clip_text(data.get('topic', ''), TOPIC_TOKENS)
     count = min(data.get('count', 5), 15)
 
     if not topic:
@@ -339,16 +362,16 @@ def generate_quiz():
         return jsonify({'questions': json.loads(cached), 'cached': True})
 
     system = f"You are a quiz generator for grade {grade} {subject}. Generate exactly {count} quiz questions about {topic}."
-    messages = [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': f'Generate {count} quiz questions about "{topic}". Return a JSON array where each item has: type ("multiple_choice" or "fill_in"), question (string), options (array of 4 strings, only for multiple_choice), correct (index 0-3 for mc), answer (string for fill_in), hint (string). Make them appropriate for grade {grade}.'}
-    ]
+    messages = build_messages(system, [
+        ('user', f'Generate {count} quiz questions about "{topic}". Return a JSON array where each item has: type ("multiple_choice" or "fill_in"), question (string), options (array of 4 strings, only for multiple_choice), correct (index 0-3 for mc), answer (string for fill_in), hint (string). Make them appropriate for grade {grade}.')
+    ], max_tokens=1500)
 
-    response = call_ollama(messages, max_tokens=1500, temperature=0.8)
+    response = call_ollama_shared(ck, messages, max_tokens=1500, temperature=0.8, priority=BATCH)
     parsed = parse_json_response(response)
 
     if not parsed or not isinstance(parsed, list) or _is_ollama_error(response):
-        parsed = _fallback_quiz(subject, grade, topic, count)
+        item_analysis.maybe_refresh(current_app.db_manager)
+        parsed = _fallback_quiz(subject, grade, topic, count, db)
 
     if not parsed:
         return jsonify({'questions': [], 'error': 'No matching content found for this topic.'}), 200
@@ -377,7 +400,7 @@ def generate_flashcards():
     data = request.get_json()
     subject = data.get('subject', 'math')
     grade = data.get('grade', 3)
-    topic = data.get('topic', '')
+    topic = clip_text(data.get('topic', ''), TOPIC_TOKENS)
     count = min(data.get('count', 8), 20)
 
     if not topic:
@@ -390,12 +413,11 @@ def generate_flashcards():
         return jsonify({'flashcards': json.loads(cached), 'cached': True})
 
     system = load_prompt('flashcard_generator.txt', subject=subject, grade=grade, topic=topic, count=count)
-    messages = [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': f'Generate {count} flashcards about "{topic}" for grade {grade} {subject}. Return a JSON array of objects with: front (question/term), back (answer/definition), hint (optional helper text).'}
-    ]
+    messages = build_messages(system, [
+        ('user', f'Generate {count} flashcards about "{topic}" for grade {grade} {subject}. Return a JSON array of objects with: front (question/term), back (answer/definition), hint (optional helper text).')
+    ], max_tokens=1000)
 
-    response = call_ollama(messages, max_tokens=1000, temperature=0.7)
+    response = call_ollama_shared(ck, messages, max_tokens=1000, temperature=0.7, priority=BATCH)
     parsed = parse_json_response(response)
 
     if not parsed or not isinstance(parsed, list) or _is_ollama_error(response):
@@ -433,7 +455,7 @@ def generate_practice():
     data = request.get_json()
     subject = data.get('subject', 'math')
     grade = data.get('grade', 3)
-    topic = data.get('topic', '')
+    topic = clip_text(data.get('topic', ''), TOPIC_TOKENS)
     count = min(data.get('count', 5), 15)
     types = data.get('types', ['multiple_choice', 'fill_in'])
 
@@ -444,12 +466,13 @@ def generate_practice():
 
     type_str = ', '.join(types)
     system = f"You are a practice problem generator for grade {grade} {subject}."
-    messages = [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': f'Generate {count} practice problems about "{topic}" using these types: {type_str}. Return a JSON array where each item has: type, question, answer, options (for mc), correct (index for mc), hint. Grade level: {grade}.'}
-    ]
+    messages = build_messages(system, [
+        ('user', f'Generate {count} practice problems about "{topic}" using these types: {type_str}. Return a JSON array where each item has: type, question, answer, options (for mc), correct (index for mc), hint. Grade level: {grade}.')
+    ], max_tokens=1200)
 
-    response = call_ollama(messages, max_tokens=1200, temperature=0.8)
+    # Not cached (practice sets should vary), but identical concurrent requests share a generation
+    ck = make_cache_key('practice', subject, grade, topic, count, types)
+    response = call_ollama_shared(ck, messages, max_tokens=1200, temperature=0.8, priority=BATCH)
     parsed = parse_json_response(response)
 
     if not parsed or not isinstance(parsed, list) or _is_ollama_error(response):
@@ -524,18 +547,12 @@ def delete_saved_item(item_id):
 
 def _validate_math_problems(problems):
     """Validate math problem answers using Python computation."""
-    try:
-        from fractions import Fraction
-        for prob in problems:
-            answer = prob.get('answer')
-            if answer and isinstance(answer, str):
-                try:
-                    val = eval(answer.replace('x', '*').replace('^', '**'),
-                             {"__builtins__": {}},
-                             {"Fraction": Fraction, "abs": abs, "round": round})
-                    prob['_validated'] = True
-                except Exception:
-                    pass
-    except Exception:
-        pass
+    for prob in problems:
+        answer = prob.get('answer')
+        if answer and isinstance(answer, str):
+            try:
+                evaluate_expression(answer.replace('x', '*'))
+                prob['_validated'] = True
+            except ExpressionError:
+                pass
     return problems
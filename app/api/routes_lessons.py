@@ -1,8 +1,8 @@
 """Lesson and curriculum content routes."""
 
 import os
-import json
 from flask import Blueprint, request, jsonify, session, current_app
+from api import curriculum_store, leaderboard
 
 lessons_bp = Blueprint('lessons', __name__)
 
@@ -12,25 +12,17 @@ def get_db():
 
 
 def load_curriculum_file(subject, grade):
-    """Load a grade's curriculum JSON file."""
-    content_dir = current_app.config['CONTENT_DIR']
-    grade_str = 'k' if grade == 0 else str(grade)
-    filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-    if not os.path.exists(filepath):
-        return None
-    with open(filepath, 'r') as f:
-        return json.load(f)
+    """Load a grade's curriculum JSON file (shared, read-only)."""
+    return curriculum_store.load_curriculum(subject, grade)
 
 
 @lessons_bp.route('/curriculum', methods=['GET'])
 def get_curriculum():
     """Get the master curriculum map."""
     content_dir = current_app.config['CONTENT_DIR']
-    filepath = os.path.join(content_dir, 'curriculum_map.json')
-    if not os.path.exists(filepath):
+    data = curriculum_store.load_json(os.path.join(content_dir, 'curriculum_map.json'))
+    if data is None:
         return jsonify({'error': 'Curriculum map not found'}), 404
-    with open(filepath, 'r') as f:
-        data = json.load(f)
     return jsonify(data)
 
 
@@ -50,33 +42,30 @@ def get_subject_grade(subject, grade):
         ).fetchall()
         completed_ids = set(row['lesson_id'] for row in completed)
 
-        for unit in data.get('units', []):
-            for lesson in unit.get('lessons', []):
-                lesson['completed'] = lesson['id'] in completed_ids
+        # Cached curriculum is shared, so annotate copies
+        data = dict(data)
+        data['units'] = [
+            dict(unit, lessons=[
+                dict(lesson, completed=lesson['id'] in completed_ids)
+                for lesson in unit.get('lessons', [])
+            ])
+            for unit in data.get('units', [])
+        ]
 
     return jsonify(data)
 
 
 @lessons_bp.route('/lesson/<lesson_id>', methods=['GET'])
 def get_lesson(lesson_id):
-    """Get a specific lesson by ID."""
+    """Get a specific lesson by ID (subject and grade are optional hints)."""
     subject = request.args.get('subject')
     grade = request.args.get('grade', type=int)
 
-    if not subject or grade is None:
-        return jsonify({'error': 'subject and grade parameters required'}), 400
-
-    data = load_curriculum_file(subject, grade)
-    if not data:
-        return jsonify({'error': 'Content not found'}), 404
-
-    # Find the lesson
-    for unit in data.get('units', []):
-        for lesson in unit.get('lessons', []):
-            if lesson['id'] == lesson_id:
-                return jsonify(lesson)
+    found = curriculum_store.find_lesson(lesson_id, subject, grade)
+    if not found:
+        return jsonify({'error': 'Lesson not found'}), 404
 
-    return jsonify({'error': 'Lesson not found'}), 404
+    return jsonify(found[3])
 
 
 @lessons_bp.route('/lesson/<lesson_id>/complete', methods=['POST'])
@@ -117,18 +106,15 @@ def complete_lesson(lesson_id):
 
     # Award XP if passing score
     xp_award = 0
+    award = None
     if score >= 70:
         xp_award = 20
         if score == 100:
             xp_award += 10  # bonus for perfect
-        db.execute('UPDATE users SET xp = xp + ? WHERE id = ?', (xp_award, user_id))
-
-        # Update level
-        user = db.execute('SELECT xp FROM users WHERE id = ?', (user_id,)).fetchone()
-        new_level = calculate_level(user['xp'])
-        db.execute('UPDATE users SET level = ? WHERE id = ?', (new_level, user_id))
+        award = leaderboard.award_xp(db, user_id, xp_award)
 
     db.commit()
+    leaderboard.apply_award(award)
 
     return jsonify({'message': 'Lesson completed', 'xp_awarded': xp_award})
 
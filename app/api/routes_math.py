@@ -1,12 +1,15 @@
 """Math engine API routes - answer checking, step-by-step solving."""
 
 from flask import Blueprint, request, jsonify
-from math_engine.answer_validator import validate_answer
+from math_engine.answer_validator import validate_answer, compile_answer
 from math_engine.step_solver import solve_steps
 from math_engine.problem_generator import generate_problems
 
 math_bp = Blueprint('math', __name__)
 
+# Most answers one /check-batch request may carry (a class set of a long quiz)
+MAX_BATCH_ITEMS = 2000
+
 
 @math_bp.route('/check', methods=['POST'])
 def check_answer():
@@ -27,6 +30,40 @@ def check_answer():
     })
 
 
+@math_bp.route('/check-batch', methods=['POST'])
+def check_answers_batch():
+    """Validate many answers in one request, e.g. a whole quiz or a class set.
+
+    Body: {"items": [{"student_answer": ..., "correct_answer": ..., "id": optional}, ...]}.
+    Results come back in the same order; an item missing either answer is
+    marked incorrect with an error rather than failing the batch.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list):
+        return jsonify({'error': 'items (a list) is required'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'At most {MAX_BATCH_ITEMS} items per request'}), 400
+
+    results = []
+    correct_count = 0
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        student_answer = item.get('student_answer', '')
+        correct_answer = item.get('correct_answer', '')
+        result = {'correct': False}
+        if 'id' in item:
+            result['id'] = item['id']
+        if student_answer in ('', None) or correct_answer in ('', None):
+            result['error'] = 'Both student_answer and correct_answer required'
+        else:
+            result['correct'] = compile_answer(correct_answer).check(student_answer)
+            correct_count += result['correct']
+        results.append(result)
+
+    return jsonify({'results': results, 'correct': correct_count, 'total': len(results)})
+
+
 @math_bp.route('/solve', methods=['POST'])
 def solve():
     """Get step-by-step solution for a math problem."""
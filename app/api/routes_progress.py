@@ -1,10 +1,10 @@
 """Progress tracking, badges, leaderboard, daily challenges."""
 
-import os
 import json
 import random
 import datetime
 from flask import Blueprint, request, jsonify, session, current_app
+from api import curriculum_store, leaderboard
 
 progress_bp = Blueprint('progress', __name__)
 
@@ -18,50 +18,36 @@ def get_progress(student_id):
     """Get student progress summary."""
     db = get_db()
 
-    # Subject breakdown
-    subjects = {}
-    for subject in ['math', 'science', 'ela', 'social_studies']:
-        row = db.execute(
-            '''SELECT COUNT(*) as completed,
-                      AVG(score) as avg_score
-               FROM lesson_progress
-               WHERE user_id = ? AND subject = ? AND completed = 1''',
-            (student_id, subject)
-        ).fetchone()
-
-        # Count total lessons available
-        content_dir = current_app.config['CONTENT_DIR']
-        user = db.execute('SELECT grade FROM users WHERE id = ?', (student_id,)).fetchone()
-        grade = user['grade'] if user else 3
-        grade_str = 'k' if grade == 0 else str(grade)
-        filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-        total = 0
-        if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-                for unit in data.get('units', []):
-                    total += len(unit.get('lessons', []))
+    totals = db.execute(
+        '''SELECT (SELECT grade FROM users WHERE id = ?) as grade,
+                  (SELECT COUNT(*) FROM quiz_results WHERE user_id = ? AND score >= 70) as quizzes''',
+        (student_id, student_id)
+    ).fetchone()
+    grade = totals['grade'] if totals['grade'] is not None else 3
+
+    # Subject breakdown in one grouped query
+    rows = db.execute(
+        '''SELECT subject, COUNT(*) as completed, AVG(score) as avg_score
+           FROM lesson_progress
+           WHERE user_id = ? AND completed = 1
+           GROUP BY subject''',
+        (student_id,)
+    ).fetchall()
+    by_subject = {row['subject']: row for row in rows}
 
+    subjects = {}
+    for subject in curriculum_store.SUBJECTS:
+        row = by_subject.get(subject)
         subjects[subject] = {
             'completed': row['completed'] if row else 0,
-            'total': max(total, 1),
+            'total': max(curriculum_store.lesson_count(subject, grade), 1),
             'avg_score': row['avg_score'] if row else None
         }
 
-    total_lessons = db.execute(
-        'SELECT COUNT(*) as cnt FROM lesson_progress WHERE user_id = ? AND completed = 1',
-        (student_id,)
-    ).fetchone()['cnt']
-
-    total_quizzes = db.execute(
-        'SELECT COUNT(*) as cnt FROM quiz_results WHERE user_id = ? AND score >= 70',
-        (student_id,)
-    ).fetchone()['cnt']
-
     return jsonify({
         'subjects': subjects,
-        'total_lessons': total_lessons,
-        'total_quizzes': total_quizzes
+        'total_lessons': sum(row['completed'] for row in rows),
+        'total_quizzes': totals['quizzes']
     })
 
 
@@ -169,17 +155,16 @@ def submit_daily_challenge_handler():
         (str(answer), correct, datetime.datetime.now().isoformat(), user_id, today)
     )
 
+    award = None
     if xp_award > 0:
-        db.execute('UPDATE users SET xp = xp + ? WHERE id = ?', (xp_award, user_id))
-        from api.routes_lessons import calculate_level
-        user = db.execute('SELECT xp FROM users WHERE id = ?', (user_id,)).fetchone()
-        db.execute('UPDATE users SET level = ? WHERE id = ?', (calculate_level(user['xp']), user_id))
+        award = leaderboard.award_xp(db, user_id, xp_award)
 
         # Daily challenge badge
         from api.routes_quiz import _award_badge
         _award_badge(db, user_id, 'daily_challenger', 'Challenge Accepted', 'Complete a daily challenge')
 
     db.commit()
+    leaderboard.apply_award(award)
 
     return jsonify({
         'correct': correct,
@@ -206,21 +191,14 @@ def get_vocabulary():
         (user_id,)
     ).fetchall()
 
-    content_dir = current_app.config['CONTENT_DIR']
-    grade_str = 'k' if grade == 0 else str(grade)
     words = []
 
-    subjects = [subject_filter] if subject_filter else ['math', 'science', 'ela', 'social_studies']
+    subjects = [subject_filter] if subject_filter else curriculum_store.SUBJECTS
     completed_ids = {row['lesson_id'] for row in completed}
 
     for subject in subjects:
-        filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-        if not os.path.exists(filepath):
-            continue
-        try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, IOError):
+        data = curriculum_store.load_curriculum(subject, grade)
+        if not data:
             continue
 
         for unit in data.get('units', []):
@@ -252,20 +230,14 @@ def _generate_daily_challenge(grade):
     subjects = ['math', 'science', 'ela', 'social_studies']
     subject = random.choice(subjects)
 
-    content_dir = current_app.config['CONTENT_DIR']
-    grade_str = 'k' if grade == 0 else str(grade)
-    filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-
-    if not os.path.exists(filepath):
+    data = curriculum_store.load_curriculum(subject, grade)
+    if not data:
         # Try math as fallback
-        filepath = os.path.join(content_dir, 'math', f'{grade_str}.json')
         subject = 'math'
-        if not os.path.exists(filepath):
+        data = curriculum_store.load_curriculum(subject, grade)
+        if not data:
             return None
 
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-
     # Collect all practice problems
     problems = []
     for unit in data.get('units', []):
@@ -1,9 +1,10 @@
 """Quiz routes - serving quizzes, submitting answers, scoring."""
 
-import os
 import json
 import datetime
 from flask import Blueprint, request, jsonify, session, current_app
+from api import curriculum_store, leaderboard
+from api.quiz_grading import grade_quiz
 
 quiz_bp = Blueprint('quiz', __name__)
 
@@ -14,37 +15,24 @@ def get_db():
 
 @quiz_bp.route('/<unit_id>', methods=['GET'])
 def get_quiz(unit_id):
-    """Get quiz questions for a unit."""
+    """Get quiz questions for a unit (subject and grade are optional hints)."""
     subject = request.args.get('subject')
     grade = request.args.get('grade', type=int)
 
-    if not subject or grade is None:
-        return jsonify({'error': 'subject and grade parameters required'}), 400
+    found = curriculum_store.find_unit(unit_id, subject, grade)
+    if not found:
+        return jsonify({'error': 'Unit not found'}), 404
 
-    content_dir = current_app.config['CONTENT_DIR']
-    grade_str = 'k' if grade == 0 else str(grade)
-    filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-
-    if not os.path.exists(filepath):
-        return jsonify({'error': 'Content not found'}), 404
-
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-
-    # Find the unit
-    for unit in data.get('units', []):
-        if unit['id'] == unit_id:
-            quiz = unit.get('unit_quiz', {})
-            return jsonify({
-                'unit_id': unit_id,
-                'title': f"{unit['title']} Quiz",
-                'questions': quiz.get('questions', []),
-                'passing_score': quiz.get('passing_score', 70),
-                'xp_reward': quiz.get('xp_reward', 50),
-                'badge': quiz.get('badge', None)
-            })
-
-    return jsonify({'error': 'Unit not found'}), 404
+    unit = found[2]
+    quiz = unit.get('unit_quiz', {})
+    return jsonify({
+        'unit_id': unit_id,
+        'title': f"{unit['title']} Quiz",
+        'questions': quiz.get('questions', []),
+        'passing_score': quiz.get('passing_score', 70),
+        'xp_reward': quiz.get('xp_reward', 50),
+        'badge': quiz.get('badge', None)
+    })
 
 
 @quiz_bp.route('/submit', methods=['POST'])
@@ -57,24 +45,41 @@ def submit_quiz():
     quiz_id = data.get('quiz_id')
     subject = data.get('subject')
     grade = data.get('grade')
-    score = data.get('score', 0)
-    total_questions = data.get('total_questions', 0)
-    correct_answers = data.get('correct_answers', 0)
     time_spent = data.get('time_spent_seconds', 0)
     answers = data.get('answers', [])
 
+    # Grade against the curriculum's copy of the quiz; client scores are ignored
+    found = curriculum_store.find_unit(quiz_id, subject, grade) if quiz_id else None
+    if not found:
+        return jsonify({'error': 'Quiz not found'}), 404
+    subject, grade, unit = found
+    questions = (unit.get('unit_quiz') or {}).get('questions', [])
+    results, correct_answers = grade_quiz(questions, answers, subject)
+    total_questions = len(questions)
+    # Rounded half up, as the quiz page displays it
+    score = int(correct_answers * 100 / total_questions + 0.5) if total_questions else 0
+
     db = get_db()
     user_id = session['user_id']
 
-    # Record quiz result
-    db.execute(
+    # Record the quiz result and its per-question rows in one transaction
+    cur = db.execute(
         '''INSERT INTO quiz_results
            (user_id, quiz_id, subject, grade, score, total_questions, correct_answers, time_spent_seconds, answers_json)
            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
         (user_id, quiz_id, subject, grade, score, total_questions, correct_answers, time_spent, json.dumps(answers))
     )
+    result_id = cur.lastrowid
+    db.executemany(
+        '''INSERT INTO quiz_answers
+           (result_id, user_id, quiz_id, question_index, question_type, answer, correct)
+           VALUES (?, ?, ?, ?, ?, ?, ?)''',
+        [(result_id, user_id, quiz_id, r['question_index'], r['question_type'], r['answer'], int(r['correct']))
+         for r in results]
+    )
 
     xp_award = 0
+    award = None
     badges_earned = []
     passing_score = 70
 
@@ -100,19 +105,17 @@ def submit_quiz():
             _award_badge(db, user_id, 'first_quiz', 'Quiz Taker', 'Complete your first quiz')
             badges_earned.append('first_quiz')
 
-        db.execute('UPDATE users SET xp = xp + ? WHERE id = ?', (xp_award, user_id))
-
-        # Update level
-        from api.routes_lessons import calculate_level
-        user = db.execute('SELECT xp FROM users WHERE id = ?', (user_id,)).fetchone()
-        new_level = calculate_level(user['xp'])
-        db.execute('UPDATE users SET level = ? WHERE id = ?', (new_level, user_id))
+        award = leaderboard.award_xp(db, user_id, xp_award)
 
     db.commit()
+    leaderboard.apply_award(award)
 
     return jsonify({
         'message': 'Quiz submitted',
         'score': score,
+        'correct_answers': correct_answers,
+        'total_questions': total_questions,
+        'results': [{'question_index': r['question_index'], 'correct': r['correct']} for r in results],
         'passed': score >= passing_score,
         'xp_awarded': xp_award,
         'badges_earned': badges_earned
@@ -1,104 +1,57 @@
 """Search across all curriculum content."""
 
-import os
-import json
+import threading
 from flask import Blueprint, request, jsonify, current_app
+from api.search_engine import (SearchIndex, MappedSearchIndex, lesson_documents,
+                               content_fingerprint, write_index)
 
 search_bp = Blueprint('search', __name__)
 
-# In-memory search index, built on first call
+# Search index, mapped from disk (or built) on first call
 _search_index = None
+_build_lock = threading.Lock()
 
 
 def _build_index():
-    """Build search index from all curriculum JSON files."""
+    """Load the on-disk search index, rebuilding it if content has changed."""
     global _search_index
-    content_dir = current_app.config['CONTENT_DIR']
-    index = []
+    with _build_lock:
+        if _search_index is not None:
+            return _search_index
 
-    for subject in ['math', 'science', 'ela', 'social_studies']:
-        subject_dir = os.path.join(content_dir, subject)
-        if not os.path.isdir(subject_dir):
-            continue
+        content_dir = current_app.config['CONTENT_DIR']
+        index_path = current_app.config['SEARCH_INDEX_PATH']
+        fingerprint = content_fingerprint(content_dir)
 
-        for filename in os.listdir(subject_dir):
-            if not filename.endswith('.json'):
-                continue
-
-            grade_str = filename.replace('.json', '')
-            grade = 0 if grade_str == 'k' else int(grade_str) if grade_str.isdigit() else None
-            if grade is None:
-                continue
-
-            filepath = os.path.join(subject_dir, filename)
+        index = MappedSearchIndex.open(index_path, fingerprint)
+        if index is None:
+            index = SearchIndex.build(lesson_documents(content_dir))
             try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                continue
-
-            for unit in data.get('units', []):
-                for lesson in unit.get('lessons', []):
-                    content = lesson.get('content', {})
-                    searchable = ' '.join([
-                        lesson.get('title', ''),
-                        unit.get('title', ''),
-                        content.get('explanation', ''),
-                        ' '.join(content.get('key_vocabulary', [])),
-                        content.get('real_world', '')
-                    ]).lower()
+                write_index(index, index_path, fingerprint)
+                index = MappedSearchIndex.open(index_path, fingerprint) or index
+            except OSError:
+                pass  # Read-only media: serve the in-memory index
 
-                    index.append({
-                        'lesson_id': lesson.get('id', ''),
-                        'title': lesson.get('title', ''),
-                        'unit_title': unit.get('title', ''),
-                        'subject': subject,
-                        'grade': grade,
-                        'searchable': searchable
-                    })
-
-    _search_index = index
-    return index
+        _search_index = index
+    return _search_index
 
 
 @search_bp.route('/search', methods=['GET'])
 def search():
-    """Search across all curriculum content."""
+    """Search across all curriculum content.
+
+    Query params: q (required), subject and grade (optional filters),
+    limit (default 20, max 50).
+    """
     query = request.args.get('q', '').strip().lower()
     if len(query) < 2:
         return jsonify({'results': []})
 
-    global _search_index
-    if _search_index is None:
-        _build_index()
-
-    results = []
-    terms = query.split()
-
-    for item in _search_index:
-        # All terms must appear in searchable text
-        if all(term in item['searchable'] for term in terms):
-            # Build context snippet
-            text = item['searchable']
-            pos = text.find(terms[0])
-            start = max(0, pos - 30)
-            end = min(len(text), pos + 60)
-            context = text[start:end].strip()
-            if start > 0:
-                context = '...' + context
-            if end < len(text):
-                context = context + '...'
-
-            results.append({
-                'lesson_id': item['lesson_id'],
-                'title': item['title'],
-                'unit_title': item['unit_title'],
-                'subject': item['subject'],
-                'grade': item['grade'],
-                'context': context
-            })
+    subject = request.args.get('subject') or None
+    grade = request.args.get('grade', type=int)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
 
-    # Sort: exact title matches first
-    results.sort(key=lambda r: (0 if query in r['title'].lower() else 1))
+    index = _search_index or _build_index()
+    results = index.search(query, subject=subject, grade=grade, limit=limit)
 
-    return jsonify({'results': results[:20]})
+    return jsonify({'results': results})
@@ -3,7 +3,8 @@
 import io
 import csv
 import json
-from flask import Blueprint, request, jsonify, session, current_app, Response
+from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context
+from api import leaderboard, item_analysis
 
 teacher_bp = Blueprint('teacher', __name__)
 
@@ -81,6 +82,119 @@ def student_report(student_id):
     })
 
 
+REPORT_FIELDS = ('progress', 'quizzes', 'badges')
+
+
+@teacher_bp.route('/reports', methods=['GET'])
+@require_teacher
+def student_reports():
+    """Bulk version of /report/<id> for whole-class dashboards.
+
+    Query params:
+      ids       comma-separated student IDs (optional)
+      grade     only students in this grade (optional)
+      fields    subset of progress,quizzes,badges (default: all)
+      page, per_page   pagination over students ordered by name (per_page max 200)
+      quiz_limit       recent quizzes per student (default 20)
+
+    Runs a fixed number of queries regardless of how many students match.
+    """
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be comma-separated integers'}), 400
+    grade = request.args.get('grade', type=int)
+    fields = request.args.get('fields')
+    fields = set(REPORT_FIELDS) if not fields else {f.strip() for f in fields.split(',')}
+    unknown = fields - set(REPORT_FIELDS)
+    if unknown:
+        return jsonify({'error': f'Unknown fields: {", ".join(sorted(unknown))}'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 200))
+    quiz_limit = max(1, min(request.args.get('quiz_limit', 20, type=int), 100))
+
+    where = ['role = ?']
+    params = ['student']
+    if ids:
+        where.append(f'id IN ({",".join("?" * len(ids))})')
+        params += ids
+    if grade is not None:
+        where.append('grade = ?')
+        params.append(grade)
+    where_sql = ' AND '.join(where)
+
+    db = get_db()
+    total = db.execute(f'SELECT COUNT(*) as cnt FROM users WHERE {where_sql}', params).fetchone()['cnt']
+    students = db.execute(
+        f'SELECT * FROM users WHERE {where_sql} ORDER BY name LIMIT ? OFFSET ?',
+        params + [per_page, (page - 1) * per_page]
+    ).fetchall()
+
+    reports = {}
+    for student in students:
+        report = {'student': dict(student)}
+        if 'progress' in fields:
+            report['progress'] = [
+                {'subject': subject, 'completed': 0, 'avg_score': None}
+                for subject in ['math', 'science', 'ela', 'social_studies']
+            ]
+        if 'quizzes' in fields:
+            report['quizzes'] = []
+        if 'badges' in fields:
+            report['badges'] = []
+        reports[student['id']] = report
+
+    page_ids = list(reports)
+    if page_ids:
+        in_sql = ','.join('?' * len(page_ids))
+
+        if 'progress' in fields:
+            rows = db.execute(
+                f'''SELECT user_id, subject, COUNT(*) as completed, AVG(score) as avg_score
+                    FROM lesson_progress
+                    WHERE user_id IN ({in_sql}) AND completed = 1
+                    GROUP BY user_id, subject''',
+                page_ids
+            ).fetchall()
+            for row in rows:
+                for entry in reports[row['user_id']]['progress']:
+                    if entry['subject'] == row['subject']:
+                        entry['completed'] = row['completed']
+                        entry['avg_score'] = row['avg_score']
+
+        if 'quizzes' in fields:
+            rows = db.execute(
+                f'''SELECT user_id, quiz_id, subject, score, total_questions, correct_answers, completed_at
+                    FROM (SELECT *, ROW_NUMBER() OVER (
+                              PARTITION BY user_id ORDER BY completed_at DESC) as rn
+                          FROM quiz_results WHERE user_id IN ({in_sql}))
+                    WHERE rn <= ?
+                    ORDER BY user_id, completed_at DESC''',
+                page_ids + [quiz_limit]
+            ).fetchall()
+            for row in rows:
+                quiz = dict(row)
+                reports[quiz.pop('user_id')]['quizzes'].append(quiz)
+
+        if 'badges' in fields:
+            rows = db.execute(
+                f'''SELECT user_id, badge_id, badge_name, badge_description, earned_at
+                    FROM badges WHERE user_id IN ({in_sql})''',
+                page_ids
+            ).fetchall()
+            for row in rows:
+                badge = dict(row)
+                reports[badge.pop('user_id')]['badges'].append(badge)
+
+    return jsonify({
+        'reports': list(reports.values()),
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page
+    })
+
+
 @teacher_bp.route('/student/<int:student_id>', methods=['PUT'])
 @require_teacher
 def update_student(student_id):
@@ -102,6 +216,7 @@ def update_student(student_id):
         db.execute('UPDATE users SET name = ?, grade = ?, avatar = ? WHERE id = ?',
                    (name, grade, avatar, student_id))
     db.commit()
+    leaderboard.invalidate()
     return jsonify({'message': 'Student updated'})
 
 
@@ -114,8 +229,11 @@ def delete_student(student_id):
     if not student:
         return jsonify({'error': 'Student not found'}), 404
 
-    # Cascade delete all related data
+    # Cascade delete all related data (queued chat replies first)
+    current_app.chat_writer.flush_session(student_id)
     db.execute('DELETE FROM lesson_progress WHERE user_id = ?', (student_id,))
+    db.execute('DELETE FROM quiz_answers WHERE user_id = ?', (student_id,))
+    item_analysis.invalidate(db)
     db.execute('DELETE FROM quiz_results WHERE user_id = ?', (student_id,))
     db.execute('DELETE FROM badges WHERE user_id = ?', (student_id,))
     db.execute('DELETE FROM chat_history WHERE user_id = ?', (student_id,))
@@ -125,11 +243,40 @@ def delete_student(student_id):
     db.execute('DELETE FROM flashcards WHERE user_id = ?', (student_id,))
     db.execute('DELETE FROM notes WHERE user_id = ?', (student_id,))
     db.execute('DELETE FROM bookmarks WHERE user_id = ?', (student_id,))
+    db.execute('DELETE FROM weekly_xp WHERE user_id = ?', (student_id,))
     db.execute('DELETE FROM users WHERE id = ?', (student_id,))
     db.commit()
+    leaderboard.invalidate()
     return jsonify({'message': 'Student deleted'})
 
 
+@teacher_bp.route('/item-analysis', methods=['GET'])
+@require_teacher
+def item_analysis_report():
+    """Per-question difficulty, discrimination and common wrong answers.
+
+    Query params: quiz_id (default: all quizzes), order (hardest, easiest,
+    discrimination), min_attempts, limit, refresh=1 to start folding in the
+    latest submissions now instead of waiting for the periodic refresh.
+    Refreshes run in the background; 'refreshing' is true while one is
+    in progress and the report reflects the previous one.
+    """
+    quiz_id = request.args.get('quiz_id') or None
+    order = request.args.get('order', 'hardest')
+    min_attempts = request.args.get('min_attempts', item_analysis.MIN_ATTEMPTS, type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+
+    refreshing = item_analysis.maybe_refresh(current_app.db_manager,
+                                             force=request.args.get('refresh') == '1')
+    db = get_db()
+    state = db.execute('SELECT refreshed_at FROM item_stats_state WHERE id = 1').fetchone()
+    return jsonify({
+        'items': item_analysis.item_report(db, quiz_id, min_attempts, order, limit),
+        'refreshed_at': state['refreshed_at'] if state else None,
+        'refreshing': refreshing,
+    })
+
+
 @teacher_bp.route('/network-info', methods=['GET'])
 @require_teacher
 def network_info():
@@ -149,6 +296,31 @@ def network_info():
     return jsonify({'ip': ip, 'port': port, 'url': url})
 
 
+@teacher_bp.route('/stats', methods=['GET'])
+@require_teacher
+def server_stats():
+    """Return internal cache and performance counters."""
+    from api import curriculum_store
+    from api.ollama_client import get_client
+    from api.llm_utils import inflight_stats, prompt_stats
+    from api.llm_context import context_stats
+    from api.llm_cache import get_cache
+    from api.stream_relay import get_relay
+    from math_engine.solver_pool import get_pool
+    return jsonify({
+        'curriculum_cache': curriculum_store.cache_stats(),
+        'db_pool': current_app.db_manager.stats(),
+        'llm_client': get_client().stats(),
+        'llm_inflight': inflight_stats(),
+        'llm_context': context_stats(),
+        'prompts': prompt_stats(),
+        'llm_cache': get_cache().stats(get_db()),
+        'stream_relay': get_relay().stats(),
+        'chat_writer': current_app.chat_writer.stats(),
+        'math_solver': get_pool().stats()
+    })
+
+
 @teacher_bp.route('/settings', methods=['GET'])
 @require_teacher
 def get_settings():
@@ -171,39 +343,102 @@ def update_settings():
             (key, str(value), str(value))
         )
     db.commit()
+    leaderboard.settings_changed()
     return jsonify({'message': 'Settings updated'})
 
 
+EXPORT_SUBJECTS = [
+    ('math', 'Math'),
+    ('science', 'Science'),
+    ('ela', 'ELA'),
+    ('social_studies', 'Social Studies'),
+]
+
+
+def _export_query(include):
+    """Build the single pivoted export query and its CSV header."""
+    header = ['Name', 'Grade', 'XP', 'Level', 'Streak']
+    lesson_cols = []
+    select = ['u.name', 'u.grade', 'u.xp', 'u.level', 'u.streak_days']
+
+    for subject, label in EXPORT_SUBJECTS:
+        lesson_cols.append(f"SUM(subject = '{subject}') AS {subject}_lessons")
+        header.append(f'{label} Lessons')
+        select.append(f'COALESCE(lp.{subject}_lessons, 0)')
+    header.append('Quizzes Passed')
+    select.append('COALESCE(qr.passed, 0)')
+
+    if 'avg_scores' in include:
+        for subject, label in EXPORT_SUBJECTS:
+            lesson_cols.append(f"ROUND(AVG(CASE WHEN subject = '{subject}' THEN score END), 1) AS {subject}_avg")
+            header.append(f'{label} Avg Score')
+            select.append(f'lp.{subject}_avg')
+        header.append('Quiz Avg Score')
+        select.append('qr.avg_score')
+
+    if 'time_spent' in include:
+        lesson_cols.append('SUM(time_spent_seconds) AS lesson_seconds')
+        header += ['Lesson Minutes', 'Quiz Minutes']
+        select += ['ROUND(COALESCE(lp.lesson_seconds, 0) / 60.0, 1)',
+                   'ROUND(COALESCE(qr.quiz_seconds, 0) / 60.0, 1)']
+
+    sql = f'''SELECT {', '.join(select)}
+        FROM users u
+        LEFT JOIN (SELECT user_id, {', '.join(lesson_cols)}
+                   FROM lesson_progress WHERE completed = 1
+                   GROUP BY user_id) lp ON lp.user_id = u.id
+        LEFT JOIN (SELECT user_id,
+                          SUM(score >= 70) AS passed,
+                          ROUND(AVG(score), 1) AS avg_score,
+                          SUM(time_spent_seconds) AS quiz_seconds
+                   FROM quiz_results GROUP BY user_id) qr ON qr.user_id = u.id
+        WHERE u.role = 'student'
+        ORDER BY u.name'''
+    return sql, header
+
+
 @teacher_bp.route('/export', methods=['POST'])
 @require_teacher
 def export_csv():
+    """Stream a per-student CSV built from one grouped query.
+
+    Optional columns: include=avg_scores,time_spent (query string or JSON body).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    include = data.get('include') or request.args.get('include', '')
+    if isinstance(include, str):
+        include = include.split(',')
+    if not isinstance(include, list) or not all(isinstance(col, str) for col in include):
+        return jsonify({'error': 'include must be a comma-separated string or a list of column names'}), 400
+    include = {col.strip() for col in include}
+
+    sql, header = _export_query(include)
     db = get_db()
-    students = db.execute(
-        'SELECT id, name, grade, xp, level, streak_days FROM users WHERE role = ? ORDER BY name',
-        ('student',)
-    ).fetchall()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Name', 'Grade', 'XP', 'Level', 'Streak', 'Math Lessons', 'Science Lessons', 'ELA Lessons', 'Social Studies Lessons', 'Quizzes Passed'])
-
-    for student in students:
-        row = [student['name'], student['grade'], student['xp'], student['level'], student['streak_days']]
-        for subject in ['math', 'science', 'ela', 'social_studies']:
-            cnt = db.execute(
-                'SELECT COUNT(*) as cnt FROM lesson_progress WHERE user_id = ? AND subject = ? AND completed = 1',
-                (student['id'], subject)
-            ).fetchone()['cnt']
-            row.append(cnt)
-        quiz_cnt = db.execute(
-            'SELECT COUNT(*) as cnt FROM quiz_results WHERE user_id = ? AND score >= 70',
-            (student['id'],)
-        ).fetchone()['cnt']
-        row.append(quiz_cnt)
-        writer.writerow(row)
+    cursor = db.execute(sql)
+
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+
+        def flush():
+            chunk = buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+            return chunk
+
+        writer.writerow(header)
+        yield flush()
+        while True:
+            rows = cursor.fetchmany(100)
+            if not rows:
+                break
+            writer.writerows(tuple(row) for row in rows)
+            yield flush()
 
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=learnquest_progress.csv'}
     )
@@ -211,17 +446,28 @@ def export_csv():
 
 @teacher_bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Public leaderboard (check if enabled)."""
+    """Public leaderboard (check if enabled).
+
+    Query params: scope ('all' or 'weekly'), grade (optional). Served from
+    the materialized board with an ETag; unchanged boards return 304.
+    """
     db = get_db()
-    setting = db.execute("SELECT value FROM settings WHERE key = 'leaderboard_enabled'").fetchone()
-    if setting and setting['value'] != 'true':
+    if not leaderboard.is_enabled(db):
         return jsonify({'leaderboard': [], 'disabled': True})
 
-    students = db.execute(
-        'SELECT id, name, xp, level, streak_days FROM users WHERE role = ? ORDER BY xp DESC LIMIT 50',
-        ('student',)
-    ).fetchall()
-    return jsonify({'leaderboard': [dict(s) for s in students]})
+    scope = request.args.get('scope', 'all')
+    if scope not in ('all', 'weekly'):
+        return jsonify({'error': "scope must be 'all' or 'weekly'"}), 400
+    grade = request.args.get('grade', type=int)
+
+    rows, etag = leaderboard.get_board(db, scope=scope, grade=grade)
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = jsonify({'leaderboard': rows, 'scope': scope})
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 
 # Leaderboard also accessible at /api/leaderboard
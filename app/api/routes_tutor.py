@@ -1,10 +1,18 @@
 """AI Tutor routes - chat, hints, conversation management via Ollama/Phi-3."""
 
 import json
-import hashlib
 import datetime
 from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context
-from api.llm_utils import load_prompt, call_ollama, get_cached_response, cache_response
+from api.llm_utils import load_prompt, get_cached_response, cache_response, \
+    client_disconnected, call_ollama_shared, stream_ollama_shared, relay_ollama_stream
+from api.llm_context import build_messages
+from api.question_keys import chat_cache_key, hint_cache_key
+
+# Seconds between keep-alive comments while a chat request waits for a slot
+QUEUE_KEEPALIVE_SECONDS = 2
+# Reply budgets (Ollama num_predict), reserved out of the context window
+CHAT_MAX_TOKENS = 500
+HINT_MAX_TOKENS = 500
 
 tutor_bp = Blueprint('tutor', __name__)
 
@@ -31,8 +39,11 @@ def chat():
 
     db = get_db()
     user_id = session['user_id']
+    writer = current_app.chat_writer
+    # The previous reply may still be queued; history below must include it
+    writer.flush_session(user_id, session_id)
 
-    # Auto-create conversation if it doesn't exist
+    # Conversation, user message, timestamp and badge commit together
     existing_conv = db.execute(
         'SELECT id FROM conversations WHERE user_id = ? AND session_id = ?',
         (user_id, session_id)
@@ -44,21 +55,15 @@ def chat():
             'INSERT INTO conversations (user_id, session_id, title, subject) VALUES (?, ?, ?, ?)',
             (user_id, session_id, title, subject)
         )
-        db.commit()
 
-    # Save user message
     db.execute(
         'INSERT INTO chat_history (user_id, session_id, lesson_id, role, message) VALUES (?, ?, ?, ?, ?)',
         (user_id, session_id, lesson_id, 'user', message)
     )
-    db.commit()
-
-    # Update conversation timestamp
     db.execute(
         'UPDATE conversations SET updated_at = ? WHERE user_id = ? AND session_id = ?',
         (datetime.datetime.now().isoformat(), user_id, session_id)
     )
-    db.commit()
 
     # Award tutor badge on first use
     from api.routes_quiz import _award_badge
@@ -72,88 +77,81 @@ def chat():
         'ela': 'tutor_ela.txt',
         'social_studies': 'tutor_social.txt'
     }
-    system_prompt = load_prompt(
+    system = load_prompt(
         prompt_map.get(subject, 'tutor_math.txt'),
         grade=grade,
         topic=subject,
         lesson_title=lesson_id or 'General'
     )
 
-    # Get recent chat history
+    # Recent chat history, fitted to the context budget (older turns are summarized)
     history = db.execute(
-        'SELECT role, message FROM chat_history WHERE user_id = ? AND session_id = ? ORDER BY created_at DESC LIMIT 10',
+        'SELECT role, message FROM chat_history WHERE user_id = ? AND session_id = ? ORDER BY created_at DESC LIMIT 20',
         (user_id, session_id)
     ).fetchall()
-    history = list(reversed(history))
-
-    messages = [{'role': 'system', 'content': system_prompt}]
-    for h in history:
-        role = 'user' if h['role'] == 'user' else 'assistant'
-        messages.append({'role': role, 'content': h['message']})
+    turns = [('user' if h['role'] == 'user' else 'assistant', h['message']) for h in reversed(history)]
+    messages = build_messages(system, turns, max_tokens=CHAT_MAX_TOKENS)
 
     # Check cache
-    cache_key = hashlib.md5(json.dumps(messages[-3:], sort_keys=True).encode()).hexdigest()
+    cache_key = chat_cache_key(messages)
     cached = get_cached_response(db, cache_key)
     if cached:
-        db.execute(
-            'INSERT INTO chat_history (user_id, session_id, lesson_id, role, message) VALUES (?, ?, ?, ?, ?)',
-            (user_id, session_id, lesson_id, 'assistant', cached)
-        )
-        db.commit()
+        writer.add(user_id, session_id, lesson_id, 'assistant', cached)
         return jsonify({'response': cached})
 
-    # Try streaming response
-    try:
-        resp = call_ollama(messages, stream=True)
-        if hasattr(resp, 'iter_lines'):
-            def generate():
-                full_response = ''
-                for line in resp.iter_lines():
-                    if line:
-                        try:
-                            data = json.loads(line)
-                            token = data.get('message', {}).get('content', '')
-                            if token:
-                                full_response += token
-                                yield f"data: {json.dumps({'token': token})}\n\n"
-                            if data.get('done'):
-                                yield "data: [DONE]\n\n"
-                                try:
-                                    db2 = get_db()
-                                    db2.execute(
-                                        'INSERT INTO chat_history (user_id, session_id, lesson_id, role, message) VALUES (?, ?, ?, ?, ?)',
-                                        (user_id, session_id, lesson_id, 'assistant', full_response)
-                                    )
-                                    db2.commit()
-                                    cache_response(db2, cache_key, full_response)
-                                except:
-                                    pass
-                                break
-                        except json.JSONDecodeError:
-                            continue
-
-            return Response(
-                stream_with_context(generate()),
-                mimetype='text/event-stream',
-                headers={
-                    'Cache-Control': 'no-cache',
-                    'X-Accel-Buffering': 'no'
-                }
-            )
-    except:
-        pass
-
-    # Fallback: non-streaming
-    response = call_ollama(messages, stream=False)
-
-    db.execute(
-        'INSERT INTO chat_history (user_id, session_id, lesson_id, role, message) VALUES (?, ?, ?, ?, ?)',
-        (user_id, session_id, lesson_id, 'assistant', response)
+    # Stream the reply. Identical concurrent requests share one generation,
+    # and it is dropped once every listener has gone. On our own server the
+    # connection is handed to the event-loop relay so no thread is held for
+    # the length of the answer; elsewhere the threaded path streams it.
+    app = current_app._get_current_object()
+
+    def store_in_cache(text):
+        with app.db_manager.connection() as db2:
+            cache_response(db2, cache_key, text)
+
+    def save_reply(text):
+        writer.add(user_id, session_id, lesson_id, 'assistant', text)
+
+    if relay_ollama_stream(cache_key, messages, max_tokens=CHAT_MAX_TOKENS,
+                           on_complete=store_in_cache, on_reply=save_reply):
+        return Response(status=200)
+
+    sub = stream_ollama_shared(cache_key, messages, max_tokens=CHAT_MAX_TOKENS,
+                               on_complete=store_in_cache)
+
+    def generate():
+        full_response = ''
+        for token in sub.tokens(QUEUE_KEEPALIVE_SECONDS):
+            if token is None:
+                if client_disconnected():
+                    return
+                yield ': queued\n\n'
+                continue
+            full_response += token
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "data: [DONE]\n\n"
+        # A busy or error message is shown to the student but not kept as a tutor turn
+        if not sub.broadcast.failed:
+            save_reply(full_response)
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
     )
-    db.commit()
-    cache_response(db, cache_key, response)
+    # Stop listening however the response ends
+    response.call_on_close(sub.close)
+    return response
+
 
-    return jsonify({'response': response})
+def hint_messages(problem, subject, grade):
+    """Build the hint prompt (also used by warm_hints.py to pre-generate hints)."""
+    system = load_prompt('hint_generator.txt', grade=grade, subject=subject)
+    return build_messages(system, [('user', f"Give me a hint for this problem: {problem}")],
+                          max_tokens=HINT_MAX_TOKENS)
 
 
 @tutor_bp.route('/hint', methods=['POST'])
@@ -168,19 +166,16 @@ def get_hint():
         return jsonify({'hint': 'Try breaking the problem into smaller steps!'})
 
     db = get_db()
-    system_prompt = load_prompt('hint_generator.txt', grade=grade, subject=subject)
-    messages = [
-        {'role': 'system', 'content': system_prompt},
-        {'role': 'user', 'content': f"Give me a hint for this problem: {problem}"}
-    ]
-
-    cache_key = hashlib.md5(f"hint:{problem}:{grade}".encode()).hexdigest()
+    cache_key = hint_cache_key(problem, subject, grade)
     cached = get_cached_response(db, cache_key)
     if cached:
         return jsonify({'hint': cached})
 
-    response = call_ollama(messages, stream=False)
-    cache_response(db, cache_key, response)
+    # Students on the same worksheet ask for the same hint at once: share one generation
+    response = call_ollama_shared(
+        cache_key, hint_messages(problem, subject, grade), max_tokens=HINT_MAX_TOKENS,
+        on_complete=lambda text: cache_response(db, cache_key, text)
+    )
 
     return jsonify({'hint': response})
 
@@ -197,6 +192,7 @@ def list_conversations():
 
     db = get_db()
     user_id = session['user_id']
+    current_app.chat_writer.flush_session(user_id)
 
     rows = db.execute(
         '''SELECT c.id, c.session_id, c.title, c.subject, c.pinned, c.created_at, c.updated_at,
@@ -269,6 +265,7 @@ def delete_conversation(conv_id):
     # Get session_id first
     conv = db.execute('SELECT session_id FROM conversations WHERE id = ? AND user_id = ?', (conv_id, user_id)).fetchone()
     if conv:
+        current_app.chat_writer.flush_session(user_id, conv['session_id'])
         db.execute('DELETE FROM chat_history WHERE user_id = ? AND session_id = ?', (user_id, conv['session_id']))
         db.execute('DELETE FROM conversations WHERE id = ? AND user_id = ?', (conv_id, user_id))
         db.commit()
@@ -308,6 +305,7 @@ def get_conversation_messages(conv_id):
     if not conv:
         return jsonify({'error': 'Not found'}), 404
 
+    current_app.chat_writer.flush_session(user_id, conv['session_id'])
     messages = db.execute(
         'SELECT role, message, created_at FROM chat_history WHERE user_id = ? AND session_id = ? ORDER BY created_at ASC',
         (user_id, conv['session_id'])
@@ -1,8 +1,7 @@
 """Worksheet generation for printing."""
 
-import os
-import json
-from flask import Blueprint, request, jsonify, current_app, Response
+from flask import Blueprint, request, jsonify, Response
+from api import curriculum_store
 
 worksheets_bp = Blueprint('worksheets', __name__)
 
@@ -10,32 +9,16 @@ worksheets_bp = Blueprint('worksheets', __name__)
 @worksheets_bp.route('/worksheet/<lesson_id>', methods=['GET'])
 def get_worksheet(lesson_id):
     """Generate a printable HTML worksheet for a lesson."""
-    subject = request.args.get('subject', 'math')
-    grade = request.args.get('grade', '3')
-
-    content_dir = current_app.config['CONTENT_DIR']
-    grade_str = 'k' if grade == '0' else grade
-    filepath = os.path.join(content_dir, subject, f'{grade_str}.json')
-
-    if not os.path.exists(filepath):
-        return jsonify({'error': 'Content not found'}), 404
-
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-
-    # Find the lesson
-    lesson = None
-    for unit in data.get('units', []):
-        for l in unit.get('lessons', []):
-            if l.get('id') == lesson_id:
-                lesson = l
-                break
-        if lesson:
-            break
-
-    if not lesson:
+    subject = request.args.get('subject')
+    grade = request.args.get('grade')
+
+    found = curriculum_store.find_lesson(lesson_id, subject, grade)
+    if not found:
         return jsonify({'error': 'Lesson not found'}), 404
 
+    subject, grade_num, _, lesson = found
+    grade = str(grade_num)
+
     problems = lesson.get('practice_problems', [])
     grade_label = 'Kindergarten' if grade == '0' else f'Grade {grade}'
     subject_names = {'math': 'Math', 'science': 'Science', 'ela': 'ELA', 'social_studies': 'Social Studies'}
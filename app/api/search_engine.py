@@ -0,0 +1,460 @@
+"""Inverted-index full-text search over curriculum lessons.
+
+Lessons are tokenized once into per-term postings. Queries expand each
+term by prefix (for type-ahead), require every term to match, and rank
+with BM25. Title and unit-title tokens are weighted above body text.
+
+A built index can be written to a compact binary file and reopened with
+mmap, so server processes share the same pages and skip the rebuild.
+"""
+
+import os
+import re
+import json
+import math
+import mmap
+import bisect
+import struct
+import hashlib
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Field weights applied to term frequency (title > unit title > body)
+TITLE_WEIGHT = 3
+UNIT_WEIGHT = 2
+BODY_WEIGHT = 1
+
+# Score multiplier for a prefix expansion versus an exact term match
+PREFIX_PENALTY = 0.7
+# Cap on how many dictionary terms a single query prefix may expand to
+MAX_PREFIX_EXPANSIONS = 50
+
+SNIPPET_BEFORE = 30
+SNIPPET_AFTER = 60
+
+
+def tokenize(text):
+    """Yield (token, start_offset) pairs for lowercase word tokens."""
+    for match in TOKEN_RE.finditer(text.lower()):
+        yield match.group(), match.start()
+
+
+def lesson_documents(content_dir):
+    """Yield one searchable document per lesson in the content directory."""
+    from api import curriculum_store
+
+    for subject in curriculum_store.SUBJECTS:
+        subject_dir = os.path.join(content_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+
+        for filename in sorted(os.listdir(subject_dir)):
+            if not filename.endswith('.json'):
+                continue
+
+            grade_str = filename.replace('.json', '')
+            grade = 0 if grade_str == 'k' else int(grade_str) if grade_str.isdigit() else None
+            if grade is None:
+                continue
+
+            data = curriculum_store.load_json(os.path.join(subject_dir, filename))
+            if not data:
+                continue
+
+            for unit in data.get('units', []):
+                for lesson in unit.get('lessons', []):
+                    content = lesson.get('content', {})
+                    yield {
+                        'lesson_id': lesson.get('id', ''),
+                        'title': lesson.get('title', ''),
+                        'unit_title': unit.get('title', ''),
+                        'subject': subject,
+                        'grade': grade,
+                        'body': ' '.join([
+                            content.get('explanation', ''),
+                            ' '.join(content.get('key_vocabulary', [])),
+                            content.get('real_world', '')
+                        ])
+                    }
+
+
+class SearchIndex:
+    """In-memory inverted index with BM25 ranking.
+
+    docs is a list of document metadata dicts (with a 'text' field used for
+    snippets), doc_lengths the weighted token count of each document, and
+    postings maps term -> list of (doc_id, weighted_tf, first_offset).
+    """
+
+    def __init__(self, docs, doc_lengths, postings):
+        self.docs = docs
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        self.terms = sorted(postings)
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, documents):
+        """Build an index from document dicts (see lesson_documents)."""
+        docs = []
+        doc_lengths = []
+        postings = {}
+
+        for doc_id, doc in enumerate(documents):
+            title = doc.get('title', '')
+            unit_title = doc.get('unit_title', '')
+            text = ' '.join([title, unit_title, doc.get('body', '')])
+            title_end = len(title)
+            unit_end = title_end + 1 + len(unit_title)
+
+            freqs = {}
+            first_offsets = {}
+            length = 0
+            for token, offset in tokenize(text):
+                if offset < title_end:
+                    weight = TITLE_WEIGHT
+                elif offset < unit_end:
+                    weight = UNIT_WEIGHT
+                else:
+                    weight = BODY_WEIGHT
+                freqs[token] = freqs.get(token, 0) + weight
+                first_offsets.setdefault(token, offset)
+                length += weight
+
+            for token, tf in freqs.items():
+                postings.setdefault(token, []).append((doc_id, tf, first_offsets[token]))
+
+            docs.append({
+                'lesson_id': doc.get('lesson_id', ''),
+                'title': title,
+                'unit_title': unit_title,
+                'subject': doc.get('subject', ''),
+                'grade': doc.get('grade'),
+                'text': text,
+            })
+            doc_lengths.append(length)
+
+        return cls(docs, doc_lengths, postings)
+
+    # -- storage accessors ---------------------------------------------------
+
+    def doc_count(self):
+        return len(self.doc_lengths)
+
+    def get_doc(self, doc_id):
+        return self.docs[doc_id]
+
+    def get_doc_length(self, doc_id):
+        return self.doc_lengths[doc_id]
+
+    def get_doc_filter_fields(self, doc_id):
+        doc = self.docs[doc_id]
+        return doc['subject'], doc['grade']
+
+    def get_postings(self, term):
+        return self.postings.get(term, ())
+
+    def expand_prefix(self, prefix):
+        """Return dictionary terms starting with prefix."""
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[lo:hi]
+
+    # -- querying ------------------------------------------------------------
+
+    def _idf(self, df):
+        n = self.doc_count()
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, query_term, allowed):
+        """Score every document matching query_term exactly or by prefix.
+
+        All expansions of the term are treated as one pseudo-term, so a rare
+        completion cannot outrank the common word the user is typing.
+        Returns {doc_id: (score, offset_of_first_match)}.
+        """
+        expansions = self.expand_prefix(query_term)
+        if len(expansions) > MAX_PREFIX_EXPANSIONS:
+            expansions = sorted(expansions, key=lambda t: -len(self.get_postings(t)))
+            expansions = expansions[:MAX_PREFIX_EXPANSIONS]
+            if self.get_postings(query_term) and query_term not in expansions:
+                expansions.append(query_term)
+
+        matches = {}  # doc_id -> [weighted_tf, first_offset]
+        for term in expansions:
+            factor = 1.0 if term == query_term else PREFIX_PENALTY
+            for doc_id, tf, offset in self.get_postings(term):
+                if allowed is not None and not allowed(doc_id):
+                    continue
+                match = matches.get(doc_id)
+                if match is None:
+                    matches[doc_id] = [tf * factor, offset]
+                else:
+                    match[0] += tf * factor
+                    match[1] = min(match[1], offset)
+
+        idf = self._idf(len(matches))
+        avg_length = self.avg_length or 1
+        scores = {}
+        for doc_id, (tf, offset) in matches.items():
+            norm = K1 * (1 - B + B * self.get_doc_length(doc_id) / avg_length)
+            scores[doc_id] = (idf * tf * (K1 + 1) / (tf + norm), offset)
+        return scores
+
+    def search(self, query, subject=None, grade=None, limit=20):
+        """Return ranked results for query, optionally filtered."""
+        terms = [t for t, _ in tokenize(query)]
+        if not terms:
+            return []
+
+        allowed = None
+        if subject is not None or grade is not None:
+            def allowed(doc_id):
+                doc_subject, doc_grade = self.get_doc_filter_fields(doc_id)
+                if subject is not None and doc_subject != subject:
+                    return False
+                if grade is not None and doc_grade != grade:
+                    return False
+                return True
+
+        combined = None
+        first_offsets = {}
+        for term in dict.fromkeys(terms):
+            scores = self._term_scores(term, allowed)
+            if combined is None:
+                combined = {d: s for d, (s, _) in scores.items()}
+                first_offsets = {d: o for d, (_, o) in scores.items()}
+            else:
+                combined = {d: combined[d] + scores[d][0] for d in combined if d in scores}
+            if not combined:
+                return []
+
+        ranked = sorted(combined.items(), key=lambda item: -item[1])[:limit]
+        results = []
+        for doc_id, score in ranked:
+            doc = self.get_doc(doc_id)
+            results.append({
+                'lesson_id': doc['lesson_id'],
+                'title': doc['title'],
+                'unit_title': doc['unit_title'],
+                'subject': doc['subject'],
+                'grade': doc['grade'],
+                'context': _snippet(doc['text'], first_offsets[doc_id]),
+                'score': round(score, 4)
+            })
+        return results
+
+
+def _snippet(text, pos):
+    """Build a context snippet around a precomputed match offset."""
+    start = max(0, pos - SNIPPET_BEFORE)
+    end = min(len(text), pos + SNIPPET_AFTER)
+    context = text[start:end].strip()
+    if start > 0:
+        context = '...' + context
+    if end < len(text):
+        context = context + '...'
+    return context
+
+
+# ---------------------------------------------------------------------------
+# On-disk format
+# ---------------------------------------------------------------------------
+#
+# All integers little-endian. Layout:
+#   header    HEADER struct (magic, version, fingerprint, counts, offsets)
+#   meta      JSON {"subjects": [...]}
+#   doc table DOC_ENTRY per doc: doc JSON offset/len, length, subject, grade
+#   doc blob  UTF-8 JSON objects (lesson_id, title, unit_title, text)
+#   term table TERM_ENTRY per term, sorted by term
+#   term blob UTF-8 term strings
+#   postings  POSTING entries, grouped per term in doc order
+
+MAGIC = b'LQSI'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sI32sIIdQQQQQQ')
+DOC_ENTRY = struct.Struct('<IIIBB')
+TERM_ENTRY = struct.Struct('<IHII')
+POSTING = struct.Struct('<IHI')
+NO_GRADE = 255
+
+
+def content_fingerprint(content_dir):
+    """Hash the names, sizes and mtimes of all curriculum files."""
+    from api import curriculum_store
+
+    h = hashlib.sha256(f'v{FORMAT_VERSION}'.encode())
+    for subject in curriculum_store.SUBJECTS:
+        subject_dir = os.path.join(content_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+        for filename in sorted(os.listdir(subject_dir)):
+            if not filename.endswith('.json'):
+                continue
+            st = os.stat(os.path.join(subject_dir, filename))
+            h.update(f'{subject}/{filename}:{st.st_size}:{st.st_mtime_ns};'.encode())
+    return h.digest()
+
+
+def write_index(index, path, fingerprint):
+    """Serialize a SearchIndex to path atomically."""
+    subjects = sorted({doc['subject'] for doc in index.docs})
+    subject_ids = {name: i for i, name in enumerate(subjects)}
+    meta = json.dumps({'subjects': subjects}).encode()
+
+    doc_table = bytearray()
+    doc_blob = bytearray()
+    for doc, length in zip(index.docs, index.doc_lengths):
+        encoded = json.dumps({
+            'lesson_id': doc['lesson_id'],
+            'title': doc['title'],
+            'unit_title': doc['unit_title'],
+            'text': doc['text'],
+        }).encode()
+        grade = doc['grade'] if doc['grade'] is not None else NO_GRADE
+        doc_table += DOC_ENTRY.pack(len(doc_blob), len(encoded), length,
+                                    subject_ids[doc['subject']], grade)
+        doc_blob += encoded
+
+    term_table = bytearray()
+    term_blob = bytearray()
+    postings = bytearray()
+    for term in index.terms:
+        encoded = term.encode()
+        term_postings = index.postings[term]
+        term_table += TERM_ENTRY.pack(len(term_blob), len(encoded),
+                                      len(postings) // POSTING.size, len(term_postings))
+        term_blob += encoded
+        for doc_id, tf, offset in term_postings:
+            postings += POSTING.pack(doc_id, tf, offset)
+
+    meta_off = HEADER.size
+    doc_table_off = meta_off + len(meta)
+    doc_blob_off = doc_table_off + len(doc_table)
+    term_table_off = doc_blob_off + len(doc_blob)
+    term_blob_off = term_table_off + len(term_table)
+    postings_off = term_blob_off + len(term_blob)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, fingerprint,
+                         len(index.docs), len(index.terms), index.avg_length,
+                         doc_table_off, doc_blob_off, term_table_off,
+                         term_blob_off, postings_off, len(meta))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        for chunk in (header, meta, doc_table, doc_blob, term_table, term_blob, postings):
+            f.write(chunk)
+    # Readers keep their mapping of the old file; new readers see the new one
+    os.replace(tmp_path, path)
+
+
+class MappedSearchIndex(SearchIndex):
+    """SearchIndex backed by an mmap of a file written by write_index.
+
+    Only the header and subject list are decoded up front; terms, postings
+    and documents are read from the mapping on demand.
+    """
+
+    def __init__(self, buf, fh):
+        (magic, version, fingerprint, doc_count, term_count, avg_length,
+         doc_table_off, doc_blob_off, term_table_off, term_blob_off,
+         postings_off, meta_len) = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('not a LearnQuest search index')
+        self._buf = buf
+        self._fh = fh
+        self.fingerprint = fingerprint
+        self._doc_count = doc_count
+        self._term_count = term_count
+        self.avg_length = avg_length
+        self._doc_table_off = doc_table_off
+        self._doc_blob_off = doc_blob_off
+        self._term_table_off = term_table_off
+        self._term_blob_off = term_blob_off
+        self._postings_off = postings_off
+        meta = json.loads(bytes(buf[HEADER.size:HEADER.size + meta_len]))
+        self._subjects = meta['subjects']
+        self._doc_cache = {}
+
+    @classmethod
+    def open(cls, path, fingerprint=None):
+        """Map an index file. Returns None if missing, corrupt or stale."""
+        try:
+            fh = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            index = cls(buf, fh)
+        except (OSError, ValueError, struct.error):
+            fh.close()
+            return None
+        if fingerprint is not None and index.fingerprint != fingerprint:
+            index.close()
+            return None
+        return index
+
+    def close(self):
+        self._buf.close()
+        self._fh.close()
+
+    # -- storage accessors ---------------------------------------------------
+
+    def doc_count(self):
+        return self._doc_count
+
+    def _doc_entry(self, doc_id):
+        return DOC_ENTRY.unpack_from(self._buf, self._doc_table_off + doc_id * DOC_ENTRY.size)
+
+    def get_doc(self, doc_id):
+        doc = self._doc_cache.get(doc_id)
+        if doc is None:
+            blob_off, blob_len, _, subject_id, grade = self._doc_entry(doc_id)
+            start = self._doc_blob_off + blob_off
+            doc = json.loads(self._buf[start:start + blob_len])
+            doc['subject'] = self._subjects[subject_id]
+            doc['grade'] = None if grade == NO_GRADE else grade
+            self._doc_cache[doc_id] = doc
+        return doc
+
+    def get_doc_length(self, doc_id):
+        return self._doc_entry(doc_id)[2]
+
+    def get_doc_filter_fields(self, doc_id):
+        _, _, _, subject_id, grade = self._doc_entry(doc_id)
+        return self._subjects[subject_id], (None if grade == NO_GRADE else grade)
+
+    def _term_entry(self, i):
+        return TERM_ENTRY.unpack_from(self._buf, self._term_table_off + i * TERM_ENTRY.size)
+
+    def _term_at(self, i):
+        str_off, str_len, _, _ = self._term_entry(i)
+        start = self._term_blob_off + str_off
+        return self._buf[start:start + str_len].decode()
+
+    def _bisect(self, term):
+        lo, hi = 0, self._term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get_postings(self, term):
+        i = self._bisect(term)
+        if i >= self._term_count or self._term_at(i) != term:
+            return ()
+        _, _, first, df = self._term_entry(i)
+        start = self._postings_off + first * POSTING.size
+        return list(POSTING.iter_unpack(self._buf[start:start + df * POSTING.size]))
+
+    def expand_prefix(self, prefix):
+        lo = self._bisect(prefix)
+        hi = self._bisect(prefix + '\uffff')
+        return [self._term_at(i) for i in range(lo, hi)]
@@ -0,0 +1,410 @@
+"""Event-loop relay for tutor chat streams.
+
+A Server-Sent Events reply used to hold a server thread for the whole
+generation. With the relay, the chat view hands the client's socket to
+a single asyncio loop once its response is done, and that loop relays
+every stream: it drives the Ollama requests over non-blocking sockets and
+writes SSE frames to any number of browsers, so long answers no longer
+tie up request threads.
+
+- Identical concurrent chats share one upstream generation (as with
+  inflight.StreamHub); each client replays it from the start.
+- Backpressure is per client: a slow reader only pauses its own writer
+  (the transport's high-water mark), and one that stops reading for
+  SLOW_CLIENT_SECONDS is dropped without affecting the others.
+- When a browser disconnects its stream ends at once; when the last
+  listener of a generation leaves, the upstream request is cancelled and
+  its socket closed, which stops Ollama and frees the scheduler slot.
+
+Taking over the socket needs the server's cooperation, so server.py runs
+RelayWSGIServer, whose requests expose environ['learnquest.detach'].
+Under other WSGI servers (and the test client) that key is absent and
+chat falls back to the threaded StreamHub path.
+"""
+
+import json
+import asyncio
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+from api.llm_scheduler import INTERACTIVE
+from api.ollama_client import get_client, CONNECT_TIMEOUT, READ_TIMEOUT
+
+DETACH_KEY = 'learnquest.detach'
+KEEPALIVE_SECONDS = 2
+SLOW_CLIENT_SECONDS = 30
+WRITE_HIGH_WATER = 64 * 1024
+
+SSE_HEADERS = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream; charset=utf-8\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'X-Accel-Buffering: no\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+)
+
+
+# ---------------------------------------------------------------------------
+# Server support: letting a view take over its connection
+# ---------------------------------------------------------------------------
+
+class _NullWriter:
+    """Swallows whatever the WSGI server writes for a detached request."""
+
+    closed = False
+
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DetachingRequestHandler(WSGIRequestHandler):
+    """Request handler whose views can take over the client connection.
+
+    A view calls environ['learnquest.detach'](callback). Its own response
+    is then discarded, and once the request is finished callback(sock) is
+    given a duplicate of the client socket to write the real response on.
+    """
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ[DETACH_KEY] = self._detach
+        return environ
+
+    def _detach(self, callback):
+        self._on_detached = callback
+        self.close_connection = True
+        self.wfile = _NullWriter()
+
+    def finish(self):
+        super().finish()
+        callback = getattr(self, '_on_detached', None)
+        if callback is not None:
+            self._on_detached = None
+            sock = self.connection.dup()
+            self.server.mark_detached(self.connection)
+            callback(sock)
+
+
+class RelayWSGIServer(ThreadedWSGIServer):
+    """Threaded werkzeug server that leaves detached connections open."""
+
+    def __init__(self, host, port, app, **kwargs):
+        kwargs.setdefault('handler', DetachingRequestHandler)
+        super().__init__(host, port, app, **kwargs)
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+
+    def mark_detached(self, request):
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            detached = request in self._detached
+            self._detached.discard(request)
+        if detached:
+            # Close only this descriptor; shutdown() would also end the
+            # duplicate the relay is writing to.
+            self.close_request(request)
+        else:
+            super().shutdown_request(request)
+
+
+def run_server(app, host, port):
+    """Serve app with RelayWSGIServer (replaces app.run)."""
+    server = RelayWSGIServer(host, port, app)
+    if hasattr(server, 'log_startup'):
+        server.log_startup()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Upstream: Ollama over asyncio streams
+# ---------------------------------------------------------------------------
+
+async def _open_ollama_stream(base_url, payload):
+    """POST payload to /api/chat; returns (status, headers, reader, writer)."""
+    url = urlsplit(base_url)
+    secure = url.scheme == 'https'
+    port = url.port or (443 if secure else 80)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(url.hostname, port, ssl=True if secure else None),
+        CONNECT_TIMEOUT
+    )
+    body = json.dumps(payload).encode()
+    path = url.path.rstrip('/') + '/api/chat'
+    writer.write(
+        f'POST {path} HTTP/1.1\r\n'
+        f'Host: {url.netloc}\r\n'
+        'Content-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        'Connection: close\r\n\r\n'.encode() + body
+    )
+    await writer.drain()
+    status_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+    parts = status_line.split()
+    status = int(parts[1]) if len(parts) > 1 else 0
+    headers = {}
+    while True:
+        line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, reader, writer
+
+
+async def _iter_lines(reader, headers):
+    """Yield the NDJSON lines of a (possibly chunked) response body."""
+    chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+    buffer = b''
+    while True:
+        if chunked:
+            size_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                break
+            data = (await asyncio.wait_for(reader.readexactly(size + 2), READ_TIMEOUT))[:-2]
+        else:
+            data = await asyncio.wait_for(reader.read(65536), READ_TIMEOUT)
+            if not data:
+                break
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+# ---------------------------------------------------------------------------
+# The relay
+# ---------------------------------------------------------------------------
+
+class _Flight:
+    """One upstream generation and the clients listening to it (loop-only state)."""
+
+    def __init__(self, key):
+        self.key = key
+        self.tokens = []
+        self.done = False
+        self.failed = True
+        self.clients = 0
+        self.task = None
+        self.wakeups = set()
+
+    def publish(self, token):
+        self.tokens.append(token)
+        self.notify()
+
+    def notify(self):
+        for event in self.wakeups:
+            event.set()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class StreamRelay:
+    """Owns the event loop thread and every relayed stream."""
+
+    def __init__(self):
+        self._loop = None
+        self._start_lock = threading.Lock()
+        self._flights = {}
+        # on_complete/on_reply callbacks touch SQLite; keep them off the loop
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='relay-db')
+        self._stats = {
+            'clients_total': 0,
+            'clients_active': 0,
+            'generations': 0,
+            'shared': 0,
+            'upstream_active': 0,
+            'upstream_cancelled': 0,
+            'client_disconnects': 0,
+            'slow_client_drops': 0,
+        }
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='stream-relay', daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def stream(self, sock, key, payload, user, on_complete=None, on_reply=None):
+        """Relay the generation for key to a detached client socket. Thread-safe.
+
+        payload is the Ollama /api/chat body. on_complete(text) runs once per
+        successful generation (cache write), on_reply(text) once per client
+        that received the whole of a successful reply (chat history); a
+        busy or error message is shown but never passed to either.
+        """
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._attach, sock, key, payload, user, on_complete, on_reply)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['generations_active'] = len(self._flights)
+        return stats
+
+    # -- loop thread ---------------------------------------------------------
+
+    def _attach(self, sock, key, payload, user, on_complete, on_reply):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(key)
+            flight.task = self._loop.create_task(self._produce(flight, payload, user, on_complete))
+            self._stats['generations'] += 1
+        else:
+            self._stats['shared'] += 1
+        flight.clients += 1
+        self._stats['clients_total'] += 1
+        self._stats['clients_active'] += 1
+        self._loop.create_task(self._serve(sock, flight, on_reply))
+
+    def _leave(self, flight):
+        flight.clients -= 1
+        self._stats['clients_active'] -= 1
+        if flight.clients == 0 and not flight.done:
+            # Nobody is listening any more: stop generating right away
+            self._stats['upstream_cancelled'] += 1
+            flight.task.cancel()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    async def _serve(self, sock, flight, on_reply):
+        writer = None
+        gone = None
+        try:
+            reader, writer = await asyncio.open_connection(sock=sock)
+            writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+            writer.write(SSE_HEADERS)
+            # SSE clients send nothing after the request; EOF means they left
+            gone = asyncio.ensure_future(reader.read(1))
+            sent = 0
+            while True:
+                if sent < len(flight.tokens):
+                    frames = ''.join(
+                        f"data: {json.dumps({'token': token})}\n\n" for token in flight.tokens[sent:]
+                    )
+                    sent = len(flight.tokens)
+                    writer.write(frames.encode())
+                    await asyncio.wait_for(writer.drain(), SLOW_CLIENT_SECONDS)
+                    continue
+                if flight.done:
+                    writer.write(b'data: [DONE]\n\n')
+                    await asyncio.wait_for(writer.drain(), SLOW_CLIENT_SECONDS)
+                    if on_reply and not flight.failed:
+                        self._loop.run_in_executor(self._executor, on_reply, ''.join(flight.tokens))
+                    break
+
+                wake = asyncio.Event()
+                flight.wakeups.add(wake)
+                woken = asyncio.ensure_future(wake.wait())
+                try:
+                    done, _ = await asyncio.wait(
+                        {gone, woken}, timeout=KEEPALIVE_SECONDS,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    flight.wakeups.discard(wake)
+                    woken.cancel()
+                if gone in done:
+                    self._stats['client_disconnects'] += 1
+                    break
+                if not done:
+                    writer.write(b': queued\n\n' if not flight.tokens else b': waiting\n\n')
+                    await asyncio.wait_for(writer.drain(), SLOW_CLIENT_SECONDS)
+        except asyncio.TimeoutError:
+            self._stats['slow_client_drops'] += 1
+        except (ConnectionError, OSError):
+            self._stats['client_disconnects'] += 1
+        finally:
+            if gone is not None:
+                gone.cancel()
+            if writer is not None:
+                writer.close()
+            else:
+                sock.close()
+            self._leave(flight)
+
+    async def _produce(self, flight, payload, user, on_complete):
+        from api.llm_utils import BUSY_MESSAGE, ERROR_MESSAGE
+
+        client = get_client()
+        slot = client.scheduler.submit(INTERACTIVE, user)
+        writer = None
+        try:
+            granted = self._loop.create_future()
+            slot.on_grant(lambda: self._loop.call_soon_threadsafe(_resolve, granted))
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), client.queue_timeout)
+            except asyncio.TimeoutError:
+                if client.scheduler.timed_out(slot):
+                    flight.publish(BUSY_MESSAGE)
+                    return
+
+            self._stats['upstream_active'] += 1
+            try:
+                status, headers, reader, writer = await _open_ollama_stream(client.base_url, payload)
+                if status != 200:
+                    raise OSError(f'Ollama returned HTTP {status}')
+                async for line in _iter_lines(reader, headers):
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    token = data.get('message', {}).get('content', '')
+                    if token:
+                        flight.publish(token)
+                    if data.get('done'):
+                        flight.failed = False
+                        break
+            finally:
+                self._stats['upstream_active'] -= 1
+
+            if not flight.failed and on_complete:
+                try:
+                    await self._loop.run_in_executor(self._executor, on_complete, ''.join(flight.tokens))
+                except Exception:
+                    pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            flight.publish(f"{ERROR_MESSAGE} (Error: {str(e)[:100]})")
+        finally:
+            if writer is not None:
+                writer.close()
+            slot.cancel()
+            flight.done = True
+            flight.notify()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+
+_relay = StreamRelay()
+
+
+def get_relay():
+    """Return the process-wide StreamRelay."""
+    return _relay
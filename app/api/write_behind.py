@@ -0,0 +1,131 @@
+"""Write-behind queue for chat history rows.
+
+Assistant replies are appended to an in-memory queue and written by a
+background thread in batches - one executemany and one commit for every
+BATCH_SIZE rows or FLUSH_SECONDS, whichever comes first - so a finished
+reply never waits on an fsync. Anything that reads or deletes a
+session's history calls flush_session() first, which waits for a batch
+in progress and writes the queue out if that session has rows pending.
+
+Rows carry the time they were queued as created_at, so history keeps
+its order however late the batch lands. The queue is flushed at exit;
+a hard crash can lose at most the last FLUSH_SECONDS of replies.
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import threading
+
+BATCH_SIZE = int(os.environ.get('LEARNQUEST_CHAT_WRITE_BATCH', 64))
+FLUSH_SECONDS = float(os.environ.get('LEARNQUEST_CHAT_WRITE_SECONDS', 1.0))
+
+INSERT_SQL = (
+    'INSERT INTO chat_history (user_id, session_id, lesson_id, role, message, created_at) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+
+
+class ChatHistoryWriter:
+    """Queues chat_history rows and inserts them in batches."""
+
+    def __init__(self, db_manager, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flush_lock = threading.Lock()  # keeps batches in queue order
+        self._thread = None
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'errors': 0, 'largest_batch': 0}
+
+    def add(self, user_id, session_id, lesson_id, role, message):
+        """Queue one chat_history row. Never touches the database."""
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        with self._cond:
+            self._pending.append((user_id, session_id, lesson_id, role, message, created_at))
+            self._stats['queued'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Write every queued row now, on the calling thread."""
+        with self._flush_lock:
+            self._flush_pending()
+
+    def flush_session(self, user_id, session_id=None):
+        """Make sure this user's (and session's, if given) rows are in the database.
+
+        Waits for a batch already being written - the writer thread takes
+        rows off the queue before it commits them - and then flushes if
+        any of the rows are still queued.
+        """
+        with self._flush_lock:
+            with self._cond:
+                waiting = any(
+                    row[0] == user_id and (session_id is None or row[1] == session_id)
+                    for row in self._pending
+                )
+            if waiting:
+                self._flush_pending()
+
+    def _flush_pending(self):
+        # Caller holds _flush_lock
+        with self._cond:
+            rows, self._pending = self._pending, []
+        if rows:
+            self._write(rows)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['batch_size'] = self.batch_size
+        stats['flush_seconds'] = self.flush_seconds
+        return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size, self.flush_seconds)
+            self.flush()
+
+    def _write(self, rows):
+        written = len(rows)
+        with self.db_manager.connection() as db:
+            try:
+                db.executemany(INSERT_SQL, rows)
+                db.commit()
+            except sqlite3.IntegrityError:
+                # e.g. the student was deleted meanwhile; keep the rest
+                db.rollback()
+                written = 0
+                for row in rows:
+                    try:
+                        db.execute(INSERT_SQL, row)
+                        written += 1
+                    except sqlite3.IntegrityError:
+                        pass
+                db.commit()
+            except sqlite3.Error:
+                # Database busy or locked: requeue and try with the next batch
+                db.rollback()
+                with self._cond:
+                    self._pending[:0] = rows
+                    self._stats['errors'] += 1
+                return
+        with self._cond:
+            self._stats['written'] += written
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(rows))
+
+
+def init_writer(db_manager):
+    """Create the writer for db_manager and flush it at interpreter exit."""
+    writer = ChatHistoryWriter(db_manager)
+    atexit.register(writer.flush)
+    return writer
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: progress-dashboard reads while a class submits quizzes.
+
+Compares the old per-request setup (new connection each time,
+journal_mode=OFF) against the pooled WAL ConnectionManager.
+
+Usage (from the app/ directory):
+    python benchmarks/bench_db.py [--students 30] [--writers 10] [--readers 20] [--seconds 5]
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from api.db import ConnectionManager, DEFAULT_PRAGMAS  # noqa: E402
+
+SCHEMA_PATH = os.path.join(APP_DIR, 'database', 'schema.sql')
+SUBJECTS = ['math', 'science', 'ela', 'social_studies']
+
+
+class LegacyConnections:
+    """The pre-manager behaviour: a fresh connection per request."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def acquire(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def release(self, conn):
+        conn.close()
+
+
+def make_db(path, students):
+    db = sqlite3.connect(path)
+    with open(SCHEMA_PATH) as f:
+        db.executescript(f.read())
+    for i in range(students):
+        db.execute('INSERT INTO users (name, pin, role, grade) VALUES (?, ?, ?, ?)',
+                   (f'student{i}', '0000', 'student', 3))
+        for j in range(40):
+            db.execute(
+                'INSERT INTO lesson_progress (user_id, lesson_id, subject, grade, completed, score) VALUES (?, ?, ?, 3, 1, ?)',
+                (i + 2, f'3-{j}', SUBJECTS[j % 4], random.randint(50, 100)))
+    db.commit()
+    db.close()
+
+
+def submit_quiz(conn, user_id):
+    score = random.randint(40, 100)
+    conn.execute(
+        '''INSERT INTO quiz_results
+           (user_id, quiz_id, subject, grade, score, total_questions, correct_answers, time_spent_seconds, answers_json)
+           VALUES (?, ?, ?, 3, ?, 10, ?, 60, ?)''',
+        (user_id, 'unit-1', 'math', score, score // 10, json.dumps(list(range(10)))))
+    conn.execute('UPDATE users SET xp = xp + 50 WHERE id = ?', (user_id,))
+    conn.commit()
+
+
+def load_progress(conn, user_id):
+    for subject in SUBJECTS:
+        conn.execute(
+            'SELECT COUNT(*), AVG(score) FROM lesson_progress WHERE user_id = ? AND subject = ? AND completed = 1',
+            (user_id, subject)).fetchone()
+    conn.execute('SELECT COUNT(*) FROM quiz_results WHERE user_id = ? AND score >= 70', (user_id,)).fetchone()
+
+
+def run(label, connections, students, writers, readers, seconds):
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def worker(kind):
+        done = errors = 0
+        while time.time() < stop:
+            user_id = random.randint(2, students + 1)
+            conn = connections.acquire()
+            try:
+                if kind == 'writes':
+                    submit_quiz(conn, user_id)
+                else:
+                    load_progress(conn, user_id)
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+            finally:
+                connections.release(conn)
+        with lock:
+            counts[kind] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=('writes',)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=('reads',)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f'{label:<28} reads/s {counts["reads"] / seconds:>9.0f}   '
+          f'writes/s {counts["writes"] / seconds:>7.0f}   errors {counts["errors"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--writers', type=int, default=10)
+    parser.add_argument('--readers', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        make_db(legacy_path, args.students)
+        run('per-request, journal OFF', LegacyConnections(legacy_path),
+            args.students, args.writers, args.readers, args.seconds)
+
+        wal_path = os.path.join(tmp, 'wal.db')
+        make_db(wal_path, args.students)
+        manager = ConnectionManager(wal_path, DEFAULT_PRAGMAS, pool_size=args.writers + args.readers)
+        run('pooled, WAL', manager,
+            args.students, args.writers, args.readers, args.seconds)
+        manager.close_all()
+
+
+if __name__ == '__main__':
+    main()
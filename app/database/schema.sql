@@ -1,4 +1,5 @@
 -- LearnQuest Database Schema
+-- Indexes and later schema changes live in api/migrations.py (PRAGMA user_version).
 
 -- Users (students and teachers)
 CREATE TABLE IF NOT EXISTS users (
@@ -1,8 +1,65 @@
 """Answer validator - checks student answers against correct answers with tolerance for equivalent forms."""
 
 from fractions import Fraction
+from functools import lru_cache
+import math
 import re
 
+# Memoized CompiledAnswer objects (one per distinct correct answer)
+COMPILED_CACHE_SIZE = 4096
+
+_MIXED = re.compile(r'^(-?\d+)\s+(\d+)\s*/\s*(\d+)$')
+_FRACTION = re.compile(r'^(-?\d+)\s*/\s*(\d+)$')
+_DECIMAL = re.compile(r'^-?\d*\.?\d+$')
+_PI = re.compile(r'^(-?\d*\.?\d*)\s*[πpi]+$', re.IGNORECASE)
+_COMPLEX = re.compile(r'^(-?\d*\.?\d*)\s*([+-])\s*(\d*\.?\d*)i$')
+_SQRT = re.compile(r'^(-?\d*\.?\d*)\s*sqrt\((\d+)\)(?:\s*/\s*(\d+))?$', re.IGNORECASE)
+_VECTOR = re.compile(r'^<\s*(-?\d+)\s*,\s*(-?\d+)\s*>$')
+_INTERVAL = re.compile(r'^[\[\(]-?\d+\.?\d*\s*,\s*-?\d+\.?\d*[\]\)]$')
+
+
+class CompiledAnswer:
+    """A correct answer parsed once, ready to check any number of student answers."""
+
+    __slots__ = ('answer', 'folded', 'value', 'approx')
+
+    def __init__(self, correct_answer):
+        self.answer = str(correct_answer).strip()
+        self.folded = self.answer.lower()
+        self.value = _safe_parse(self.answer)
+        self.approx = _as_float(self.value)
+
+    def check(self, student_answer):
+        """True if student_answer is equivalent to the correct answer."""
+        student_answer = str(student_answer).strip()
+
+        # Direct string match (case-insensitive)
+        if student_answer.lower() == self.folded:
+            return True
+        if self.value is None:
+            return False
+
+        # Numeric comparison: exact as Fractions, else within tolerance
+        student_val = _safe_parse(student_answer)
+        if student_val is None:
+            return False
+        if student_val == self.value:
+            return True
+        if self.approx is None:
+            return False
+        student_approx = _as_float(student_val)
+        return student_approx is not None and abs(student_approx - self.approx) < 0.001
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compile(correct_answer):
+    return CompiledAnswer(correct_answer)
+
+
+def compile_answer(correct_answer):
+    """Return the (memoized) CompiledAnswer for a correct answer."""
+    return _compile(str(correct_answer).strip())
+
 
 def validate_answer(student_answer, correct_answer):
     """
@@ -10,30 +67,22 @@ def validate_answer(student_answer, correct_answer):
     Handles: integers, decimals, fractions, mixed numbers, and equivalent forms.
     E.g., '1/2' = '2/4' = '0.5' = '.5'
     """
-    student_answer = str(student_answer).strip()
-    correct_answer = str(correct_answer).strip()
+    return compile_answer(correct_answer).check(student_answer)
 
-    # Direct string match (case-insensitive)
-    if student_answer.lower() == correct_answer.lower():
-        return True
 
-    # Try numeric comparison
+def _safe_parse(s):
     try:
-        student_val = _parse_number(student_answer)
-        correct_val = _parse_number(correct_answer)
-
-        if student_val is not None and correct_val is not None:
-            # Compare as Fractions for exact match
-            if student_val == correct_val:
-                return True
-
-            # Floating point tolerance for decimals
-            if abs(float(student_val) - float(correct_val)) < 0.001:
-                return True
+        return _parse_number(s)
     except (ValueError, ZeroDivisionError, OverflowError):
-        pass
+        return None
+
 
-    return False
+def _as_float(value):
+    """float(value) for numeric answers; None for vectors, intervals and complex numbers."""
+    try:
+        return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
 
 
 def _parse_number(s):
@@ -54,7 +103,7 @@ def _parse_number(s):
             return None
 
     # Handle mixed number: "1 3/4" or "1 and 3/4"
-    mixed_match = re.match(r'^(-?\d+)\s+(\d+)\s*/\s*(\d+)$', s)
+    mixed_match = _MIXED.match(s)
     if mixed_match:
         whole = int(mixed_match.group(1))
         num = int(mixed_match.group(2))
@@ -65,7 +114,7 @@ def _parse_number(s):
         return Fraction(sign * (abs(whole) * den + num), den)
 
     # Handle fraction: "3/4"
-    frac_match = re.match(r'^(-?\d+)\s*/\s*(\d+)$', s)
+    frac_match = _FRACTION.match(s)
     if frac_match:
         num = int(frac_match.group(1))
         den = int(frac_match.group(2))
@@ -74,7 +123,7 @@ def _parse_number(s):
         return Fraction(num, den)
 
     # Handle decimal: "3.14", ".5"
-    decimal_match = re.match(r'^-?\d*\.?\d+$', s)
+    decimal_match = _DECIMAL.match(s)
     if decimal_match:
         return Fraction(s).limit_denominator(100000)
 
@@ -85,19 +134,18 @@ def _parse_number(s):
         pass
 
     # Handle pi-based answers (e.g., "4π", "4pi")
-    pi_match = re.match(r'^(-?\d*\.?\d*)\s*[πpi]+$', s, re.IGNORECASE)
+    pi_match = _PI.match(s)
     if pi_match:
         coeff = pi_match.group(1)
         if not coeff or coeff == '-':
             coeff = coeff + '1' if coeff else '1'
         try:
-            import math
             return Fraction(float(coeff) * math.pi).limit_denominator(100000)
         except:
             return None
 
     # Handle complex numbers (e.g., "3 + 2i", "3+2i", "-1 - 4i")
-    complex_match = re.match(r'^(-?\d*\.?\d*)\s*([+-])\s*(\d*\.?\d*)i$', s)
+    complex_match = _COMPLEX.match(s)
     if complex_match:
         real = complex_match.group(1)
         sign = complex_match.group(2)
@@ -112,13 +160,12 @@ def _parse_number(s):
             return None
 
     # Handle sqrt expressions (e.g., "sqrt(2)", "2sqrt(3)")
-    sqrt_match = re.match(r'^(-?\d*\.?\d*)\s*sqrt\((\d+)\)(?:\s*/\s*(\d+))?$', s, re.IGNORECASE)
+    sqrt_match = _SQRT.match(s)
     if sqrt_match:
         coeff = sqrt_match.group(1)
         radicand = int(sqrt_match.group(2))
         denom = sqrt_match.group(3)
         try:
-            import math
             coeff_val = float(coeff) if coeff and coeff != '-' else (-1 if coeff == '-' else 1)
             result = coeff_val * math.sqrt(radicand)
             if denom:
@@ -128,12 +175,12 @@ def _parse_number(s):
             return None
 
     # Handle vector notation (e.g., "<3, 4>")
-    vector_match = re.match(r'^<\s*(-?\d+)\s*,\s*(-?\d+)\s*>$', s)
+    vector_match = _VECTOR.match(s)
     if vector_match:
         return s  # Return as-is for string comparison
 
     # Handle interval notation (e.g., "(-2, 5]")
-    interval_match = re.match(r'^[\[\(]-?\d+\.?\d*\s*,\s*-?\d+\.?\d*[\]\)]$', s)
+    interval_match = _INTERVAL.match(s)
     if interval_match:
         return s  # Return as-is for string comparison
 
@@ -1,46 +1,17 @@
 """Arithmetic operations - addition, subtraction, multiplication, division."""
 
 import random
-from fractions import Fraction
+from math_engine.expression import ExpressionError, evaluate_expression
 
 
 def compute(expression):
     """Safely evaluate an arithmetic expression and return the result."""
-    # Clean the expression
-    expr = expression.strip()
-    expr = expr.replace('×', '*').replace('÷', '/').replace('−', '-')
-
-    # Use Fraction for exact arithmetic
     try:
-        # Parse and evaluate safely
-        result = _safe_eval(expr)
-        return result
-    except Exception:
+        return evaluate_expression(expression)
+    except ExpressionError:
         return None
 
 
-def _safe_eval(expr):
-    """Safely evaluate a simple arithmetic expression using Fraction."""
-    # Only allow: digits, +, -, *, /, (, ), ., spaces
-    allowed = set('0123456789+-*/().  ')
-    if not all(c in allowed for c in expr):
-        raise ValueError(f"Invalid character in expression: {expr}")
-
-    # Replace integer/decimal literals with Fraction
-    import re
-    # Convert to use Fraction for precision
-    tokens = re.split(r'(\d+\.?\d*)', expr)
-    frac_expr = ''
-    for token in tokens:
-        if re.match(r'^\d+\.?\d*$', token):
-            frac_expr += f'Fraction("{token}")'
-        else:
-            frac_expr += token
-
-    result = eval(frac_expr, {"__builtins__": {}, "Fraction": Fraction})
-    return result
-
-
 def generate_addition(grade, count=5):
     """Generate addition problems appropriate for grade level."""
     problems = []
@@ -0,0 +1,90 @@
+"""Canonical forms for arithmetic expressions - used to fold equivalent questions together."""
+
+import ast
+import re
+
+# Unicode operators students paste in, mapped to Python's
+OPERATORS = str.maketrans({'×': '*', '·': '*', '÷': '/', '−': '-', '–': '-', '^': '**'})
+
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+# "2x", "3(x+1)", ")(" -> explicit multiplication
+_IMPLICIT_MUL = re.compile(r'(?<=[\d)])\s*(?=[a-z(])|(?<=[a-z)])\s*(?=\()')
+
+_PRECEDENCE = {ast.Add: 1, ast.Sub: 1, ast.Mult: 2, ast.Div: 2, ast.Mod: 2, ast.Pow: 4}
+_SYMBOLS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Mod: '%', ast.Pow: '^'}
+_COMMUTATIVE = (ast.Add, ast.Mult)
+_MAX_LENGTH = 200
+
+
+def canonical_expression(expr):
+    """Return a canonical string for an arithmetic expression, or None if it isn't one.
+
+    Equivalent spellings map to the same string: whitespace, ×/÷ signs,
+    thousands separators, redundant parentheses, "0.50" vs "0.5", implicit
+    multiplication ("2x") and the order of operands in sums and products
+    ("3/4 + 1/8" == "1/8+3/4"). Values are never computed, so "6/8" and
+    "3/4" stay different questions.
+    """
+    if not expr or len(expr) > _MAX_LENGTH:
+        return None
+    text = expr.strip().lower().translate(OPERATORS)
+    text = _THOUSANDS.sub('', text)
+    text = _IMPLICIT_MUL.sub('*', text)
+    try:
+        tree = ast.parse(text, mode='eval')
+    except (SyntaxError, ValueError):
+        return None
+    try:
+        return _render(tree.body)[0]
+    except ValueError:
+        return None
+
+
+def _render(node):
+    """Return (text, precedence) for an expression node."""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return _number(node.value), 5
+    if isinstance(node, ast.Name) and len(node.id) == 1:
+        return node.id, 5
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        text, prec = _render(node.operand)
+        if isinstance(node.op, ast.UAdd):
+            return text, prec
+        return '-' + (text if prec >= 3 else f'({text})'), 3
+    if isinstance(node, ast.BinOp) and type(node.op) in _PRECEDENCE:
+        op = type(node.op)
+        prec = _PRECEDENCE[op]
+        if op in _COMMUTATIVE:
+            # A % operand keeps its parentheses: 3*(7%4) is not 3*7%4
+            parts = sorted(_wrap(_render(n), prec, _is_mod(n)) for n in _flatten(node, op))
+            return _SYMBOLS[op].join(parts), prec
+        left = _wrap(_render(node.left), prec, op is ast.Pow)
+        right = _wrap(_render(node.right), prec, op is not ast.Pow)
+        return f'{left}{_SYMBOLS[op]}{right}', prec
+    raise ValueError('not an arithmetic expression')
+
+
+def _flatten(node, op):
+    """Operands of a chain of the same commutative operator."""
+    if isinstance(node, ast.BinOp) and type(node.op) is op:
+        return _flatten(node.left, op) + _flatten(node.right, op)
+    return [node]
+
+
+def _is_mod(node):
+    return isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod)
+
+
+def _wrap(rendered, parent_prec, strict):
+    text, prec = rendered
+    if prec < parent_prec or (strict and prec == parent_prec):
+        return f'({text})'
+    return text
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return repr(value)
+    return str(value)
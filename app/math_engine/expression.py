@@ -0,0 +1,341 @@
+"""Arithmetic expression evaluator - exact Fraction arithmetic with bounded cost.
+
+Expressions are tokenized and parsed into a small tree of tuples:
+
+    ('num', Fraction)             a number
+    ('neg', node)                 unary minus
+    (op, left, right)             op is one of + - * / ^
+
+Parsed trees are memoized, so a problem asked by a whole class is parsed
+once. Evaluation never calls eval() and every operation is bounded:
+literals are at most MAX_DIGITS digits, exponents are whole numbers (or
+exact roots) no larger than MAX_EXPONENT, powers nest at most
+MAX_POWER_DEPTH deep, and no intermediate value may grow past MAX_BITS -
+a power that would is refused before it is computed. Pathological input
+like 9**9**9 fails fast with ExpressionError instead of pinning a CPU.
+
+reduce_steps() replays the evaluation one operation at a time in the
+usual order of operations, for the step-by-step solver.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+import re
+
+MAX_LENGTH = 200
+MAX_DIGITS = 30
+MAX_EXPONENT = 1000
+MAX_POWER_DEPTH = 2
+MAX_NESTING = 20
+MAX_BITS = 2048  # about 600 decimal digits, numerator or denominator
+MAX_ROOT = 10
+PARSE_CACHE_SIZE = 1024
+
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*|\.\d+)|(\*\*|[-+*/^()]))')
+_OPERATORS = str.maketrans({'×': '*', '·': '*', '÷': '/', '−': '-', '–': '-'})
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 4}
+_SYMBOLS = {'+': '+', '-': '-', '*': '×', '/': '÷', '^': '^'}
+
+
+class ExpressionError(ValueError):
+    """The text is not an arithmetic expression, or is too costly to evaluate."""
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ExpressionError(f'Unexpected character: {text[pos:].strip()[0]!r}')
+        number, op = match.groups()
+        if number is not None:
+            if sum(c.isdigit() for c in number) > MAX_DIGITS:
+                raise ExpressionError(f'Numbers are limited to {MAX_DIGITS} digits')
+            tokens.append(('num', Fraction(number)))
+        else:
+            tokens.append(('op', '^' if op == '**' else op))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the token list.
+
+    expr   := term (('+' | '-') term)*
+    term   := unary (('*' | '/') unary)*
+    unary  := ('-' | '+') unary | power
+    power  := atom ('^' unary)?          right-associative, so 2^3^2 = 2^9
+    atom   := number | '(' expr ')'
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.nesting = 0
+        self.power_depth = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, *ops):
+        kind, value = self.peek()
+        if kind == 'op' and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def parse(self):
+        if not self.tokens:
+            raise ExpressionError('Empty expression')
+        node = self.expr()
+        if self.pos != len(self.tokens):
+            raise ExpressionError(f'Unexpected {_describe(self.peek())}')
+        return node
+
+    def expr(self):
+        node = self.term()
+        while True:
+            op = self.take('+', '-')
+            if op is None:
+                return node
+            node = (op, node, self.term())
+
+    def term(self):
+        node = self.unary()
+        while True:
+            op = self.take('*', '/')
+            if op is None:
+                return node
+            node = (op, node, self.unary())
+
+    def unary(self):
+        op = self.take('-', '+')
+        if op is None:
+            return self.power()
+        self._enter()
+        operand = self.unary()
+        self.nesting -= 1
+        if op == '+':
+            return operand
+        if operand[0] == 'num':
+            return ('num', -operand[1])
+        return ('neg', operand)
+
+    def power(self):
+        base = self.atom()
+        if not self.take('^'):
+            return base
+        self.power_depth += 1
+        if self.power_depth > MAX_POWER_DEPTH:
+            raise ExpressionError(f'Powers can be nested at most {MAX_POWER_DEPTH} deep')
+        exponent = self.unary()
+        self.power_depth -= 1
+        return ('^', base, exponent)
+
+    def atom(self):
+        kind, value = self.peek()
+        if kind == 'num':
+            self.pos += 1
+            return ('num', value)
+        if self.take('('):
+            self._enter()
+            saved_depth, self.power_depth = self.power_depth, 0
+            node = self.expr()
+            self.power_depth = saved_depth
+            self.nesting -= 1
+            if not self.take(')'):
+                raise ExpressionError('Missing closing parenthesis')
+            return node
+        raise ExpressionError(f'Unexpected {_describe((kind, value))}')
+
+    def _enter(self):
+        self.nesting += 1
+        if self.nesting > MAX_NESTING:
+            raise ExpressionError('Expression is nested too deeply')
+
+
+def _describe(token):
+    kind, value = token
+    if kind is None:
+        return 'end of expression'
+    return f"'{value}'" if kind == 'op' else f'number {value}'
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(text):
+    return _Parser(_tokenize(text)).parse()
+
+
+def parse_expression(text):
+    """Return the (memoized) tree for an arithmetic expression; raises ExpressionError."""
+    text = str(text).strip().translate(_OPERATORS)
+    if len(text) > MAX_LENGTH:
+        raise ExpressionError(f'Expressions are limited to {MAX_LENGTH} characters')
+    return _parse(text)
+
+
+def _check_size(value):
+    if value.numerator.bit_length() > MAX_BITS or value.denominator.bit_length() > MAX_BITS:
+        raise ExpressionError('The numbers in this problem get too large')
+    return value
+
+
+def _iroot(n, k):
+    """Integer k-th root of n >= 0 if n is a perfect k-th power, else None."""
+    lo, hi = 0, 1 << (n.bit_length() // k + 1)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid ** k < n:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo if lo ** k == n else None
+
+
+def _power(base, exponent):
+    if exponent.denominator != 1:
+        # Only exact roots, e.g. 16^(1/2) or 8^(2/3)
+        root = exponent.denominator
+        num = den = None
+        if root <= MAX_ROOT and base >= 0:
+            num, den = _iroot(base.numerator, root), _iroot(base.denominator, root)
+        if num is None or den is None:
+            power = render(('^', ('num', base), ('num', exponent)))
+            raise ExpressionError(f'{power} is not a rational number')
+        base, exponent = Fraction(num, den), Fraction(exponent.numerator)
+    n = exponent.numerator
+    if abs(n) > MAX_EXPONENT:
+        raise ExpressionError(f'Exponents are limited to {MAX_EXPONENT}')
+    bits = max(base.numerator.bit_length(), base.denominator.bit_length())
+    if bits > 1 and (bits - 1) * abs(n) > MAX_BITS:
+        raise ExpressionError('The numbers in this problem get too large')
+    if base == 0 and n < 0:
+        raise ExpressionError('Division by zero')
+    return base ** n
+
+
+def _apply(op, left, right):
+    if op == '+':
+        value = left + right
+    elif op == '-':
+        value = left - right
+    elif op == '*':
+        value = left * right
+    elif op == '/':
+        if right == 0:
+            raise ExpressionError('Division by zero')
+        value = left / right
+    else:
+        value = _power(left, right)
+    return _check_size(value)
+
+
+def evaluate(node):
+    """Exact value of a parsed expression as a Fraction."""
+    kind = node[0]
+    if kind == 'num':
+        return node[1]
+    if kind == 'neg':
+        return -evaluate(node[1])
+    return _apply(kind, evaluate(node[1]), evaluate(node[2]))
+
+
+def evaluate_expression(text):
+    """Parse and evaluate text; raises ExpressionError."""
+    return evaluate(parse_expression(text))
+
+
+def format_number(value):
+    """Integer, short terminating decimal, or a/b."""
+    if value.denominator == 1:
+        return str(value.numerator)
+    den = value.denominator
+    twos = fives = 0
+    while den % 2 == 0:
+        den //= 2
+        twos += 1
+    while den % 5 == 0:
+        den //= 5
+        fives += 1
+    places = max(twos, fives)
+    if den == 1 and places <= 6:
+        scaled = abs(value.numerator) * 10 ** places // value.denominator
+        digits = str(scaled).rjust(places + 1, '0')
+        sign = '-' if value < 0 else ''
+        return f'{sign}{digits[:-places]}.{digits[-places:]}'
+    return f'{value.numerator}/{value.denominator}'
+
+
+def render(node):
+    """Readable text for a tree, with × and ÷ and only the parentheses it needs."""
+    return _render(node)[0]
+
+
+def _render(node):
+    """Return (text, precedence) for a node."""
+    kind = node[0]
+    if kind == 'num':
+        text = format_number(node[1])
+        if node[1] < 0:
+            return text, 3
+        return text, (5 if node[1].denominator == 1 or '.' in text else 2)
+    if kind == 'neg':
+        text, prec = _render(node[1])
+        return '-' + (text if prec >= 3 else f'({text})'), 3
+    prec = _PRECEDENCE[kind]
+    left, left_prec = _render(node[1])
+    right, right_prec = _render(node[2])
+    if left_prec < prec or (kind == '^' and left_prec == prec):
+        left = f'({left})'
+    if right_prec < prec or (kind != '^' and right_prec == prec and kind in '-/') \
+            or (right_prec == 3 and kind != '^'):
+        right = f'({right})'
+    return f'{left} {_SYMBOLS[kind]} {right}', prec
+
+
+def _reduce_once(node):
+    """Perform the next operation in order of operations.
+
+    Returns (new_node, (op, left, right, value)), or (node, None) when
+    node is already a number.
+    """
+    kind = node[0]
+    if kind == 'num':
+        return node, None
+    if kind == 'neg':
+        child, done = _reduce_once(node[1])
+        if child[0] == 'num':
+            return ('num', -child[1]), done
+        return ('neg', child), done
+    left, right = node[1], node[2]
+    if left[0] != 'num':
+        left, done = _reduce_once(left)
+        return (kind, left, right), done
+    if right[0] != 'num':
+        right, done = _reduce_once(right)
+        return (kind, left, right), done
+    value = _apply(kind, left[1], right[1])
+    return ('num', value), (kind, left, right, value)
+
+
+def reduce_steps(node, max_steps=40):
+    """Evaluate node one operation at a time.
+
+    Returns (value, steps), where each step is a pair of strings: the
+    operation performed ("3 × 4 = 12") and the expression left after it.
+    Only the first max_steps operations are recorded; the value is
+    always exact.
+    """
+    steps = []
+    while node[0] != 'num':
+        node, done = _reduce_once(node)
+        if done is None:
+            continue
+        if len(steps) >= max_steps:
+            return evaluate(node), steps
+        op, left, right, value = done
+        operation = f'{render((op, left, right))} = {render(("num", value))}'
+        steps.append((operation, render(node)))
+    return node[1], steps
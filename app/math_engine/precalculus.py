@@ -5,6 +5,7 @@ import math
 from fractions import Fraction
 from sympy import (symbols, log, exp, limit, oo, simplify, Matrix, Rational,
                    ln, solve, sqrt, pi)
+from math_engine.solver_pool import SolverError, get_pool
 
 x = symbols('x')
 
@@ -26,18 +27,8 @@ def evaluate_natural_log(argument):
 def compute_limit(expr_str, var='x', point='oo'):
     """Compute limit of expression as var approaches point."""
     try:
-        from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
-        transforms = standard_transformations + (implicit_multiplication_application,)
-        expr = parse_expr(expr_str, transformations=transforms)
-        x_sym = symbols(var)
-        if point == 'oo':
-            result = limit(expr, x_sym, oo)
-        elif point == '-oo':
-            result = limit(expr, x_sym, -oo)
-        else:
-            result = limit(expr, x_sym, float(point))
-        return str(result)
-    except Exception:
+        return get_pool().run('limit', expr_str, var, point)
+    except SolverError:
         return None
 
 
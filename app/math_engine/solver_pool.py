@@ -0,0 +1,325 @@
+"""Sandboxed pool of SymPy worker processes.
+
+SymPy can run for minutes, or exhaust memory, on a short student input,
+so symbolic solving (math_engine.symbolic) never runs in a request
+thread. Each worker is a separate `python -m math_engine.solver_pool`
+process that imports SymPy once, warms it up and then serves one task
+at a time over a pipe, one JSON line each way. Replies are read by a
+thread per worker, so waiting with a timeout works on Windows too. On
+POSIX the worker's address space is capped at MEMORY_MB with setrlimit;
+Windows has no equivalent and runs uncapped.
+
+A task gets TASK_SECONDS of wall-clock time. A worker that overruns, or
+dies, is killed and replaced in the background. Waiting for a free
+worker is also bounded by TASK_SECONDS (SolverBusy), so a call returns
+within about twice that in the worst case. Empty worker slots - a
+replacement that failed to start - are refilled on later calls, backing
+off up to MAX_SPAWN_BACKOFF seconds between attempts.
+
+Results are cached by task and whitespace-normalized arguments. Running
+out of time or memory is cached too (TooComplex), so a class retrying
+the same hard problem costs one timeout, not thirty; a worker crash is
+not, since it may have nothing to do with the input.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import queue
+import threading
+import subprocess
+from collections import OrderedDict
+
+WORKERS = int(os.environ.get('LEARNQUEST_SOLVER_WORKERS', 2))
+TASK_SECONDS = float(os.environ.get('LEARNQUEST_SOLVER_SECONDS', 5.0))
+MEMORY_MB = int(os.environ.get('LEARNQUEST_SOLVER_MEMORY_MB', 512))
+READY_SECONDS = 30.0  # for a new worker to import SymPy and warm up
+SPAWN_BACKOFF = 1.0
+MAX_SPAWN_BACKOFF = 60.0
+RESULT_CACHE_SIZE = 2048
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TOO_COMPLEX = object()  # cached marker for tasks that ran out of time or memory
+
+
+class SolverError(Exception):
+    """Symbolic solving failed; str() is a message fit to show the student."""
+
+
+class TooComplex(SolverError):
+    def __init__(self, message='This problem is too complex to solve automatically.'):
+        super().__init__(message)
+
+
+class SolverBusy(SolverError):
+    def __init__(self, message='The solver is busy right now. Please try again in a moment.'):
+        super().__init__(message)
+
+
+class _Worker:
+    """One worker process, its pipes and the thread reading its replies."""
+
+    def __init__(self, memory_mb):
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'math_engine.solver_pool', str(memory_mb)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=APP_DIR,
+        )
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, name='solver-reader', daemon=True).start()
+
+    def _read_replies(self):
+        try:
+            for line in self.proc.stdout:
+                self._replies.put(line)
+        except (OSError, ValueError):
+            pass
+        self._replies.put(None)  # worker exited
+
+    def _read(self, timeout):
+        """Next reply as a dict; None on timeout, EOFError if the worker died."""
+        try:
+            line = self._replies.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            return None
+        if line is None:
+            raise EOFError('solver worker exited')
+        return json.loads(line)
+
+    def wait_ready(self, timeout):
+        reply = self._read(timeout)
+        return bool(reply and reply.get('ready'))
+
+    def call(self, task, args, timeout):
+        self.proc.stdin.write(json.dumps({'task': task, 'args': args}).encode() + b'\n')
+        self.proc.stdin.flush()
+        return self._read(timeout)
+
+    def stop(self, timeout=1.0):
+        """Ask the worker to exit (closing stdin ends its loop), killing it if it doesn't."""
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=timeout)
+        except Exception:
+            self.kill()
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            try:
+                pipe.close()
+            except Exception:
+                pass
+
+
+class SolverPool:
+    """Runs math_engine.symbolic tasks in worker processes with time and memory limits."""
+
+    def __init__(self, workers=WORKERS, task_seconds=TASK_SECONDS, memory_mb=MEMORY_MB):
+        self.workers = workers
+        self.task_seconds = task_seconds
+        self.memory_mb = memory_mb
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._procs = set()  # every live _Worker, idle or busy
+        self._spawning = 0
+        self._backoff = SPAWN_BACKOFF
+        self._next_spawn = 0.0
+        self._closed = False
+        self._results = OrderedDict()  # (task, args) -> result or _TOO_COMPLEX
+        self._stats = {'tasks': 0, 'cache_hits': 0, 'timeouts': 0, 'memory_errors': 0,
+                       'crashes': 0, 'busy': 0, 'restarts': 0, 'spawn_errors': 0}
+
+    def start(self):
+        """Launch workers into any empty slots (they warm up in the background).
+
+        Called by run() on every call: a no-op once the pool is full, and
+        after failed starts it only retries once the backoff has passed.
+        """
+        with self._lock:
+            if self._closed or time.monotonic() < self._next_spawn:
+                return
+            missing = self.workers - len(self._procs) - self._spawning
+            self._spawning += max(missing, 0)
+        for _ in range(missing):
+            threading.Thread(target=self._start_worker, name='solver-spawn', daemon=True).start()
+
+    def _start_worker(self):
+        worker = None
+        try:
+            worker = _Worker(self.memory_mb)
+            with self._lock:
+                self._procs.add(worker)
+            if not worker.wait_ready(READY_SECONDS):
+                raise RuntimeError('solver worker did not start')
+        except Exception:
+            with self._lock:
+                self._spawning -= 1
+                self._procs.discard(worker)
+                self._stats['spawn_errors'] += 1
+                self._next_spawn = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, MAX_SPAWN_BACKOFF)
+            if worker is not None:
+                worker.kill()
+            return
+        with self._lock:
+            self._spawning -= 1
+            self._backoff = SPAWN_BACKOFF
+            closed = self._closed
+        if closed:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker):
+        worker.kill()
+        with self._lock:
+            self._procs.discard(worker)
+            self._stats['restarts'] += 1
+        self.start()
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def run(self, task, *args):
+        """Run a symbolic task and return its result.
+
+        Raises TooComplex if it ran out of time or memory (now or the
+        last time the same problem was tried), SolverBusy if no worker
+        freed up in time, and SolverError if the worker failed otherwise.
+        """
+        args = [' '.join(str(a).split()) for a in args]
+        key = (task, tuple(args))
+        with self._lock:
+            self._stats['tasks'] += 1
+            if key in self._results:
+                self._stats['cache_hits'] += 1
+                self._results.move_to_end(key)
+                result = self._results[key]
+                if result is _TOO_COMPLEX:
+                    raise TooComplex()
+                return result
+
+        self.start()
+        try:
+            worker = self._idle.get(timeout=self.task_seconds)
+        except queue.Empty:
+            self._count('busy')
+            raise SolverBusy()
+
+        try:
+            reply = worker.call(task, args, self.task_seconds)
+        except (EOFError, OSError, ValueError):
+            # Died mid-task; could be unrelated to this input, so not cached
+            self._count('crashes')
+            self._replace(worker)
+            raise SolverError('The solver stopped unexpectedly. Please try again.')
+
+        if reply is None:
+            self._count('timeouts')
+            self._replace(worker)
+            self._remember(key, _TOO_COMPLEX)
+            raise TooComplex()
+        if reply.get('error') == 'memory':
+            self._count('memory_errors')
+            self._replace(worker)  # the worker exits after a MemoryError
+            self._remember(key, _TOO_COMPLEX)
+            raise TooComplex()
+
+        self._idle.put(worker)
+        if 'error' in reply:
+            raise SolverError(f"Could not solve: {reply['error']}")
+        self._remember(key, reply['result'])
+        return reply['result']
+
+    def shutdown(self):
+        """Stop every worker, busy or still starting."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._procs)
+            self._procs.clear()
+        for worker in workers:
+            worker.stop()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = len(self._procs)
+            stats['starting'] = self._spawning
+            stats['idle'] = self._idle.qsize()
+            stats['cached_results'] = len(self._results)
+        stats['task_seconds'] = self.task_seconds
+        stats['memory_mb'] = self.memory_mb
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide SolverPool (workers start on first use or start())."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SolverPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _worker_main(memory_mb):
+    """Serve tasks from stdin until it closes."""
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is for the server; it cleans us up
+    try:
+        import resource
+    except ImportError:
+        resource = None  # Windows: no address-space limit
+    if resource is not None:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    out = sys.stdout.buffer
+    sys.stdout = sys.stderr  # stray prints must not corrupt the protocol
+
+    def reply(message):
+        out.write(json.dumps(message).encode() + b'\n')
+        out.flush()
+
+    from math_engine import symbolic
+    symbolic.warm_up()
+    try:
+        reply({'ready': True})
+        for line in sys.stdin.buffer:
+            request = json.loads(line)
+            try:
+                result = symbolic.TASKS[request['task']](*request['args'])
+            except MemoryError:
+                reply({'error': 'memory'})
+                return
+            except Exception as e:
+                reply({'error': str(e) or type(e).__name__})
+                continue
+            reply({'result': result})
+    except BrokenPipeError:
+        # The server went away; point stdout at devnull so exit doesn't
+        # print a second BrokenPipeError flushing what's left
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+
+
+if __name__ == '__main__':
+    _worker_main(int(sys.argv[1]) if len(sys.argv) > 1 else MEMORY_MB)
@@ -2,6 +2,8 @@
 
 from fractions import Fraction
 import re
+from math_engine.solver_pool import SolverError, get_pool
+from math_engine.expression import ExpressionError, parse_expression, reduce_steps, format_number
 
 
 def solve_steps(problem, problem_type='arithmetic'):
@@ -29,22 +31,24 @@ def solve_steps(problem, problem_type='arithmetic'):
 def _solve_arithmetic(problem):
     """Solve basic arithmetic step by step."""
     # Clean up
-    expr = problem.replace('×', '*').replace('÷', '/').replace('−', '-')
-    expr = re.sub(r'[Ww]hat is\s*', '', expr)
+    expr = re.sub(r'[Ww]hat is\s*', '', problem)
     expr = expr.replace('?', '').strip()
 
     try:
-        result = eval(expr, {"__builtins__": {}})
-    except:
-        return {'steps': ['Could not parse the expression.'], 'answer': 'Unknown'}
-
-    steps = [
-        f"Start with: {problem}",
-        f"Calculate: {expr}",
-        f"The answer is: {result}"
-    ]
+        result, reductions = reduce_steps(parse_expression(expr))
+    except ExpressionError as e:
+        return {'steps': [f'Could not solve the expression: {e}'], 'answer': 'Unknown'}
+
+    answer = format_number(result)
+    steps = [f"Start with: {problem}"]
+    for operation, remaining in reductions:
+        if remaining == answer:
+            steps.append(f"Calculate: {operation}")
+        else:
+            steps.append(f"Calculate: {operation}, leaving {remaining}")
+    steps.append(f"The answer is: {answer}")
 
-    return {'steps': steps, 'answer': str(result)}
+    return {'steps': steps, 'answer': answer}
 
 
 def _solve_fraction(problem):
@@ -117,34 +121,15 @@ def _solve_fraction(problem):
 
 def _solve_equation(problem):
     """Solve a linear equation step by step."""
-    # Extract equation
-    eq = problem.replace('Solve for x:', '').replace('Solve:', '').strip()
-
-    try:
-        from sympy import symbols, solve, Eq
-        from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
-        x = symbols('x')
-        transforms = standard_transformations + (implicit_multiplication_application,)
-
-        if '=' in eq:
-            left, right = eq.split('=')
-            left_expr = parse_expr(left.strip(), transformations=transforms)
-            right_expr = parse_expr(right.strip(), transformations=transforms)
-            solution = solve(Eq(left_expr, right_expr), x)
-        else:
-            solution = solve(parse_expr(eq, transformations=transforms), x)
+    return _solve_symbolic('equation', problem)
 
-        answer = str(solution[0]) if solution else 'No solution'
 
-        steps = [
-            f"Start with: {eq}",
-            f"Isolate x on one side",
-            f"x = {answer}"
-        ]
-
-        return {'steps': steps, 'answer': answer}
-    except Exception as e:
-        return {'steps': [f'Could not solve: {e}'], 'answer': 'Unknown'}
+def _solve_symbolic(task, problem):
+    """Run a SymPy solver in the worker pool; too-complex problems get a polite answer."""
+    try:
+        return get_pool().run(task, problem)
+    except SolverError as e:
+        return {'steps': [str(e)], 'answer': 'Unknown'}
 
 
 def _solve_geometry(problem):
@@ -184,39 +169,7 @@ def _solve_geometry(problem):
 
 def _solve_quadratic(problem):
     """Solve a quadratic equation step by step."""
-    import re
-    try:
-        from sympy import symbols, solve, Eq, sqrt as sym_sqrt
-        from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
-        x = symbols('x')
-        transforms = standard_transformations + (implicit_multiplication_application,)
-
-        eq_str = problem.replace('Solve:', '').replace('Solve for x:', '').strip()
-        eq_str = eq_str.replace('²', '**2')
-
-        if '=' in eq_str:
-            left, right = eq_str.split('=')
-            left_expr = parse_expr(left.strip(), transformations=transforms)
-            right_expr = parse_expr(right.strip(), transformations=transforms)
-            solutions = solve(Eq(left_expr, right_expr), x)
-        else:
-            solutions = solve(parse_expr(eq_str, transformations=transforms), x)
-
-        if not solutions:
-            return {'steps': ['No real solutions found.'], 'answer': 'No solution'}
-
-        steps = [
-            f"Start with: {eq_str}",
-            "Use the quadratic formula: x = (-b ± √(b²-4ac)) / 2a",
-        ]
-
-        answer_parts = [f"x = {s}" for s in solutions]
-        answer = ', '.join(answer_parts)
-        steps.append(f"Solutions: {answer}")
-
-        return {'steps': steps, 'answer': answer}
-    except Exception as e:
-        return {'steps': [f'Could not solve: {e}'], 'answer': 'Unknown'}
+    return _solve_symbolic('quadratic', problem)
 
 
 def _solve_trig(problem):
@@ -0,0 +1,101 @@
+"""SymPy-backed solving - equations, quadratics and limits.
+
+These run inside solver_pool workers, never in a request thread: SymPy
+can take arbitrarily long (or a lot of memory) on some inputs. Results
+are plain dicts and strings so they can be sent back to the server.
+"""
+
+from sympy import symbols, solve, Eq, limit, oo
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
+
+x = symbols('x')
+transforms = standard_transformations + (implicit_multiplication_application,)
+
+
+def _solve_for_x(eq):
+    if '=' in eq:
+        left, right = eq.split('=')
+        left_expr = parse_expr(left.strip(), transformations=transforms)
+        right_expr = parse_expr(right.strip(), transformations=transforms)
+        return solve(Eq(left_expr, right_expr), x)
+    return solve(parse_expr(eq, transformations=transforms), x)
+
+
+def equation_steps(problem):
+    """Solve a linear equation step by step."""
+    eq = problem.replace('Solve for x:', '').replace('Solve:', '').strip()
+
+    try:
+        solution = _solve_for_x(eq)
+        answer = str(solution[0]) if solution else 'No solution'
+
+        steps = [
+            f"Start with: {eq}",
+            f"Isolate x on one side",
+            f"x = {answer}"
+        ]
+
+        return {'steps': steps, 'answer': answer}
+    except MemoryError:
+        raise  # the worker reports it as too complex
+    except Exception as e:
+        return {'steps': [f'Could not solve: {e}'], 'answer': 'Unknown'}
+
+
+def quadratic_steps(problem):
+    """Solve a quadratic equation step by step."""
+    try:
+        eq_str = problem.replace('Solve:', '').replace('Solve for x:', '').strip()
+        eq_str = eq_str.replace('²', '**2')
+
+        solutions = _solve_for_x(eq_str)
+
+        if not solutions:
+            return {'steps': ['No real solutions found.'], 'answer': 'No solution'}
+
+        steps = [
+            f"Start with: {eq_str}",
+            "Use the quadratic formula: x = (-b ± √(b²-4ac)) / 2a",
+        ]
+
+        answer_parts = [f"x = {s}" for s in solutions]
+        answer = ', '.join(answer_parts)
+        steps.append(f"Solutions: {answer}")
+
+        return {'steps': steps, 'answer': answer}
+    except MemoryError:
+        raise  # the worker reports it as too complex
+    except Exception as e:
+        return {'steps': [f'Could not solve: {e}'], 'answer': 'Unknown'}
+
+
+def limit_value(expr_str, var='x', point='oo'):
+    """Limit of expression as var approaches point, as a string (None if it can't be computed)."""
+    try:
+        expr = parse_expr(expr_str, transformations=transforms)
+        x_sym = symbols(var)
+        if point == 'oo':
+            result = limit(expr, x_sym, oo)
+        elif point == '-oo':
+            result = limit(expr, x_sym, -oo)
+        else:
+            result = limit(expr, x_sym, float(point))
+        return str(result)
+    except MemoryError:
+        raise
+    except Exception:
+        return None
+
+
+# Task names solver_pool workers accept
+TASKS = {
+    'equation': equation_steps,
+    'quadratic': quadratic_steps,
+    'limit': limit_value,
+}
+
+
+def warm_up():
+    """Exercise the parser and solver once so the first real task is fast."""
+    equation_steps('2x + 3 = 7')
+    limit_value('1/x')
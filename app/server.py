@@ -4,14 +4,18 @@ Flask Backend Server
 """
 
 import os
-import sqlite3
 from flask import Flask, g, send_from_directory
+from api.db import ConnectionManager, pragmas_from_env
+from api.migrations import run_migrations
+from api.write_behind import init_writer
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.environ.get('LEARNQUEST_DB', os.path.join(BASE_DIR, 'database', 'learnquest.db'))
 CONTENT_DIR = os.environ.get('LEARNQUEST_CONTENT', os.path.join(BASE_DIR, 'content'))
 PROMPTS_DIR = os.environ.get('LEARNQUEST_PROMPTS', os.path.join(BASE_DIR, 'prompts'))
+SEARCH_INDEX_PATH = os.environ.get('LEARNQUEST_SEARCH_INDEX',
+                                   os.path.join(os.path.dirname(DB_PATH), 'search_index.bin'))
 
 app = Flask(__name__,
             static_folder=os.path.join(BASE_DIR, 'static'),
@@ -21,17 +25,18 @@ app.secret_key = os.urandom(24)
 app.config['DB_PATH'] = DB_PATH
 app.config['CONTENT_DIR'] = CONTENT_DIR
 app.config['PROMPTS_DIR'] = PROMPTS_DIR
+app.config['SEARCH_INDEX_PATH'] = SEARCH_INDEX_PATH
 app.config['LLM_MODEL'] = os.environ.get('LEARNQUEST_MODEL', 'llama3.2:3b')
+app.config['DB_PRAGMAS'] = pragmas_from_env()
+app.config['DB_POOL_SIZE'] = int(os.environ.get('LEARNQUEST_DB_POOL_SIZE', 8))
+
+db_manager = ConnectionManager(DB_PATH, app.config['DB_PRAGMAS'], app.config['DB_POOL_SIZE'])
 
 
 def get_db():
-    """Get database connection for current request."""
+    """Get database connection for current request (borrowed from the pool)."""
     if 'db' not in g:
-        g.db = sqlite3.connect(DB_PATH)
-        g.db.row_factory = sqlite3.Row
-        g.db.execute('PRAGMA journal_mode=OFF')
-        g.db.execute('PRAGMA synchronous=OFF')
-        g.db.execute('PRAGMA foreign_keys=ON')
+        g.db = db_manager.acquire()
     return g.db
 
 
@@ -39,26 +44,31 @@ def get_db():
 def close_db(exception):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        db_manager.release(db)
 
 
 def init_db():
-    """Initialize database from schema. Creates new DB or updates existing one with new tables."""
+    """Initialize database from schema, then apply pending migrations.
+
+    schema.sql is idempotent (CREATE IF NOT EXISTS / INSERT OR IGNORE), so
+    it is safe to re-run on an existing database. Indexes and later schema
+    changes are applied by api.migrations.
+    """
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    db = sqlite3.connect(DB_PATH)
-    db.execute('PRAGMA journal_mode=OFF')
-    db.execute('PRAGMA synchronous=OFF')
-    schema_path = os.path.join(BASE_DIR, 'database', 'schema.sql')
-    with open(schema_path, 'r') as f:
-        try:
+    db = db_manager.connect()
+    try:
+        schema_path = os.path.join(BASE_DIR, 'database', 'schema.sql')
+        with open(schema_path, 'r') as f:
             db.executescript(f.read())
-        except sqlite3.OperationalError:
-            pass  # Some tables may already exist
-    db.close()
+        run_migrations(db)
+    finally:
+        db.close()
 
 
-# Make get_db available to blueprints
+# Make get_db, the connection manager and the chat history writer available to blueprints
 app.get_db = get_db
+app.db_manager = db_manager
+app.chat_writer = init_writer(db_manager)
 
 # Register blueprints
 from api.routes_auth import auth_bp
@@ -121,5 +131,17 @@ def get_vocabulary():
 
 if __name__ == '__main__':
     init_db()
+    from api import curriculum_store
+    from api.routes_search import _build_index as build_search_index
+    from api.llm_utils import compile_prompts
+    with app.app_context():
+        curriculum_store.build_index()
+        build_search_index()
+        compile_prompts()
+    # SymPy workers warm up while the server starts
+    from math_engine.solver_pool import get_pool
+    get_pool().start()
     port = int(os.environ.get('LEARNQUEST_PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    # Threaded server whose chat streams are relayed off the worker threads
+    from api.stream_relay import run_server
+    run_server(app, '0.0.0.0', port)
@@ -178,12 +178,13 @@ const Quiz = {
         const question = this.currentQuiz.questions[questionIdx];
         const pairs = question.pairs || [];
         let correct = 0;
-        pairs.forEach((pair, i) => {
+        const selections = pairs.map((pair, i) => {
             const sel = document.getElementById(`match-${questionIdx}-${i}`);
             if (sel && parseInt(sel.value) === i) correct++;
+            return sel && sel.value !== '' ? parseInt(sel.value) : null;
         });
         const isCorrect = correct === pairs.length;
-        this.answers.push({ questionIdx, correct: isCorrect });
+        this.answers.push({ questionIdx, answer: selections, correct: isCorrect });
         this.showQuizFeedback(questionIdx, isCorrect, question);
         this.advanceQuestion(subject);
     },
@@ -221,29 +222,58 @@ const Quiz = {
         }, 1500);
     },
 
-    /** Finish quiz and show results */
+    /** Finish quiz: the server grades it, and its score is the one shown */
     async finishQuiz(subject) {
         if (this.timerInterval) clearInterval(this.timerInterval);
 
-        const correct = this.answers.filter(a => a.correct).length;
-        const total = this.answers.length;
-        const score = total > 0 ? Math.round((correct / total) * 100) : 0;
         const timeSpent = Math.round((Date.now() - this.startTime) / 1000);
         const quiz = this.currentQuiz;
-        const passing = quiz.passing_score || 70;
-        const passed = score >= passing;
-
+        const area = document.getElementById('quiz-question-area');
         document.getElementById('quiz-progress-fill').style.width = '100%';
-        document.getElementById('quiz-question-area').innerHTML = `
+        area.innerHTML = `<div class="quiz-results"><p>Checking your answers...</p></div>`;
+
+        let result;
+        try {
+            result = await App.api('/api/quiz/submit', {
+                method: 'POST',
+                body: {
+                    quiz_id: quiz.unit_id || quiz.id,
+                    subject,
+                    grade: App.state.user.grade,
+                    time_spent_seconds: timeSpent,
+                    answers: this.answers.map(a => ({ questionIdx: a.questionIdx, answer: a.answer }))
+                }
+            });
+        } catch (e) {
+            area.innerHTML = `
+                <div class="quiz-results">
+                    <p class="error-msg">Your quiz could not be saved: ${App.escapeHtml(e.message)}</p>
+                    <div class="quiz-result-actions">
+                        <button class="btn btn-primary" onclick="Quiz.finishQuiz('${subject}')">Try Again</button>
+                    </div>
+                </div>
+            `;
+            return;
+        }
+
+        const passed = result.passed;
+        const review = (result.results || []).map(r => `
+            <li class="${r.correct ? 'review-correct' : 'review-wrong'}">
+                ${r.correct ? '✅' : '❌'} Question ${r.question_index + 1}
+            </li>
+        `).join('');
+
+        area.innerHTML = `
             <div class="quiz-results">
                 <h2>${passed ? '🎉 You Passed!' : '📚 Keep Trying!'}</h2>
                 <div class="score-circle ${passed ? 'pass' : 'fail'}">
-                    <span class="score-number">${score}%</span>
+                    <span class="score-number">${result.score}%</span>
                 </div>
-                <p>${correct} out of ${total} correct</p>
+                <p>${result.correct_answers} out of ${result.total_questions} correct</p>
                 <p class="quiz-time">Time: ${Math.floor(timeSpent / 60)}m ${timeSpent % 60}s</p>
-                ${passed ? `<p class="xp-earned">+${quiz.xp_reward || 50} XP earned!</p>` : ''}
-                ${!passed ? `<p>You need ${passing}% to pass. Review the lessons and try again!</p>` : ''}
+                ${result.xp_awarded ? `<p class="xp-earned">+${result.xp_awarded} XP earned!</p>` : ''}
+                ${!passed ? `<p>You need ${quiz.passing_score || 70}% to pass. Review the lessons and try again!</p>` : ''}
+                ${review ? `<ul class="quiz-review">${review}</ul>` : ''}
                 <div class="quiz-result-actions">
                     <button class="btn btn-primary" onclick="App.navigate('units', {subject:'${subject}', grade:${App.state.user.grade}})">Continue</button>
                     ${!passed ? `<button class="btn btn-secondary" onclick="App.navigate('quiz', {unitId:'${quiz.unit_id}', subject:'${subject}', grade:${App.state.user.grade}})">Retry</button>` : ''}
@@ -251,28 +281,9 @@ const Quiz = {
             </div>
         `;
 
-        // Submit results
         try {
-            await App.api('/api/quiz/submit', {
-                method: 'POST',
-                body: {
-                    quiz_id: quiz.unit_id || quiz.id,
-                    subject,
-                    grade: App.state.user.grade,
-                    score,
-                    total_questions: total,
-                    correct_answers: correct,
-                    time_spent_seconds: timeSpent,
-                    answers: this.answers
-                }
-            });
             await App.refreshUser();
-            if (passed) {
-                Gamification.showXpGain(quiz.xp_reward || 50);
-                if (score === 100) {
-                    Gamification.showXpGain(25); // bonus
-                }
-            }
+            if (result.xp_awarded) Gamification.showXpGain(result.xp_awarded);
         } catch (e) { /* ignore */ }
     },
 
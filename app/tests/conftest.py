@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app's packages (api, math_engine) the way server.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
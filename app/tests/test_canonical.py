@@ -0,0 +1,24 @@
+import pytest
+
+from math_engine.canonical import canonical_expression
+
+
+def _value(expr):
+    return eval(expr.replace('^', '**'), {'__builtins__': {}})
+
+
+@pytest.mark.parametrize('expr', [
+    '3*(7%4)', '7 % 4 * 3', '2*3%4', '(7%4)*3*2', '3/4 + 1/8', '10 - (3 - 1)',
+    '2^3^2', '(2^3)^2', '-(2+3)*4', '6/(1/3)', '5 - 2 + 7', '8 % 3 + 4 * (9 % 5)',
+])
+def test_canonical_form_keeps_the_value(expr):
+    assert _value(canonical_expression(expr)) == _value(expr)
+
+
+def test_mod_operand_is_not_merged_into_the_product():
+    assert canonical_expression('3*(7%4)') == canonical_expression('7 % 4 * 3')
+    assert canonical_expression('3*(7%4)') != canonical_expression('3*7%4')
+
+
+def test_commutative_spellings_match():
+    assert canonical_expression('3/4 + 1/8') == canonical_expression('1/8+3/4')
@@ -0,0 +1,75 @@
+import time
+from fractions import Fraction
+
+import pytest
+
+from math_engine import expression
+from math_engine.expression import ExpressionError, evaluate_expression, parse_expression, reduce_steps
+from math_engine.step_solver import _solve_arithmetic
+
+
+@pytest.mark.parametrize('expr, reason', [
+    ('9**9**9', 'Exponents are limited'),
+    ('2^2^2^2', 'nested at most'),
+    ('(2^10)^(2^10)', 'Exponents are limited'),
+    ('2^(1/2)', 'not a rational number'),
+    ('(-8)^(1/3)', 'not a rational number'),
+    ('0^-1', 'Division by zero'),
+    ('5/(3-3)', 'Division by zero'),
+    ('1' * (expression.MAX_DIGITS + 1) + '+1', 'digits'),
+    ('+'.join(['1'] * (expression.MAX_LENGTH // 2 + 1)), 'characters'),
+    ('(' * (expression.MAX_NESTING + 1) + '1' + ')' * (expression.MAX_NESTING + 1), 'nested too deeply'),
+    ('15^1000', 'too large'),  # refused by the bit-length precheck
+    ('7^1000', 'too large'),  # passes the precheck, caught by _check_size
+])
+def test_costly_input_is_rejected_quickly(expr, reason):
+    start = time.perf_counter()
+    with pytest.raises(ExpressionError, match=reason):
+        evaluate_expression(expr)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_largest_allowed_power_is_exact():
+    assert evaluate_expression('2^1000') == 2 ** 1000
+    assert evaluate_expression('1' * expression.MAX_DIGITS) == int('1' * expression.MAX_DIGITS)
+
+
+@pytest.mark.parametrize('expr, value', [
+    ('16^(1/2)', 4),
+    ('8^(2/3)', 4),
+    ('(1/4)^(1/2)', Fraction(1, 2)),
+    ('27^(-1/3)', Fraction(1, 3)),
+    ('2^3^2', 512),
+])
+def test_exact_roots_and_powers(expr, value):
+    assert evaluate_expression(expr) == value
+
+
+def test_reduce_steps_follows_order_of_operations():
+    value, steps = reduce_steps(parse_expression('3 + 4 * 2'))
+    assert value == 11
+    assert steps == [('4 × 2 = 8', '3 + 8'), ('3 + 8 = 11', '11')]
+
+
+def test_reduce_steps_records_at_most_max_steps():
+    value, steps = reduce_steps(parse_expression('+'.join(['1'] * 50)), max_steps=40)
+    assert value == 50
+    assert len(steps) == 40
+
+
+def test_solve_arithmetic_steps():
+    assert _solve_arithmetic('What is 3 + 4 * 2?') == {
+        'steps': [
+            'Start with: What is 3 + 4 * 2?',
+            'Calculate: 4 × 2 = 8, leaving 3 + 8',
+            'Calculate: 3 + 8 = 11',
+            'The answer is: 11',
+        ],
+        'answer': '11',
+    }
+
+
+def test_solve_arithmetic_reports_rejected_input():
+    result = _solve_arithmetic('9**9**9')
+    assert result['answer'] == 'Unknown'
+    assert result['steps'] == ['Could not solve the expression: Exponents are limited to 1000']
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, current_app
+
+from api import item_analysis
+from api.db import ConnectionManager
+from api.migrations import run_migrations
+from api.question_keys import question_shape
+from api.routes_generate import _fallback_quiz
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNIT = '3-math-1'  # Multiplication within 100; quiz item 0 is "7 x 6 = ___"
+
+
+@pytest.fixture
+def db(tmp_path):
+    app = Flask(__name__)
+    app.config['CONTENT_DIR'] = os.path.join(APP_DIR, 'content')
+    conn = sqlite3.connect(str(tmp_path / 'test.db'))
+    conn.row_factory = sqlite3.Row
+    with open(os.path.join(APP_DIR, 'database', 'schema.sql')) as f:
+        conn.executescript(f.read())
+    run_migrations(conn)
+    with app.app_context():
+        yield conn
+    conn.close()
+
+
+def _submit(db, answers):
+    """Record one quiz submission; answers is {question_index: correct}."""
+    correct = sum(answers.values())
+    result_id = db.execute(
+        'INSERT INTO quiz_results (user_id, quiz_id, subject, grade, score, total_questions, correct_answers) '
+        "VALUES (NULL, ?, 'math', 3, ?, ?, ?)",
+        (UNIT, 100.0 * correct / len(answers), len(answers), correct)
+    ).lastrowid
+    db.executemany(
+        'INSERT INTO quiz_answers (result_id, quiz_id, question_index, answer, correct) VALUES (?, ?, ?, ?, ?)',
+        [(result_id, UNIT, i, 'x', int(ok)) for i, ok in answers.items()]
+    )
+    db.commit()
+
+
+def test_practice_problem_matches_quiz_item_of_the_same_shape(db):
+    for n in range(10):
+        _submit(db, {0: True, 2: n % 2 == 0})
+    item_analysis.refresh(db)
+
+    stats = item_analysis.stats_by_question(db, [(UNIT, '4 x 3 = ___'), ('3-math-2', '4 x 3 = ___')])
+
+    assert stats == {(UNIT, '#*# = ___'): (1.0, None)}
+
+
+def test_fallback_quiz_puts_practice_problems_like_poor_items_last(db):
+    # Every student gets the "a x b = ___" items right: too easy to tell anyone apart
+    for n in range(10):
+        _submit(db, {0: True, 1: True, 2: n % 2 == 0})
+    item_analysis.refresh(db)
+
+    quiz = _fallback_quiz('math', 3, 'Multiplication within 100', 10, db=db)
+
+    assert len(quiz) == 10
+    assert '#*# = ___' not in {question_shape(q['question']) for q in quiz}
+
+
+def test_invalidate_during_a_background_refresh_forces_a_rebuild(db, tmp_path, monkeypatch):
+    manager = ConnectionManager(str(tmp_path / 'test.db'))
+    refresh = item_analysis.refresh
+
+    def refresh_then_delete_student(conn):
+        refresh(conn)
+        item_analysis.invalidate(conn)  # what delete_student does once the refresh commits
+        conn.commit()
+
+    monkeypatch.setattr(item_analysis, 'refresh', refresh_then_delete_student)
+    monkeypatch.setattr(item_analysis, '_last_refresh', 0.0)
+    item_analysis._refresh_lock.acquire()
+    item_analysis._refresh_in_background(current_app._get_current_object(), manager)
+    manager.close_all()
+
+    assert time.monotonic() - item_analysis._last_refresh >= item_analysis.REFRESH_SECONDS
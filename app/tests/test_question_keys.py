@@ -0,0 +1,19 @@
+from api.question_keys import normalize_question, hint_cache_key
+
+
+def test_spellings_of_the_same_question_share_a_key():
+    assert normalize_question('What is 3/4 + 1/8?') == normalize_question('what is 1/8+3/4')
+
+
+def test_leading_decimal_point_is_kept():
+    assert hint_cache_key('Write .25 as a fraction', 'math', 5) != \
+        hint_cache_key('Write 25 as a fraction', 'math', 5)
+    assert normalize_question('What is .5 of 10?') != normalize_question('What is 5 of 10?')
+
+
+def test_leading_decimal_point_matches_leading_zero():
+    assert normalize_question('Write .25 as a fraction') == normalize_question('Write 0.25 as a fraction')
+
+
+def test_sentence_punctuation_is_dropped():
+    assert normalize_question('Is 1,000 big, really?') == 'is 1000 big really'
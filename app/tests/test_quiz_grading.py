@@ -0,0 +1,93 @@
+import os
+
+import pytest
+from flask import Flask
+
+from api.quiz_grading import grade_question, grade_quiz
+from api.routes_quiz import quiz_bp
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MC = {'type': 'multiple_choice', 'question': 'Which body part helps us see?',
+      'options': ['Ears', 'Eyes', 'Nose', 'Tongue'], 'correct': 1}
+TF = {'type': 'true_false', 'question': 'We use our tongue to taste food.', 'answer': 'true'}
+FILL = {'type': 'fill_in', 'question': 'We smell with our ___.', 'answer': 'nose'}
+MATH = {'type': 'fill_in', 'question': '3/4 + 1/8 = ___', 'answer': '7/8'}
+
+
+@pytest.mark.parametrize('answer, correct', [
+    (1, True), ('1', True), (1.0, True),
+    (0, False), (4, False), (-3, False), ('9', False),
+    (1.5, False), ('1.5', False), (True, False), ('Eyes', False), ([1], False), (None, False),
+])
+def test_multiple_choice_index(answer, correct):
+    assert grade_question(MC, answer, 'science') is correct
+
+
+@pytest.mark.parametrize('expected', ['true', True, 'True'])
+@pytest.mark.parametrize('answer, correct', [
+    (True, True), ('true', True), (' TRUE ', True),
+    (False, False), ('false', False), ('yes', False), (None, False),
+])
+def test_true_false_as_bool_or_string(expected, answer, correct):
+    assert grade_question(dict(TF, answer=expected), answer, 'science') is correct
+
+
+def test_free_text_ignores_case_and_spacing():
+    assert grade_question(FILL, '  Nose ', 'science')
+    assert not grade_question(FILL, 'noses', 'science')
+    assert not grade_question(FILL, '   ', 'science')
+
+
+@pytest.mark.parametrize('answer, correct', [
+    ('7/8', True), ('0.875', True), ('14/16', True), (' 7 / 8 ', True),
+    ('1/8', False), ('7', False), ('seven eighths?', False),
+])
+def test_math_fill_in_uses_the_answer_validator(answer, correct):
+    assert grade_question(MATH, answer, 'math') is correct
+
+
+def test_grade_quiz_last_answer_wins_and_unanswered_is_wrong():
+    answers = [
+        {'questionIdx': 0, 'answer': 1},
+        {'questionIdx': 0, 'answer': 2},  # changed their mind: wrong
+        {'questionIdx': 1, 'answer': 'false'},
+        {'questionIdx': 1, 'answer': True},
+        {'questionIdx': 7, 'answer': 'nose'},  # no such question
+        'not an answer',
+    ]
+
+    results, correct = grade_quiz([MC, TF, FILL], answers, 'science')
+
+    assert correct == 1
+    assert [r['correct'] for r in results] == [False, True, False]
+    assert [r['answer'] for r in results] == ['2', 'True', None]
+    assert [r['question_type'] for r in results] == ['multiple_choice', 'true_false', 'fill_in']
+
+
+def test_grade_quiz_with_no_answers():
+    results, correct = grade_quiz([MC, TF], None, 'science')
+    assert correct == 0
+    assert [r['answer'] for r in results] == [None, None]
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['CONTENT_DIR'] = os.path.join(APP_DIR, 'content')
+    app.register_blueprint(quiz_bp, url_prefix='/api/quiz')
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 2
+    return client
+
+
+@pytest.mark.parametrize('quiz_id', ['no-such-unit', '', None])
+def test_submit_quiz_rejects_an_unknown_quiz(client, quiz_id):
+    response = client.post('/api/quiz/submit', json={
+        'quiz_id': quiz_id, 'subject': 'math', 'grade': 3, 'score': 100,
+        'answers': [{'questionIdx': 0, 'answer': '42'}],
+    })
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Quiz not found'}
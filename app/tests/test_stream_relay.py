@@ -0,0 +1,50 @@
+import asyncio
+import socket
+
+import pytest
+
+from api.llm_utils import BUSY_MESSAGE
+from api.stream_relay import StreamRelay, _Flight
+
+
+def _serve_finished(tokens, failed):
+    """Relay a finished generation to one client; returns (bytes sent, replies saved)."""
+    relay = StreamRelay()
+    relay._loop = loop = asyncio.new_event_loop()
+    flight = _Flight('key')
+    flight.tokens = list(tokens)
+    flight.failed = failed
+    flight.done = True
+    flight.clients = 1
+    server_side, client_side = socket.socketpair()
+    saved = []
+    try:
+        loop.run_until_complete(relay._serve(server_side, flight, saved.append))
+        relay._executor.shutdown(wait=True)
+        client_side.settimeout(1)
+        received = b''
+        while True:
+            data = client_side.recv(65536)
+            if not data:
+                break
+            received += data
+    finally:
+        client_side.close()
+        loop.close()
+    return received, saved
+
+
+@pytest.mark.parametrize('failed', [False, True])
+def test_client_gets_the_whole_stream(failed):
+    received, _ = _serve_finished(['Hel', 'lo'], failed)
+    assert b'"token": "Hel"' in received and received.endswith(b'data: [DONE]\n\n')
+
+
+def test_successful_reply_is_saved():
+    _, saved = _serve_finished(['Hel', 'lo'], failed=False)
+    assert saved == ['Hello']
+
+
+def test_busy_or_error_reply_is_not_saved():
+    _, saved = _serve_finished([BUSY_MESSAGE], failed=True)
+    assert saved == []
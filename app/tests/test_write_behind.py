@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+import pytest
+
+from api.db import ConnectionManager
+from api.migrations import run_migrations
+from api.write_behind import ChatHistoryWriter
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEACHER = 1  # seeded by schema.sql
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'test.db'))
+    db = manager.connect()
+    with open(os.path.join(APP_DIR, 'database', 'schema.sql')) as f:
+        db.executescript(f.read())
+    run_migrations(db)
+    db.close()
+    yield manager
+    manager.close_all()
+
+
+def _count(db_manager, session_id):
+    with db_manager.connection() as db:
+        return db.execute(
+            'SELECT COUNT(*) FROM chat_history WHERE user_id = ? AND session_id = ?', (TEACHER, session_id)
+        ).fetchone()[0]
+
+
+def test_flush_session_writes_queued_rows(db_manager):
+    writer = ChatHistoryWriter(db_manager, batch_size=64, flush_seconds=60)
+    writer.add(TEACHER, 's1', None, 'assistant', 'hello')
+    assert _count(db_manager, 's1') == 0
+
+    writer.flush_session(TEACHER, 's1')
+
+    assert _count(db_manager, 's1') == 1
+
+
+def test_flush_session_waits_for_a_batch_in_flight(db_manager):
+    writer = ChatHistoryWriter(db_manager, batch_size=1, flush_seconds=60)
+    taken, release = threading.Event(), threading.Event()
+    write = writer._write
+
+    def slow_write(rows):
+        taken.set()  # the background flush has taken the rows off the queue
+        release.wait(5)
+        write(rows)
+
+    writer._write = slow_write
+    writer.add(TEACHER, 's1', None, 'assistant', 'hello')
+    assert taken.wait(5)
+    assert writer.stats()['pending'] == 0
+
+    deleted = threading.Event()
+
+    def delete_conversation():
+        writer.flush_session(TEACHER, 's1')
+        with db_manager.connection() as db:
+            db.execute('DELETE FROM chat_history WHERE user_id = ? AND session_id = ?', (TEACHER, 's1'))
+            db.commit()
+        deleted.set()
+
+    thread = threading.Thread(target=delete_conversation)
+    thread.start()
+    time.sleep(0.2)
+    assert not deleted.is_set()  # still waiting for the batch
+
+    release.set()
+    thread.join(5)
+
+    assert deleted.is_set()
+    assert _count(db_manager, 's1') == 0  # the late batch did not bring the row back
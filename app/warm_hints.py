@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Pre-generate tutor hints for every curriculum practice and quiz problem.
+
+Walks each lesson's practice_problems and each unit_quiz in content/,
+and fills llm_cache through the same prompt and cache key that
+/api/tutor/hint uses, so students get those hints instantly. Safe to stop
+and re-run: finished problems are recorded in a checkpoint file and
+anything already cached is skipped. Intended to run overnight.
+
+This is a separate process with its own Ollama client and scheduler, so
+it does not yield to a running server's tutor and hint requests: each
+worker competes with live students for the model. The default is one
+worker; raise --workers only when nobody is using LearnQuest.
+
+Usage (from the app/ directory):
+    python warm_hints.py [--workers 1] [--subjects math,science] [--grades 3,4]
+                         [--limit N] [--checkpoint PATH] [--restart]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from server import app, init_db, DB_PATH
+from api import curriculum_store
+from api.llm_utils import call_ollama_shared, get_cached_response, cache_response, \
+    is_error_response, BATCH
+from api.question_keys import hint_cache_key
+from api.routes_tutor import hint_messages
+
+GRADES = list(range(0, 13))
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(DB_PATH), 'hint_warmup.json')
+CHECKPOINT_EVERY = 10  # problems between checkpoint writes
+
+
+def collect_problems(subjects, grades):
+    """Yield (cache_key, problem, subject, grade) for every distinct problem."""
+    seen = set()
+    for subject in subjects:
+        for grade in grades:
+            data = curriculum_store.load_curriculum(subject, grade)
+            if not data:
+                continue
+            for unit in data.get('units', []):
+                questions = []
+                for lesson in unit.get('lessons', []):
+                    questions.extend(lesson.get('practice_problems', []))
+                questions.extend((unit.get('unit_quiz') or {}).get('questions', []))
+                for q in questions:
+                    problem = (q.get('question') or '').strip()
+                    if not problem:
+                        continue
+                    key = hint_cache_key(problem, subject, grade)
+                    if key not in seen:
+                        seen.add(key)
+                        yield key, problem, subject, grade
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return set(data.get('done', [])), data.get('failed', {})
+    except (OSError, ValueError):
+        return set(), {}
+
+
+def save_checkpoint(path, done, failed):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'done': sorted(done), 'failed': failed, 'saved_at': time.time()}, f)
+    os.replace(tmp, path)
+
+
+def warm_one(key, problem, subject, grade):
+    """Generate and cache one hint. Returns 'cached', 'generated' or 'failed'."""
+    with app.app_context():
+        with app.db_manager.connection() as db:
+            if get_cached_response(db, key):
+                return 'cached'
+            hint = call_ollama_shared(
+                # BATCH only orders this process's own requests; the server's
+                # scheduler never sees them
+                key, hint_messages(problem, subject, grade), priority=BATCH,
+                on_complete=lambda text: cache_response(db, key, text)
+            )
+            return 'failed' if is_error_response(hint) else 'generated'
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return f'{seconds}s'
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f'{minutes}m{seconds:02d}s'
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=1,
+                        help='parallel generations (default: 1; more slows down live students)')
+    parser.add_argument('--subjects', default=','.join(curriculum_store.SUBJECTS))
+    parser.add_argument('--grades', default='', help='comma-separated, 0 = kindergarten (default: all)')
+    parser.add_argument('--limit', type=int, default=0, help='stop after N new hints')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='ignore the existing checkpoint')
+    args = parser.parse_args()
+
+    subjects = [s.strip() for s in args.subjects.split(',') if s.strip()]
+    grades = [int(g) for g in args.grades.split(',') if g.strip()] or GRADES
+
+    init_db()
+    done, failed = (set(), {}) if args.restart else load_checkpoint(args.checkpoint)
+    with app.app_context():
+        problems = list(collect_problems(subjects, grades))
+    todo = [p for p in problems if p[0] not in done]
+    if args.limit:
+        todo = todo[:args.limit]
+    print(f'{len(problems)} distinct problems, {len(problems) - len(todo)} already done, '
+          f'{len(todo)} to go with {args.workers} worker(s)')
+    if not todo:
+        return 0
+
+    counts = {'generated': 0, 'cached': 0, 'failed': 0}
+    lock = threading.Lock()
+    start = time.monotonic()
+    finished = 0
+
+    def record(item, outcome):
+        nonlocal finished
+        with lock:
+            finished += 1
+            counts[outcome] += 1
+            if outcome == 'failed':
+                failed[item[0]] = item[1]
+            else:
+                done.add(item[0])
+                failed.pop(item[0], None)
+            if finished % CHECKPOINT_EVERY == 0:
+                save_checkpoint(args.checkpoint, done, failed)
+            elapsed = time.monotonic() - start
+            rate = elapsed / finished
+            eta = rate * (len(todo) - finished)
+            print(f'[{finished}/{len(todo)}] {finished * 100 / len(todo):5.1f}%  '
+                  f'{item[2]} grade {item[3]}: {outcome:<9}  '
+                  f'{rate:.1f}s/problem  ETA {format_duration(eta)}', flush=True)
+
+    items = iter(todo)
+    pending = {}
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            # Keep at most two tasks per worker queued so Ctrl-C stops promptly
+            for item in items:
+                pending[pool.submit(warm_one, *item)] = item
+                if len(pending) >= args.workers * 2:
+                    break
+            while pending:
+                finished_now, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished_now:
+                    item = pending.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        print(f'  error on {item[1]!r}: {e}', file=sys.stderr)
+                        outcome = 'failed'
+                    record(item, outcome)
+                    next_item = next(items, None)
+                    if next_item is not None:
+                        pending[pool.submit(warm_one, *next_item)] = next_item
+    except KeyboardInterrupt:
+        print('\nInterrupted - finishing in-flight hints and saving progress...')
+        for future in pending:
+            future.cancel()
+    finally:
+        with lock:
+            save_checkpoint(args.checkpoint, done, failed)
+
+    elapsed = time.monotonic() - start
+    print(f"Done in {format_duration(elapsed)}: {counts['generated']} generated, "
+          f"{counts['cached']} already cached, {counts['failed']} failed "
+          f'(re-run to retry). Checkpoint: {args.checkpoint}')
+    return 0 if not counts['failed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,7 @@ Usage:
     python launch.py start   # Start LearnQuest
     python launch.py stop    # Stop LearnQuest
     python launch.py wizard  # Interactive setup wizard
+    python launch.py warm    # Pre-generate tutor hints (run overnight)
     python launch.py         # Defaults to 'start'
 """
 
@@ -509,8 +510,8 @@ def _run_setup(model_id):
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
         import sqlite3
         db = sqlite3.connect(DB_PATH)
-        db.execute('PRAGMA journal_mode=OFF')
-        db.execute('PRAGMA synchronous=OFF')
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
         with open(SCHEMA_PATH, 'r') as f:
             db.executescript(f.read())
         db.close()
@@ -697,6 +698,32 @@ def cmd_stop():
     return True
 
 
+# ============================================================
+# WARM HINT CACHE
+# ============================================================
+def cmd_warm(extra_args):
+    """Pre-generate hints for every curriculum problem (resumable)."""
+    if not os.path.exists(python_executable()):
+        print('ERROR: Setup not complete. Run: python launch.py setup')
+        return False
+    if not ollama_running():
+        print('ERROR: Ollama is not running. Start LearnQuest first: python launch.py start')
+        return False
+
+    cfg = load_config()
+    env = os.environ.copy()
+    env['LEARNQUEST_DB'] = DB_PATH
+    env['LEARNQUEST_CONTENT'] = os.path.join(APP_DIR, 'content')
+    env['LEARNQUEST_PROMPTS'] = os.path.join(APP_DIR, 'prompts')
+    env['LEARNQUEST_MODEL'] = cfg.get('model', 'phi3')
+    try:
+        result = subprocess.run([python_executable(), 'warm_hints.py'] + extra_args,
+                                cwd=APP_DIR, env=env)
+    except KeyboardInterrupt:
+        return False
+    return result.returncode == 0
+
+
 # ============================================================
 # MAIN
 # ============================================================
@@ -712,9 +739,11 @@ def main():
         success = cmd_stop()
     elif command == 'wizard':
         success = cmd_wizard()
+    elif command == 'warm':
+        success = cmd_warm(args[1:])
     else:
         print(f'Unknown command: {command}')
-        print('Usage: python launch.py [setup|start|stop|wizard]')
+        print('Usage: python launch.py [setup|start|stop|wizard|warm]')
         success = False
 
     sys.exit(0 if success else 1)